@@ -0,0 +1,90 @@
+# batch_parser.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from parser_simulator import parse_input_string, recognize
+
+# Size of the process pool used by /parse/batch (PARSE_WORKERS=1 disables the pool).
+# This is the only place the pool size comes from.
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", os.cpu_count() or 1))
+
+# Largest number of inputs accepted in one batch
+MAX_BATCH_SIZE = int(os.environ.get("PARSE_MAX_BATCH_SIZE", 10000))
+
+# Batches smaller than this are parsed in the calling process:
+# shipping the table to a worker costs more than the parses themselves.
+INLINE_BATCH_SIZE = int(os.environ.get("PARSE_INLINE_BATCH_SIZE", 64))
+
+_pool = None
+
+
+def get_pool():
+    """Returns the shared process pool (PARSE_WORKERS processes), creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def _parse_one(grammar, parsing_table, start_symbol, input_string, include_trace):
+    """Parses one input and returns its per-input result record."""
+    try:
+        if not include_trace:
+            # Fast path: accept/reject only, no trace or tree is built
+            return {"result": recognize(parsing_table, start_symbol, input_string)}
+        trace_steps, tree, status = parse_input_string(
+            grammar, parsing_table, start_symbol, input_string
+        )
+    except Exception as e:
+        return {"result": "Error", "error": str(e)}
+
+    return {"result": status, "trace_steps": trace_steps, "parse_tree": tree}
+
+
+def _parse_chunk(grammar, parsing_table, start_symbol, inputs, include_trace):
+    """Worker entry point: parses a contiguous slice of the batch."""
+    return [
+        _parse_one(grammar, parsing_table, start_symbol, s, include_trace)
+        for s in inputs
+    ]
+
+
+def parse_batch(grammar, parsing_table, start_symbol, inputs,
+                include_trace=False, chunk_size=None):
+    """
+    Parses every string in `inputs` against one CompiledTable.
+    Large batches are split into chunks and spread over the process pool;
+    the table is sent once per chunk, not once per input.
+    Results are returned in input order.
+    """
+    if len(inputs) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch has {len(inputs)} inputs; the maximum is {MAX_BATCH_SIZE}.")
+
+    workers = PARSE_WORKERS
+    if workers <= 1 or len(inputs) < INLINE_BATCH_SIZE:
+        results = _parse_chunk(grammar, parsing_table, start_symbol, inputs, include_trace)
+    else:
+        if chunk_size is None:
+            # A few chunks per worker keeps the pool busy when inputs differ in length
+            chunk_size = max(1, -(-len(inputs) // (workers * 4)))
+        chunks = [inputs[i:i + chunk_size] for i in range(0, len(inputs), chunk_size)]
+
+        pool = get_pool()
+        futures = [
+            pool.submit(_parse_chunk, grammar, parsing_table, start_symbol, chunk, include_trace)
+            for chunk in chunks
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+
+    for index, record in enumerate(results):
+        record["index"] = index
+    return results
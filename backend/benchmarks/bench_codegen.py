@@ -0,0 +1,50 @@
+# benchmarks/bench_codegen.py
+#
+# Run from backend/:  python -m benchmarks.bench_codegen
+import time
+
+from grammar_cache import compile_grammar
+from parser_simulator import parse_input_string, recognize
+
+EXPR_GRAMMAR = """E -> T E'
+E' -> + T E' | eps
+T -> F T'
+T' -> * F T' | eps
+F -> ( E ) | id"""
+
+
+def expression(n_terms):
+    """id * id + ( id + id ) * id + ... with about n_terms operands."""
+    parts = []
+    for i in range(n_terms):
+        parts.append("( id + id )" if i % 5 == 4 else "id")
+        parts.append("*" if i % 2 else "+")
+    return " ".join(parts[:-1])
+
+
+def _best(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench(sizes=(100, 1000, 10000), repeat=5):
+    compiled = compile_grammar(EXPR_GRAMMAR)
+    generated = compiled.generated_parser
+    table, start = compiled.table, compiled.start_symbol
+
+    print(f"{'operands':>9} {'generated ms':>13} {'recognize ms':>13} {'parse_input_string ms':>22}")
+    for n in sizes:
+        text = expression(n)
+        t_gen = _best(lambda: generated.recognize(text), repeat)
+        t_rec = _best(lambda: recognize(table, start, text), repeat)
+        # The full parse builds the trace snapshots, which is quadratic; keep it small
+        t_full = _best(lambda: parse_input_string(compiled.grammar, table, start, text), 1) if n <= 1000 else float("nan")
+        print(f"{n:>9} {t_gen * 1e3:>13.2f} {t_rec * 1e3:>13.2f} {t_full * 1e3:>22.2f}")
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,61 @@
+# benchmarks/bench_first_follow.py
+#
+# Times FIRST/FOLLOW on cyclic chain grammars: the bitmask engine (what the
+# service uses) and the set-returning compute_first / compute_follow
+# wrappers, which add the conversion to strings.
+#
+# Run from backend/:
+#   python -m benchmarks.bench_first_follow [--quick] [--output results.json]
+import argparse
+
+from benchmarks.generators import chain_grammar
+from benchmarks.harness import best_of, make_report, save_report
+from first_follow import (
+    compute_first, compute_follow, compute_first_masks, compute_follow_masks
+)
+from symbol_table import SymbolTable
+
+SIZES = (250, 500, 1000, 2000, 4000, 8000)
+
+
+def bench(sizes=SIZES, repeat=3):
+    results = []
+    print(f"{'nonterminals':>12} {'masks ms':>10} {'us / NT':>8} {'sets ms':>10}")
+    for n in sizes:
+        grammar = chain_grammar(n)
+        params = {"non_terminals": n, "productions": sum(map(len, grammar.values()))}
+
+        def masks():
+            symbols = SymbolTable.from_grammar(grammar)
+            first = compute_first_masks(grammar, symbols)
+            compute_follow_masks(grammar, first, "N0", symbols)
+
+        def sets():
+            compute_follow(grammar, compute_first(grammar), "N0")
+
+        t_masks = best_of(masks, repeat)
+        t_sets = best_of(sets, repeat)
+        print(f"{n:>12} {t_masks * 1e3:>10.2f} {t_masks / n * 1e6:>8.2f} {t_sets * 1e3:>10.2f}")
+        for name, seconds in (("first_follow/masks", t_masks), ("first_follow/sets", t_sets)):
+            results.append({"name": name, "size": n, "seconds": seconds,
+                            "repeat": repeat, "params": params})
+    return make_report("first_follow", results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FIRST/FOLLOW on chain grammars.")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--quick", action="store_true", help="small sizes only (smoke run)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        report = bench((250, 500), repeat=1)
+    else:
+        report = bench(repeat=args.repeat)
+    if args.output:
+        save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/bench_http.py
+#
+# End-to-end throughput of the HTTP API: N requests, C in flight at once,
+# against the app in-process (ASGI transport, no network) or a running
+# server. Reports requests/s and p50/p99 latency per endpoint.
+#
+# Run from backend/:
+#   python -m benchmarks.bench_http [--url http://127.0.0.1:8000] [--output results.json]
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.generators import random_ll1_grammar, valid_input
+from benchmarks.harness import make_report, save_report
+from grammar_rewriter import grammar_to_string
+
+# Full parses return a trace with a stack snapshot per step (quadratic in the
+# input on these grammars); above this size only recognize runs
+FULL_TRACE_LIMIT = 100
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def _measure(client, method, path, body, requests, concurrency):
+    latencies = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            t0 = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code != 200:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "seconds": elapsed,
+        "requests": requests,
+        "errors": errors,
+        "requests_per_second": requests / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1e3,
+        "p99_ms": _percentile(latencies, 0.99) * 1e3,
+    }
+
+
+def _scenarios(grammar_text, grammar_id, input_string, input_size):
+    parse = {"grammar_text": grammar_text, "input_string": input_string}
+    scenarios = [
+        ("analyze", "POST", "/analyze", {"grammar_text": grammar_text}),
+        ("parse/recognize", "POST", "/parse", {**parse, "mode": "recognize"}),
+        ("grammars/recognize", "POST", f"/grammars/{grammar_id}/parse",
+         {"input_string": input_string, "mode": "recognize"}),
+    ]
+    if input_size <= FULL_TRACE_LIMIT:
+        scenarios += [
+            ("parse/full", "POST", "/parse", parse),
+            ("grammars/parse", "POST", f"/grammars/{grammar_id}/parse",
+             {"input_string": input_string}),
+        ]
+    return scenarios
+
+
+async def _run(client, grammar_size, input_size, requests, concurrency):
+    grammar = random_ll1_grammar(grammar_size, 16)
+    grammar_text = grammar_to_string(grammar)
+    input_string = valid_input(grammar, input_size)
+
+    registered = await client.post("/grammars", json={"grammar_text": grammar_text})
+    registered.raise_for_status()
+    grammar_id = registered.json()["grammar_id"]
+
+    results = []
+    for name, method, path, body in _scenarios(grammar_text, grammar_id, input_string, input_size):
+        # Warm-up: the first request compiles the grammar and the generated parser
+        await client.request(method, path, json=body)
+        result = await _measure(client, method, path, body, requests, concurrency)
+        result.update(name=name, size=input_size, params={
+            "non_terminals": grammar_size + 1, "concurrency": concurrency,
+        })
+        results.append(result)
+    await client.delete(f"/grammars/{grammar_id}")
+    return results
+
+
+async def bench_async(url=None, grammar_size=50, input_sizes=(10, 100, 1000),
+                      requests=200, concurrency=8):
+    if url is None:
+        from main import app
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+    else:
+        client = httpx.AsyncClient(base_url=url, timeout=60)
+    async with client:
+        results = []
+        for n in input_sizes:
+            results += await _run(client, grammar_size, n, requests, concurrency)
+    return results
+
+
+def bench(url=None, **kwargs):
+    results = asyncio.run(bench_async(url, **kwargs))
+    print(f"{'endpoint':<18} {'tokens':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for r in results:
+        print(f"{r['name']:<18} {r['size']:>7} {r['requests_per_second']:>9.1f} "
+              f"{r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['errors']:>7}")
+    report = make_report("http", results)
+    report["target"] = url or "in-process"
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP throughput of the parser API.")
+    parser.add_argument("--url", help="running server (default: the app in-process)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and size")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    report = bench(args.url, requests=args.requests, concurrency=args.concurrency)
+    if args.output:
+        save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_pipeline.py
+#
+# Times every stage of the pipeline on generated grammars and inputs:
+# read_grammar, compute_first, compute_follow, compute_parsing_table and
+# parse_input_string (plus the recognize fast path).
+#
+# Run from backend/:
+#   python -m benchmarks.bench_pipeline [--quick] [--output results.json]
+import argparse
+
+from benchmarks.generators import random_ll1_grammar, valid_input, invalid_input
+from benchmarks.harness import best_of, make_report, save_report
+from grammar_rewriter import grammar_to_string
+from grammar_utils import read_grammar
+from first_follow import compute_first, compute_follow
+from parsing_table import compute_parsing_table, CompiledTable
+from parser_simulator import parse_input_string, recognize
+
+GRAMMAR_SIZES = (10, 100, 1000)
+INPUT_SIZES = (100, 1000, 10000)
+# parse_input_string builds a snapshot of the stack and input per step,
+# so its cost grows quadratically; larger inputs only run through recognize
+FULL_PARSE_LIMIT = 1000
+
+
+def bench_grammar_stages(sizes, repeat, seed=0):
+    results = []
+    for n in sizes:
+        grammar = random_ll1_grammar(n, max(8, n // 4), seed=seed)
+        text = grammar_to_string(grammar)
+        first = compute_first(grammar)
+        follow = compute_follow(grammar, first, "S")
+        params = {"non_terminals": n + 1, "productions": sum(map(len, grammar.values()))}
+
+        timings = {
+            "read_grammar": best_of(lambda: read_grammar(text), repeat),
+            "compute_first": best_of(lambda: compute_first(grammar), repeat),
+            "compute_follow": best_of(lambda: compute_follow(grammar, first, "S"), repeat),
+            "compute_parsing_table": best_of(
+                lambda: compute_parsing_table(grammar, first, follow), repeat
+            ),
+        }
+        for name, seconds in timings.items():
+            results.append({"name": name, "size": n, "seconds": seconds,
+                            "repeat": repeat, "params": params})
+    return results
+
+
+def bench_parsing(sizes, repeat, grammar_size=50, seed=0):
+    grammar = random_ll1_grammar(grammar_size, 16, seed=seed)
+    first = compute_first(grammar)
+    follow = compute_follow(grammar, first, "S")
+    table_dict, _ = compute_parsing_table(grammar, first, follow)
+    table = CompiledTable.from_dict(grammar, table_dict)
+
+    results = []
+    for n in sizes:
+        for kind, make in (("valid", valid_input), ("invalid", invalid_input)):
+            text = make(grammar, n, seed=seed)
+            params = {"input": kind, "tokens": len(text.split()), "non_terminals": grammar_size + 1}
+            results.append({
+                "name": f"recognize/{kind}", "size": n, "repeat": repeat, "params": params,
+                "seconds": best_of(lambda: recognize(table, "S", text), repeat),
+            })
+            if n <= FULL_PARSE_LIMIT:
+                results.append({
+                    "name": f"parse_input_string/{kind}", "size": n, "repeat": 1, "params": params,
+                    "seconds": best_of(lambda: parse_input_string(grammar, table, "S", text), 1),
+                })
+    return results
+
+
+def bench(grammar_sizes=GRAMMAR_SIZES, input_sizes=INPUT_SIZES, repeat=5):
+    results = bench_grammar_stages(grammar_sizes, repeat) + bench_parsing(input_sizes, repeat)
+    print(f"{'benchmark':<28} {'size':>8} {'ms':>10}")
+    for r in results:
+        print(f"{r['name']:<28} {r['size']:>8} {r['seconds'] * 1e3:>10.3f}")
+    return make_report("pipeline", results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the grammar pipeline stages.")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--quick", action="store_true", help="small sizes only (smoke run)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        report = bench((10, 100), (100, 1000), repeat=1)
+    else:
+        report = bench(repeat=args.repeat)
+    if args.output:
+        save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
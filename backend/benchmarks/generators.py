@@ -0,0 +1,135 @@
+# benchmarks/generators.py
+#
+# Synthetic workloads for the benchmarks: random LL(1) grammars of a given
+# shape, long valid / invalid inputs for them, and cyclic chain grammars
+# for the FIRST/FOLLOW fixpoint.
+import random
+
+from first_follow import compute_first, compute_follow
+from parsing_table import compute_parsing_table
+
+
+def chain_grammar(n_nonterminals, n_terminals=16):
+    """
+    Machine-generated style grammar: every N_i starts with N_(i+1), and every
+    fourth non-terminal closes a cycle back to N_0, so the dependency graph
+    has both long chains and large strongly connected components.
+    """
+    grammar = {}
+    for i in range(n_nonterminals):
+        t = f"t{i % n_terminals}"
+        nxt = f"N{i + 1}" if i + 1 < n_nonterminals else t
+        productions = [[nxt, t], ["eps"]]
+        if i % 4 == 3:
+            productions.append(["N0", t])
+        grammar[f"N{i}"] = productions
+    return grammar
+
+
+def random_ll1_grammar(n_nonterminals, n_terminals, productions_per_nt=3,
+                       max_length=4, eps_ratio=0.3, seed=0):
+    """
+    Random LL(1) grammar with start symbol S -> N0 S | eps.
+
+    Every production of a non-terminal starts with its own terminal, so
+    there is no left recursion and no FIRST/FIRST conflict; eps alternatives
+    that cause a FIRST/FOLLOW conflict are dropped until none is left.
+    Each N_i (i > 0) is used by some N_j with j < i, so everything is
+    reachable. The first production of every non-terminal is a terminal,
+    possibly followed by hooked non-terminals of higher index, so everything
+    derives a finite string.
+    """
+    rng = random.Random(seed)
+    terminals = [f"t{i}" for i in range(n_terminals)]
+    non_terminals = [f"N{i}" for i in range(n_nonterminals)]
+    per_nt = max(1, min(productions_per_nt, n_terminals))
+
+    grammar = {"S": [["N0", "S"], ["eps"]]}
+    for i, nt in enumerate(non_terminals):
+        leads = rng.sample(terminals, per_nt)
+        productions = []
+        for k, lead in enumerate(leads):
+            body = [lead]
+            if k > 0:
+                for _ in range(rng.randint(0, max_length - 1)):
+                    body.append(rng.choice(terminals if rng.random() < 0.5 else non_terminals))
+            productions.append(body)
+        if i > 0:
+            # Hook N_i under an earlier non-terminal
+            parent = grammar[non_terminals[rng.randrange(i)]]
+            targets = [p for p in parent[1:] if p != ["eps"]] or parent[:1]
+            targets[-1].append(nt)
+        if i > 0 and rng.random() < eps_ratio:
+            productions.append(["eps"])
+        grammar[nt] = productions
+
+    # Drop eps alternatives until the table has no conflict
+    while True:
+        first = compute_first(grammar)
+        follow = compute_follow(grammar, first, "S")
+        _, conflicts = compute_parsing_table(grammar, first, follow)
+        culprits = {A for A, *_ in conflicts if ["eps"] in grammar[A]}
+        if not conflicts:
+            return grammar
+        if not culprits:
+            raise RuntimeError("generated grammar has a conflict without eps")
+        for A in culprits:
+            grammar[A] = [p for p in grammar[A] if p != ["eps"]]
+
+
+def _min_lengths(grammar):
+    """Length of the shortest terminal string each non-terminal derives."""
+    best = {nt: float("inf") for nt in grammar}
+    changed = True
+    while changed:
+        changed = False
+        for nt, productions in grammar.items():
+            for production in productions:
+                length = sum(
+                    best[s] if s in grammar else (0 if s == "eps" else 1)
+                    for s in production
+                )
+                if length < best[nt]:
+                    best[nt] = length
+                    changed = True
+    return best
+
+
+def valid_input(grammar, n_tokens, start_symbol="S", seed=0):
+    """
+    A sentence of the grammar with at least n_tokens tokens (a random
+    leftmost derivation that switches to shortest productions once the
+    target length is reached).
+    """
+    rng = random.Random(seed)
+    shortest = _min_lengths(grammar)
+
+    def cost(production):
+        return sum(shortest[s] if s in grammar else (0 if s == "eps" else 1) for s in production)
+
+    cheapest = {nt: min(grammar[nt], key=cost) for nt in grammar}
+    tokens = []
+    stack = [start_symbol]
+    while stack:
+        sym = stack.pop()
+        if sym == "eps":
+            continue
+        if sym not in grammar:
+            tokens.append(sym)
+            continue
+        if len(tokens) + len(stack) >= n_tokens:
+            production = cheapest[sym]
+        elif sym == start_symbol:
+            production = grammar[sym][0]  # keep repeating S -> N0 S
+        else:
+            production = rng.choice(grammar[sym])
+        stack.extend(reversed(production))
+    return " ".join(tokens)
+
+
+def invalid_input(grammar, n_tokens, start_symbol="S", seed=0):
+    """A valid input with one token, past the middle, replaced by an unknown one."""
+    tokens = valid_input(grammar, n_tokens, start_symbol, seed).split()
+    rng = random.Random(seed)
+    tokens[rng.randrange(len(tokens) // 2, len(tokens))] = "<invalid>"
+    return " ".join(tokens)
@@ -0,0 +1,101 @@
+# benchmarks/harness.py
+#
+# Timing, JSON results and comparison shared by the benchmark suites.
+#
+# Compare two result files (e.g. from two commits), from backend/:
+#   python -m benchmarks.harness old.json new.json [--threshold 1.10]
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+
+def best_of(fn, repeat):
+    """Best wall time of `repeat` calls of fn(), in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def make_report(suite, results):
+    """Wraps a list of result records with the metadata needed to compare runs."""
+    return {
+        "suite": suite,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+
+def save_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+
+def compare_reports(old, new, metric="seconds", threshold=1.10):
+    """
+    Pairs the results of two reports by (name, size) and returns rows of
+    (name, size, old, new, ratio, regressed). For throughput metrics
+    (higher is better) the ratio is inverted, so > 1 always means slower.
+    """
+    higher_is_better = metric in ("requests_per_second",)
+    before = {(r["name"], r["size"]): r for r in old["results"] if metric in r}
+    rows = []
+    for r in new["results"]:
+        key = (r["name"], r["size"])
+        if key not in before or metric not in r:
+            continue
+        a, b = before[key][metric], r[metric]
+        if not a or not b:
+            continue
+        ratio = a / b if higher_is_better else b / a
+        rows.append((r["name"], r["size"], a, b, ratio, ratio > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default=None,
+                        help="seconds (default) or requests_per_second for HTTP results")
+    parser.add_argument("--threshold", type=float, default=1.10,
+                        help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    metric = args.metric or ("requests_per_second" if new["suite"] == "http" else "seconds")
+
+    print(f"{old.get('commit')} -> {new.get('commit')} ({metric})")
+    print(f"{'benchmark':<28} {'size':>8} {'old':>12} {'new':>12} {'slowdown':>9}")
+    regressions = 0
+    for name, size, a, b, ratio, regressed in compare_reports(old, new, metric, args.threshold):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<28} {size:>8} {a:>12.6g} {b:>12.6g} {ratio:>8.2f}x{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
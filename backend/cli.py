@@ -0,0 +1,263 @@
+# cli.py
+#
+# Command-line entry point for the grammar pipeline, for CI and batch jobs.
+# Run from backend/:
+#
+#   python cli.py compile GRAMMAR... [--output-dir DIR] [--dense]
+#       compile grammar files into snapshot tables (<name>.ll1snap)
+#   python cli.py check GRAMMAR... [--jobs N]
+#       validate LL(1)-ness; exit status 1 if any grammar is not LL(1)
+#   python cli.py parse GRAMMAR PATH... [--jobs N] [--glob PATTERN] [--output FILE]
+#       parse input files (directories are walked) on a process pool;
+#       exit status 1 if any file is rejected
+#
+# Every command writes one JSON object per line: a record per file, and for
+# parse a closing {"summary": {...}} with the throughput. GRAMMAR is a
+# grammar text file or a snapshot. Grammars with token definitions
+# (see lexer.py) lex the input files, the others split them on whitespace.
+#
+# Only the standard library is imported up front; the pipeline modules are
+# imported by the command that needs them, and FastAPI/pydantic never are.
+import argparse
+import json
+import os
+import sys
+import time
+
+SNAPSHOT_SUFFIX = ".ll1snap"
+
+# Per-process state of the parse workers (the grammar, loaded once)
+_worker = {}
+
+
+def _write(out, record):
+    out.write(json.dumps(record) + "\n")
+
+
+def load_grammar(path):
+    """CompiledGrammar of a grammar text file or a snapshot file."""
+    if path.endswith(SNAPSHOT_SUFFIX):
+        from snapshot import load_snapshot
+        return load_snapshot(path)
+    from grammar_cache import compile_grammar
+    with open(path, encoding="utf-8") as f:
+        return compile_grammar(f.read())
+
+
+def _pool_map(fn, items, jobs, initializer=None, initargs=()):
+    """fn over items, in order: inline for jobs=1, else on a process pool."""
+    if jobs <= 1 or len(items) <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(fn, items)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    chunksize = max(1, len(items) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as pool:
+        yield from pool.map(fn, items, chunksize=chunksize)
+
+
+# -------------------------------
+# compile
+# -------------------------------
+
+def _compile_file(path, output_dir, dense):
+    from snapshot import save_snapshot
+
+    start = time.perf_counter()
+    record = {"file": path}
+    try:
+        compiled = load_grammar(path)
+        name = os.path.splitext(os.path.basename(path))[0] + SNAPSHOT_SUFFIX
+        target = os.path.join(output_dir or os.path.dirname(path), name)
+        save_snapshot(compiled, target, dense)
+        record.update(snapshot=target, valid=compiled.valid, bytes=os.path.getsize(target))
+    except Exception as e:
+        record["error"] = str(e)
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def cmd_compile(args, out):
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    failed = False
+    for path in args.grammars:
+        record = _compile_file(path, args.output_dir, args.dense)
+        failed = failed or "error" in record
+        _write(out, record)
+    return 1 if failed else 0
+
+
+# -------------------------------
+# check
+# -------------------------------
+
+def _check_file(path):
+    start = time.perf_counter()
+    record = {"file": path}
+    try:
+        compiled = load_grammar(path)
+    except Exception as e:
+        record.update(valid=False, error=str(e))
+    else:
+        record.update(
+            valid=compiled.valid,
+            non_terminals=len(compiled.grammar),
+            left_recursion=list(compiled.recursive_rules),
+            conflicts=[{"non_terminal": nt, "terminal": t, "kind": kind}
+                       for nt, t, _, _, kind in compiled.conflicts],
+        )
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def cmd_check(args, out):
+    valid = True
+    for record in _pool_map(_check_file, args.grammars, args.jobs):
+        valid = valid and record["valid"]
+        _write(out, record)
+    return 0 if valid else 1
+
+
+# -------------------------------
+# parse
+# -------------------------------
+
+def _init_parse_worker(snapshot_data):
+    from snapshot import loads_snapshot
+    _worker["compiled"] = loads_snapshot(snapshot_data)
+
+
+def _file_tokens(compiled, path):
+    """Token names of an input file, read through a memory map."""
+    from stream_parser import iter_file_tokens
+
+    lexer = compiled.lexer
+    if lexer is None:
+        yield from iter_file_tokens(path)
+        return
+    import mmap
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return
+        with buffer:
+            yield from lexer.names(buffer)
+
+
+def _parse_file(path):
+    from lexer import LexerError
+    from stream_parser import StreamParser
+
+    compiled = _worker["compiled"]
+    start = time.perf_counter()
+    record = {"file": path}
+    parser = StreamParser(compiled.table, compiled.start_symbol, events=False)
+    try:
+        record["bytes"] = os.path.getsize(path)
+        for token in _file_tokens(compiled, path):
+            parser.feed(token)
+            if parser.status is not None:
+                break
+        end = parser.finish()[-1]
+        record.update(result=end["result"], tokens=end["tokens"])
+        if parser.error is not None:
+            record["error"] = {k: parser.error[k] for k in ("symbol", "token", "position")}
+    except (LexerError, UnicodeDecodeError, OSError) as e:
+        record.update(result="Error", error=str(e))
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def _input_files(paths, pattern):
+    import fnmatch
+
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names)
+                         if fnmatch.fnmatch(name, pattern))
+    return files
+
+
+def cmd_parse(args, out):
+    from snapshot import dumps_snapshot
+
+    compiled = load_grammar(args.grammar)
+    if not compiled.valid:
+        print(f"{args.grammar}: grammar is not LL(1) (run the check command for details)",
+              file=sys.stderr)
+        return 2
+    files = _input_files(args.paths, args.glob)
+
+    start = time.perf_counter()
+    counts = {"Accepted": 0, "Rejected": 0, "Error": 0}
+    tokens = size = 0
+    # Workers get the grammar as a snapshot: no recompiling per process
+    for record in _pool_map(_parse_file, files, args.jobs, _init_parse_worker,
+                            (dumps_snapshot(compiled),)):
+        counts[record["result"]] += 1
+        tokens += record.get("tokens", 0)
+        size += record.get("bytes", 0)
+        _write(out, record)
+    seconds = time.perf_counter() - start
+
+    _write(out, {"summary": {
+        "files": len(files),
+        "accepted": counts["Accepted"],
+        "rejected": counts["Rejected"],
+        "errors": counts["Error"],
+        "tokens": tokens,
+        "bytes": size,
+        "seconds": round(seconds, 6),
+        "files_per_second": round(len(files) / seconds, 1) if seconds else None,
+        "tokens_per_second": round(tokens / seconds, 1) if seconds else None,
+        "mb_per_second": round(size / seconds / 1e6, 3) if seconds else None,
+    }})
+    return 0 if counts["Accepted"] == len(files) else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="LL(1) grammar pipeline from the command line.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    jobs = os.cpu_count() or 1
+
+    p = commands.add_parser("compile", help="compile grammar files into snapshot tables")
+    p.add_argument("grammars", nargs="+", metavar="GRAMMAR")
+    p.add_argument("--output-dir", help="where to write the snapshots (default: next to each grammar)")
+    p.add_argument("--dense", action="store_true", help="table arrays appended after the payload (memory-mappable)")
+    p.set_defaults(run=cmd_compile)
+
+    p = commands.add_parser("check", help="validate that grammar files are LL(1)")
+    p.add_argument("grammars", nargs="+", metavar="GRAMMAR")
+    p.add_argument("--jobs", type=int, default=jobs, help="worker processes (default: CPU count)")
+    p.set_defaults(run=cmd_check)
+
+    p = commands.add_parser("parse", help="parse input files in parallel")
+    p.add_argument("grammar", metavar="GRAMMAR", help=f"grammar text file or {SNAPSHOT_SUFFIX} snapshot")
+    p.add_argument("paths", nargs="+", metavar="PATH", help="input files or directories")
+    p.add_argument("--glob", default="*", help="file name pattern inside directories (default: *)")
+    p.add_argument("--jobs", type=int, default=jobs, help="worker processes (default: CPU count)")
+    p.add_argument("--output", help="write the JSONL records to this file instead of stdout")
+    p.set_defaults(run=cmd_parse)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    output = getattr(args, "output", None)
+    if output:
+        with open(output, "w", encoding="utf-8") as out:
+            return args.run(args, out)
+    return args.run(args, sys.stdout)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# codegen.py
+#
+# Compiles a conflict-free CompiledTable into a specialized Python module:
+# one recursive-descent function per non-terminal, with the table lookups
+# turned into if/elif tests on the current token and right recursion
+# (A -> ... A) turned into a loop. The module is built with compile() in
+# memory, and its source can also be downloaded.
+import types
+
+from parser_simulator import recognize
+
+
+def _function_names(table):
+    return {nt: f"_p{i}" for i, nt in enumerate(table.non_terminals)}
+
+
+def _selection_sets(table, nt):
+    """Production index -> list of terminals selecting it, in production order."""
+    selections = {}
+    for t_id, p in sorted(table.row(table.nt_index[nt]).items()):
+        selections.setdefault(p, []).append(table.terminals[t_id])
+    return dict(sorted(selections.items()))
+
+
+def generate_parser_source(table, start_symbol, grammar_key=""):
+    """Returns the Python source of a recognizer for the table."""
+    functions = _function_names(table)
+    constants = []
+    lines = [
+        "# Generated LL(1) recognizer -- do not edit.",
+        f"# Start symbol: {start_symbol}",
+        f"# Grammar key: {grammar_key}",
+        "",
+        "",
+        "class Reject(Exception):",
+        "    pass",
+        "",
+    ]
+
+    for nt in table.non_terminals:
+        name = functions[nt]
+        lines += ["", f"def {name}(toks, i):  # {nt}", "    while True:", "        t = toks[i]"]
+        keyword = "if"
+        for p, terminals in _selection_sets(table, nt).items():
+            if len(terminals) <= 3:
+                test = " or ".join(f"t == {t!r}" for t in terminals)
+            else:
+                const = f"_S{len(constants)}"
+                constants.append(f"{const} = frozenset({sorted(terminals)!r})")
+                test = f"t in {const}"
+            lines.append(f"        {keyword} {test}:  # {nt} -> {' '.join(table.productions[p])}")
+            keyword = "elif"
+
+            body = [sym for sym in table.productions[p] if sym != 'eps']
+            if not body:
+                lines.append("            return i")
+                continue
+            for k, sym in enumerate(body):
+                last = k == len(body) - 1
+                if sym in table.nt_index:
+                    if last and sym == nt:
+                        lines.append("            continue")
+                    elif last:
+                        lines.append(f"            return {functions[sym]}(toks, i)")
+                    else:
+                        lines.append(f"            i = {functions[sym]}(toks, i)")
+                else:
+                    # The first terminal was already checked by the selection test
+                    if k > 0 or len(terminals) != 1 or terminals[0] != sym:
+                        lines.append(f"            if toks[i] != {sym!r}:")
+                        lines.append("                raise Reject(i)")
+                    lines.append("            i += 1")
+                    if last:
+                        lines.append("            return i")
+        lines.append("        raise Reject(i)")
+
+    lines += [
+        "",
+        "",
+        "def recognize_tokens(toks):",
+        "    \"\"\"toks is the token list followed by '$'. Returns True if accepted.\"\"\"",
+        "    try:",
+        f"        i = {functions[start_symbol]}(toks, 0)",
+        "        return toks[i] == '$'",
+        "    except (Reject, IndexError):",
+        "        return False",
+        "",
+        "",
+        "def recognize(input_string):",
+        "    toks = input_string.split()",
+        "    toks.append('$')",
+        "    return 'Accepted' if recognize_tokens(toks) else 'Rejected'",
+        "",
+    ]
+    header, rest = lines[:8], lines[8:]
+    return "\n".join(header + constants + rest)
+
+
+class GeneratedParser:
+    """A generated recognizer module plus its source."""
+
+    def __init__(self, table, start_symbol, grammar_key=""):
+        self.table = table
+        self.start_symbol = start_symbol
+        self.source = generate_parser_source(table, start_symbol, grammar_key)
+        self.module = types.ModuleType(f"ll1_generated_{grammar_key[:12]}")
+        code = compile(self.source, f"<ll1 parser {grammar_key[:12]}>", "exec")
+        exec(code, self.module.__dict__)
+
+    def recognize(self, input_string):
+        """
+        Accept/reject with the generated code. Inputs nested deeper than the
+        Python recursion limit fall back to the table-driven recognizer.
+        """
+        try:
+            return self.module.recognize(input_string)
+        except RecursionError:
+            return recognize(self.table, self.start_symbol, input_string)
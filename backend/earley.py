@@ -0,0 +1,433 @@
+# earley.py
+#
+# General context-free parsing for grammars without an LL(1) (or LALR(1))
+# table: ambiguous, left-recursive or otherwise conflicting ones.
+#
+# Earley's algorithm over numbered items (item = item_base[p] + dot, as in
+# lalr.py), with
+# - one-token lookahead: B is only predicted with the productions whose
+#   FIRST contains the next token (or that are nullable), and an item
+#   A -> alpha . beta only enters a set if the next token is in
+#   FIRST(beta), or in FOLLOW(A) when beta =>* eps. On grammars that are
+#   LL(1) apart from a few conflicts each Earley set then holds a handful of
+#   items and parsing stays close to linear (without the FOLLOW check a
+#   nullable right-recursive rule alone makes it quadratic),
+# - the Aycock-Horspool fix for nullable non-terminals (an item predicting a
+#   nullable B is advanced over B right away),
+# - a shared packed parse forest (SPPF) in binarized form: symbol nodes
+#   (A, i, j) and intermediate nodes (A -> alpha . beta, i, j), each with
+#   its list of packed families.
+# One derivation is read out of the forest as the usual parse tree JSON.
+import os
+import time
+from array import array
+
+from grammar_utils import find_symbols, split_input
+from first_follow import compute_first_masks, compute_follow_masks, nullable_non_terminals
+from symbol_table import SymbolTable, EPS, iter_bits
+from parse_tree import ParseTree
+
+# Token code of input symbols that are not terminals of the grammar
+UNKNOWN_TOKEN = -2
+
+# Longest input the service hands to the Earley parser: on ambiguous
+# grammars time is cubic and the chart quadratic in the input length
+MAX_EARLEY_TOKENS = int(os.environ.get("PARSE_MAX_EARLEY_TOKENS", 5000))
+
+
+class EarleyGrammar:
+    """
+    Numbered productions and items of a grammar plus the lookahead-filtered
+    prediction lists. Symbol codes: terminals 0..T-1 (the SymbolTable
+    positions, so '$' is 1), non-terminals T..T+N-1. FIRST/FOLLOW bitmasks
+    over `symbols` are reused when given (CompiledGrammar has them for
+    grammars without left recursion).
+    """
+
+    def __init__(self, grammar, start_symbol=None, symbols=None, first=None,
+                 follow=None, nullable=None):
+        if start_symbol is None:
+            start_symbol = next(iter(grammar))
+        non_terminals, terminals = find_symbols(grammar)
+        if nullable is None:
+            nullable = nullable_non_terminals(grammar)
+        if symbols is None or first is None:
+            symbols = SymbolTable(sorted(terminals))
+            first = compute_first_masks(grammar, symbols, nullable)
+            follow = None
+        if follow is None:
+            follow = compute_follow_masks(grammar, first, start_symbol, symbols)
+
+        self.start_symbol = start_symbol
+        self.symbols = symbols
+        self.terminals = list(symbols.symbols)
+        T = self.T = len(self.terminals)
+        self.non_terminals = list(grammar)
+        code = {t: i for i, t in enumerate(self.terminals)}
+        code.update((nt, T + i) for i, nt in enumerate(self.non_terminals))
+        self.start_code = code[start_symbol]
+        self.nullable = bytearray(T + len(self.non_terminals))
+        for nt in nullable:
+            self.nullable[code[nt]] = 1
+
+        self.productions = []
+        self.lhs = array('i')
+        self.item_base = array('i')
+        self.next_sym = array('i')      # symbol code after the dot, -1 at the end
+        self.item_prod = array('i')
+        self.lookahead = []             # per item: tokens that may come next (bitmask)
+        self.first = [first[nt] for nt in self.non_terminals]
+        # predict[A - T]: {token code: productions to predict}; productions
+        # with a nullable right side are in every entry and in default[A - T]
+        self.predict = [{} for _ in self.non_terminals]
+        self.default = [[] for _ in self.non_terminals]
+
+        for nt, alternatives in grammar.items():
+            A = code[nt] - T
+            for production in alternatives:
+                p = len(self.productions)
+                self.productions.append(production)
+                self.lhs.append(A + T)
+                rhs = [code[sym] for sym in production if sym != 'eps']
+                self.item_base.append(len(self.next_sym))
+                # FIRST(beta) of every suffix, right to left
+                suffix = [EPS]
+                for c in reversed(rhs):
+                    f = 1 << c if c < T else first[self.non_terminals[c - T]]
+                    suffix.append(f if not f & EPS else (f & ~EPS) | suffix[-1])
+                suffix.reverse()
+                for d in range(len(rhs) + 1):
+                    self.next_sym.append(rhs[d] if d < len(rhs) else -1)
+                    self.item_prod.append(p)
+                    mask = suffix[d]
+                    self.lookahead.append(mask & ~EPS | (follow[nt] if mask & EPS else 0))
+
+                mask = suffix[0]
+                if mask & EPS:
+                    self.default[A].append(p)
+                    for entry in self.predict[A].values():
+                        entry.append(p)
+                for t in iter_bits(mask & ~EPS):
+                    entry = self.predict[A].get(t)
+                    if entry is None:
+                        entry = self.predict[A][t] = list(self.default[A])
+                    if not entry or entry[-1] != p:
+                        entry.append(p)
+
+    def token_codes(self, input_tokens):
+        index = self.symbols.index
+        return [index.get(tok, UNKNOWN_TOKEN) if tok != 'eps' else UNKNOWN_TOKEN
+                for tok in input_tokens]
+
+    def name(self, c):
+        return self.terminals[c] if c < self.T else self.non_terminals[c - self.T]
+
+
+class EarleyChart:
+    """
+    Result of one run: `sets` (per position: number of items, predicted
+    non-terminals), `families` (the SPPF: node -> list of families), the
+    root node if the input was accepted, else the position of the error
+    and the terminals that were expected there.
+
+    SPPF nodes are (label, start, end) tuples: label is the symbol code for
+    symbol nodes and -(item + 1) for intermediate nodes. Families of a
+    symbol node are (production, left, right), those of an intermediate node
+    (left, right); left is the intermediate node of the shorter prefix (None
+    at the start of the production), right the node of the last symbol.
+    """
+
+    def __init__(self, grammar, input_tokens):
+        self.grammar = grammar
+        self.input_tokens = input_tokens
+        self.sets = []
+        self.families = {}
+        self.root = None
+        self.error_position = None
+        self.expected = []
+
+    @property
+    def accepted(self):
+        return self.root is not None
+
+
+def earley_run(g, input_tokens, forest=True, deadline=None):
+    """
+    Runs the recognizer over input_tokens (without the trailing '$').
+    With forest=False no SPPF families are kept (accept/reject only).
+    deadline: time.monotonic() value past which TimeoutError is raised
+    (a thread cannot be stopped from outside, so the run checks it itself).
+    """
+    chart = EarleyChart(g, input_tokens)
+    families = chart.families
+    codes = g.token_codes(input_tokens)
+    n = len(codes)
+    codes.append(1)   # '$'
+    T = g.T
+    next_sym, item_prod, item_base, lhs = g.next_sym, g.item_prod, g.item_base, g.lhs
+    predict, default, nullable = g.predict, g.default, g.nullable
+    width = n + 1
+
+    waiting_sets = []       # per position: {non-terminal code: [entries waiting for it]}
+
+    lookahead = g.lookahead
+    missed = 0              # lookaheads of the items the current set turned away
+
+    def add(index, worklist, k, item, origin, left, right, token_bit=0):
+        """
+        Adds the entry (item, origin) to set k, with one more SPPF family.
+        With a token_bit, items that cannot continue with that token are dropped.
+        """
+        nonlocal missed
+        if token_bit and not lookahead[item] & token_bit:
+            missed |= lookahead[item]
+            return
+        s = next_sym[item]
+        if s == -1:
+            node = (lhs[item_prod[item]], origin, k)
+            family = (item_prod[item], left, right)
+        elif left is None and right is None:
+            node = family = None
+        else:
+            node = (-item - 1, origin, k)
+            family = (left, right)
+        if forest and family is not None:
+            known = families.get(node)
+            if known is None:
+                families[node] = [family]
+            elif family not in known:
+                known.append(family)
+        key = item * width + origin
+        if key not in index:
+            index[key] = node
+            worklist.append((item, origin, node))
+
+    index, entries = {}, []
+    missed = g.first[g.start_code - T] & ~EPS   # expected at position 0
+    token_bit = 1 << codes[0] if codes[0] >= 0 else 1 << T   # no item has bit T
+    for p in predict[g.start_code - T].get(codes[0], default[g.start_code - T]):
+        add(index, entries, 0, item_base[p], 0, None, None, token_bit)
+
+    for k in range(n + 1):
+        if k:
+            index, entries = next_index, next_list
+            missed = 0
+        next_index, next_list = {}, []
+        token = codes[k]
+        token_bit = 1 << token if token >= 0 else 1 << T
+        waiting = {}
+        waiting_sets.append(waiting)
+        completed = set()
+
+        i = 0
+        while i < len(entries):
+            if deadline is not None and not i & 1023 and time.monotonic() > deadline:
+                raise TimeoutError(f"Earley parse stopped at token {k} of {n}: deadline reached.")
+            entry = entries[i]
+            i += 1
+            item, origin, node = entry
+            s = next_sym[item]
+            if s == -1:
+                if node in completed:
+                    continue
+                completed.add(node)
+                for w_item, w_origin, w_node in waiting_sets[origin].get(node[0], ()):
+                    add(index, entries, k, w_item + 1, w_origin, w_node, node, token_bit)
+            elif s < T:
+                if s == token:
+                    add(next_index, next_list, k + 1, item + 1, origin, node, (s, k, k + 1))
+            else:
+                waiters = waiting.get(s)
+                if waiters is None:
+                    waiters = waiting[s] = []
+                    for p in predict[s - T].get(token, default[s - T]):
+                        add(index, entries, k, item_base[p], k, None, None, token_bit)
+                waiters.append(entry)
+                if nullable[s]:
+                    # Aycock-Horspool: B =>* eps, so step over it now; the
+                    # node (B, k, k) gets its families when B completes here
+                    add(index, entries, k, item + 1, origin, node, (s, k, k), token_bit)
+
+        chart.sets.append((len(entries), list(waiting)))
+        if k < n and not next_list:
+            chart.error_position = k
+            chart.expected = _expected(g, entries, waiting, missed, token_bit)
+            return chart
+
+    root = (g.start_code, 0, n)
+    if root in completed:
+        chart.root = root
+    else:
+        chart.error_position = n
+        chart.expected = _expected(g, entries, waiting, missed, token_bit)
+    return chart
+
+
+def _expected(g, entries, waiting, missed, token_bit):
+    """
+    Tokens the items of the failed set (kept or turned away) and the
+    non-terminals predicted there could have continued with.
+    """
+    lookahead, first, T = g.lookahead, g.first, g.T
+    mask = missed
+    for item, _, _ in entries:
+        mask |= lookahead[item]
+    for B in waiting:
+        mask |= first[B - T]
+    return g.symbols.to_list(mask & ~token_bit & ~EPS)
+
+
+# ----- reading trees out of the forest -----
+
+def _leaf(name):
+    return {"name": name, "children": []}
+
+
+def _min_heights(families, root):
+    """
+    Height of the smallest derivation below every node reachable from root
+    (fixed point). Only needed when a cyclic grammar (A =>+ A) puts cycles
+    into the forest.
+    """
+    reachable = []
+    seen = {root}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        reachable.append(node)
+        for family in families.get(node, ()):
+            for child in family[-2:]:
+                if child is not None and child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+
+    inf = float("inf")
+    height = {node: (0 if node not in families else inf) for node in reachable}
+    changed = True
+    while changed:
+        changed = False
+        for node in reachable:
+            best = height[node]
+            for family in families.get(node, ()):
+                h = 1 + max((height[c] for c in family[-2:] if c is not None), default=0)
+                if h < best:
+                    best = h
+            if best < height[node]:
+                height[node] = best
+                changed = True
+    return height
+
+
+def forest_to_tree(chart):
+    """
+    One derivation of the accepted input as the parse_tree JSON of the LL(1)
+    simulator (eps productions get an "eps" leaf). Returns (tree, ambiguous);
+    ambiguous is True when the forest holds more than one derivation.
+    Built iteratively, so long inputs do not hit the recursion limit.
+    """
+    g, families = chart.grammar, chart.families
+    T = g.T
+    ambiguous = False
+    heights = None
+
+    def choose(node, avoid):
+        nonlocal heights
+        options = families[node]
+        if heights is not None:
+            return min(options, key=lambda f: max((heights[c] for c in f[-2:] if c is not None), default=0))
+        for family in options:
+            if family[-1] is None or family[-1] not in avoid:
+                return family
+        return None
+
+    while True:
+        root_out = _leaf(g.name(chart.root[0]))
+        stack = [(chart.root, root_out, False)]
+        on_path = set()
+        stuck = False
+        while stack:
+            node, out, leaving = stack.pop()
+            if leaving:
+                on_path.discard(node)
+                continue
+            on_path.add(node)
+            stack.append((node, out, True))
+            if len(families[node]) > 1:
+                ambiguous = True
+            family = choose(node, on_path)
+            if family is None:
+                stuck = True
+                break
+            p, left, right = family
+            children = [] if right is None else [right]
+            while left is not None:
+                if len(families[left]) > 1:
+                    ambiguous = True
+                left_family = choose(left, on_path)
+                if left_family is None:
+                    stuck = True
+                    break
+                left, right = left_family
+                children.append(right)
+            if stuck:
+                break
+            if not children:
+                out["children"].append(_leaf("eps"))
+                continue
+            children.reverse()
+            for child in children:
+                child_out = _leaf(g.name(child[0]))
+                out["children"].append(child_out)
+                if child[0] >= T:
+                    stack.append((child, child_out, False))
+        if not stuck:
+            return root_out, ambiguous
+        heights = _min_heights(families, chart.root)
+
+
+# ----- API -----
+
+def _trace_steps(chart):
+    """One step per Earley set, in the {"stack", "input", "action"} shape of the other simulators."""
+    g, tokens = chart.grammar, chart.input_tokens + ['$']
+    steps = []
+    for k, (n_items, predicted) in enumerate(chart.sets):
+        step = {
+            "stack": ["$"] + [g.name(c) for c in reversed(predicted)],
+            "input": tokens[k:],
+            "action": "",
+        }
+        if k == chart.error_position:
+            step["action"] = (f"ERROR: Unexpected token '{tokens[k]}' at position {k}"
+                              f" (expected: {', '.join(chart.expected)})")
+        elif k == len(tokens) - 1:
+            step["action"] = "Accepted"
+        else:
+            step["action"] = f"Scan '{tokens[k]}' ({n_items} items)"
+        steps.append(step)
+    return steps
+
+
+def earley_recognize(g, input_string, deadline=None):
+    """Accept/reject only (no forest). Returns "Accepted" or "Rejected"."""
+    chart = earley_run(g, split_input(input_string), forest=False, deadline=deadline)
+    return "Accepted" if chart.accepted else "Rejected"
+
+
+def earley_parse_to_dict(g, input_string, tree_format="nested", deadline=None):
+    """
+    Same keys as parse_to_dict, plus "ambiguous". On a rejected input the
+    tree is just the start symbol. tree_format="columns" gives the tree as
+    ParseTree.to_columns(). deadline: see earley_run.
+    """
+    chart = earley_run(g, split_input(input_string), deadline=deadline)
+    if chart.accepted:
+        tree, ambiguous = forest_to_tree(chart)
+        status = "Accepted"
+    else:
+        tree, ambiguous = _leaf(g.start_symbol), False
+        status = "Rejected"
+    if tree_format == "columns":
+        tree = ParseTree.from_dict(tree, g.non_terminals).to_columns()
+    return {"trace_steps": _trace_steps(chart), "parse_tree": tree, "result": status,
+            "ambiguous": ambiguous}
@@ -0,0 +1,187 @@
+# error_recovery.py
+#
+# LL(1) parsing that does not stop at the first error. In one pass over the
+# input every error is reported with its token position, and the parser
+# recovers and goes on:
+#
+# - phrase level: a terminal on top of the stack that does not match is
+#   taken as missing (popped, as if it had been inserted);
+# - panic mode: a non-terminal A without a table entry for the token skips
+#   input until a token A has an entry for (A is then expanded as usual) or
+#   a synchronization token of A: FOLLOW(A) and '$'. On one of those A is
+#   popped, as if it had derived the text skipped so far.
+#
+# Every step either consumes a token or pops a stack symbol that an
+# expansion pushed, so recovery keeps the parse linear. The expected tokens
+# of each table row and the synchronization sets are computed once per
+# grammar (RecoveryTable, cached on the CompiledGrammar).
+from grammar_utils import split_input
+from parse_tree import ParseTree
+from parser_simulator import (ParseTrace, MATCH, EXPAND, ERROR, SKIP, MISSING,
+                              _token_codes)
+from parsing_table import NO_RULE
+
+
+class RecoveryTable:
+    """
+    Per non-terminal: the terminals its table row has an entry for (as a
+    name list for diagnostics) and its synchronization set (FOLLOW + '$',
+    as a bitmask over terminal IDs).
+    """
+
+    def __init__(self, table, follow_masks):
+        self.table = table
+        end = 1 << table.t_index['$']
+        self.expected = []
+        self.sync = []
+        for nt_id, nt in enumerate(table.non_terminals):
+            self.expected.append([table.terminals[t] for t in sorted(table.row(nt_id))])
+            self.sync.append(follow_masks[nt] | end)
+
+
+def _error(position, token, expected, recovery):
+    return {"position": position, "token": token, "expected": expected,
+            "recovery": recovery, "skipped": 0}
+
+
+def _drive_recovering(recovery, start_symbol, input_tokens, token_codes, parse_tree, errors):
+    """
+    Same deltas as parser_simulator._drive plus SKIP and MISSING, and it
+    goes on after ERROR (the non-terminal is popped). Errors are appended
+    to `errors`; parse_tree may be None.
+    """
+    table = recovery.table
+    n_terminals = table.n_terminals
+    row_of, base, check, values = table.rows.arrays
+    push_codes = table.push_codes
+    child_codes = table.child_codes
+    names = table.names
+    row_expected = recovery.expected
+    sync = recovery.sync
+    last = len(token_codes) - 1     # the '$'
+
+    end = table.t_index['$']
+    stack = [end, table.code(start_symbol)]
+    tree_stack = [0] if parse_tree is not None else None
+    pointer = 0
+    # Last error, until a token is matched: errors at the position it
+    # reached are the same error (one report per recovery)
+    error = None
+
+    def report(expected, recovery):
+        nonlocal error
+        if error is None or error["position"] + error["skipped"] != pointer:
+            error = _error(pointer, input_tokens[pointer], expected, recovery)
+            errors.append(error)
+        return error
+
+    # A '$' inside a production can consume the end marker early
+    while stack and pointer <= last:
+        top = stack[-1]
+        code = token_codes[pointer]
+
+        if top == code:
+            yield MATCH, 0
+            stack.pop()
+            if tree_stack:
+                node = tree_stack.pop()
+                parse_tree.start[node] = pointer
+                parse_tree.end[node] = pointer + 1
+            pointer += 1
+            error = None
+            continue
+
+        if top == end:
+            # Input after a complete parse: skip it up to the '$'
+            report(['$'], "skip")["skipped"] += 1
+            yield SKIP, 0
+            pointer += 1
+            continue
+
+        if top < n_terminals:
+            # Phrase level: the expected terminal is missing
+            yield MISSING, 0
+            stack.pop()
+            if tree_stack:
+                tree_stack.pop()
+            report([names[top]], "insert")
+            continue
+
+        nt_id = top - n_terminals
+        p = NO_RULE
+        if code >= 0:
+            r = row_of[nt_id]
+            i = base[r] + code
+            if check[i] == r:
+                p = values[i]
+        if p != NO_RULE:
+            yield EXPAND, p
+            stack.pop()
+            stack.extend(push_codes[p])
+            if tree_stack:
+                node = tree_stack.pop()
+                parse_tree.start[node] = pointer
+                children = child_codes[p]
+                first = parse_tree.expand(node, children)
+                tree_stack.extend(range(first + len(children) - 1, first - 1, -1))
+            continue
+
+        # Panic mode
+        current = report(row_expected[nt_id], "skip")
+        if code >= 0 and sync[nt_id] >> code & 1 or pointer == last:
+            yield ERROR, top
+            stack.pop()
+            if tree_stack:
+                tree_stack.pop()
+            if current["recovery"] != "insert":
+                current["recovery"] = "skip+pop" if current["skipped"] else "pop"
+            continue
+        yield SKIP, 0
+        pointer += 1
+        current["skipped"] += 1
+
+    if stack:
+        errors.append(_error(last, input_tokens[last], [names[stack[-1]]], "stop"))
+
+
+def parse_with_recovery(recovery, start_symbol, input_string, build_tree=True):
+    """
+    Parses the whole input, recovering from errors.
+    Returns (ParseTrace, ParseTree or None, status, errors); status is
+    "Accepted" only if there were no errors. Each error is
+    {"position", "token", "expected", "recovery", "skipped"}: the token
+    position, the tokens the parser could have used there (from the
+    precomputed row), and what it did: "insert" (a missing terminal),
+    "skip" (tokens skipped until the non-terminal could go on), "pop" or
+    "skip+pop" (the non-terminal given up at a synchronization token), or
+    "stop" (the input ended before the stack).
+    """
+    table = recovery.table
+    input_tokens = split_input(input_string) + ['$']
+    trace = ParseTrace(table, start_symbol, input_tokens)
+    kinds = trace.kinds
+    args = trace.args
+    parse_tree = ParseTree(table.names, table.code(start_symbol)) if build_tree else None
+    errors = []
+
+    for kind, arg in _drive_recovering(recovery, start_symbol, input_tokens,
+                                       _token_codes(table, input_tokens), parse_tree, errors):
+        kinds.append(kind)
+        args.append(arg)
+    if parse_tree is not None:
+        parse_tree.close_spans()
+    trace.accepted = not errors
+    return trace, parse_tree, "Rejected" if errors else "Accepted", errors
+
+
+def recover_errors(recovery, start_symbol, input_string):
+    """Only the errors (no trace, no tree): {"result", "errors"}."""
+    _, _, status, errors = parse_with_recovery(recovery, start_symbol, input_string, build_tree=False)
+    return {"result": status, "errors": errors}
+
+
+def parse_to_dict_with_recovery(recovery, start_symbol, input_string, tree_format="nested"):
+    """parse_to_dict with error recovery: the same keys plus "errors"."""
+    trace, tree, status, errors = parse_with_recovery(recovery, start_symbol, input_string)
+    tree = tree.to_columns() if tree_format == "columns" else tree.to_dict()
+    return {"trace_steps": trace.to_list(), "parse_tree": tree, "result": status, "errors": errors}
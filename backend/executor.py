@@ -0,0 +1,214 @@
+# executor.py
+#
+# Bounded executor for the CPU-heavy work behind the async routes in
+# main.py (compiling grammars, building traces and trees). A job needs one
+# of a fixed number of slots. While every slot is busy it waits in a queue
+# of bounded depth; when the queue is full it is refused (OverloadedError)
+# instead of piling up. Each job runs in one of three places, by cost:
+#   inline : cheaper than INLINE_COST, run directly on the event loop,
+#            without a slot, so cheap requests never wait behind big ones
+#   process: PROCESS_COST or more, on the process pool of batch_parser
+#   thread : everything else, and work that cannot be pickled
+# Every job has a deadline covering queueing and running. A job that times
+# out or whose client goes away is cancelled if it has not started. A
+# running job keeps its slot until it really finishes, so the pools are
+# never oversubscribed.
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import batch_parser
+
+# Number of jobs running at once (thread + process tiers)
+EXECUTOR_SLOTS = int(os.environ.get("PARSE_EXECUTOR_SLOTS", batch_parser.PARSE_WORKERS))
+
+# Jobs allowed to wait for a slot before new ones are refused
+MAX_QUEUE_DEPTH = int(os.environ.get("PARSE_MAX_QUEUE", 64))
+
+# Cost thresholds (roughly: characters of grammar or input text)
+INLINE_COST = int(os.environ.get("PARSE_INLINE_COST", 2000))
+PROCESS_COST = int(os.environ.get("PARSE_PROCESS_COST", 100000))
+
+# Default and largest per-request timeout, in seconds
+MAX_TIMEOUT = float(os.environ.get("PARSE_TIMEOUT", 30))
+
+
+class OverloadedError(Exception):
+    """The job queue is full."""
+
+
+class JobTimeoutError(Exception):
+    """The job did not finish before its deadline."""
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the job finished."""
+
+
+class BoundedExecutor:
+    """
+    Slots + bounded wait queue in front of a thread pool and a process pool.
+    The state is guarded by a threading.Lock (not asyncio primitives), so
+    one executor can serve several event loops.
+    """
+
+    def __init__(self, slots=EXECUTOR_SLOTS, max_queue=MAX_QUEUE_DEPTH,
+                 inline_cost=INLINE_COST, process_cost=PROCESS_COST,
+                 max_timeout=MAX_TIMEOUT):
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.inline_cost = inline_cost
+        self.process_cost = process_cost
+        self.max_timeout = max_timeout
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiters = deque()
+        self._threads = None
+        self.counters = {
+            "inline": 0, "thread": 0, "process": 0, "completed": 0,
+            "rejected": 0, "timeouts": 0, "cancelled": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _thread_pool(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(
+                    max_workers=self.slots, thread_name_prefix="cpu-job"
+                )
+            return self._threads
+
+    # ----- slots -----
+
+    async def _acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._running < self.slots and not self._waiters:
+                self._running += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise OverloadedError(
+                    f"Server is busy ({len(self._waiters)} jobs queued); retry later."
+                )
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, waiter))
+                    handed_over = False
+                except ValueError:
+                    handed_over = waiter.done() and not waiter.cancelled()
+            if handed_over:
+                # The slot reached us just as we were cancelled: pass it on
+                self._release()
+            raise
+
+    def _release(self):
+        with self._lock:
+            if not self._waiters:
+                self._running -= 1
+                return
+            # Hand the slot straight to the oldest waiter
+            loop, waiter = self._waiters.popleft()
+        loop.call_soon_threadsafe(self._wake, waiter)
+
+    def _wake(self, waiter):
+        if waiter.cancelled():
+            self._release()
+        else:
+            waiter.set_result(None)
+
+    # ----- jobs -----
+
+    def timeout_for(self, timeout):
+        """Clamps a requested timeout to (0, max_timeout]."""
+        if timeout is None or timeout <= 0:
+            return self.max_timeout
+        return min(timeout, self.max_timeout)
+
+    async def run(self, fn, *args, cost=0, timeout=None, processes=True,
+                  is_disconnected=None):
+        """
+        Runs fn(*args) and returns its result.
+        processes=False keeps the job out of the process pool (for callables
+        or arguments that cannot be pickled). is_disconnected is an optional
+        async callable (e.g. Request.is_disconnected): the job is cancelled
+        when it returns True.
+        Raises OverloadedError, JobTimeoutError or ClientDisconnected.
+        """
+        if cost < self.inline_cost:
+            self._count("inline")
+            return fn(*args)
+
+        job = asyncio.ensure_future(asyncio.wait_for(
+            self._run(fn, args, cost, processes), self.timeout_for(timeout)
+        ))
+        watcher = None
+        if is_disconnected is not None:
+            watcher = asyncio.ensure_future(_wait_disconnect(is_disconnected))
+        try:
+            await asyncio.wait({job} if watcher is None else {job, watcher},
+                               return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            job.cancel()
+            self._count("cancelled")
+            raise
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+        if not job.done():
+            job.cancel()
+            self._count("cancelled")
+            raise ClientDisconnected("Client disconnected.")
+        try:
+            return job.result()
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise JobTimeoutError(f"Job did not finish within {self.timeout_for(timeout)} s.")
+
+    async def _run(self, fn, args, cost, processes):
+        await self._acquire()
+        try:
+            if processes and cost >= self.process_cost and batch_parser.PARSE_WORKERS > 1:
+                tier, pool = "process", batch_parser.get_pool()
+            else:
+                tier, pool = "thread", self._thread_pool()
+            future = pool.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot follows the real job, not the request waiting for it
+        future.add_done_callback(lambda _: self._release())
+        self._count(tier)
+        result = await asyncio.wrap_future(future)
+        self._count("completed")
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "running": self._running,
+                "queue_depth": len(self._waiters),
+                "max_queue_depth": self.max_queue,
+                **self.counters,
+            }
+
+
+async def _wait_disconnect(is_disconnected, interval=0.25):
+    while not await is_disconnected():
+        await asyncio.sleep(interval)
+
+
+# Shared by the async routes in main.py
+cpu_executor = BoundedExecutor()
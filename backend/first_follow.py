@@ -1,105 +1,328 @@
 # first_follow.py
+from symbol_table import EPS, SymbolTable
 
-def compute_first(grammar):
+def nullable_non_terminals(grammar, stats=None):
     """
-    Compute FIRST sets for all non-terminals in the grammar.
+    Returns the set of non-terminals that can derive eps.
+    Worklist version: every production keeps a count of its not-yet-nullable
+    non-terminals, and a non-terminal becoming nullable only revisits the
+    productions it occurs in.
+    If a `stats` dict is given, the number of worklist iterations and of
+    nullable non-terminals are stored in it (see metrics.py).
+    """
+    nullable = set()
+    worklist = []
+    remaining = []  # per production: [lhs, number of non-terminals not known nullable]
+    occurrences = {nt: [] for nt in grammar}
+
+    for nt, productions in grammar.items():
+        for production in productions:
+            # A production with a real terminal can never be nullable ('eps' itself is)
+            if any(sym not in grammar and sym != 'eps' for sym in production):
+                continue
+            count = 0
+            for sym in production:
+                if sym in grammar:
+                    count += 1
+                    occurrences[sym].append(len(remaining))
+            remaining.append([nt, count])
+            if count == 0 and nt not in nullable:
+                nullable.add(nt)
+                worklist.append(nt)
+
+    iterations = 0
+    while worklist:
+        sym = worklist.pop()
+        iterations += 1
+        for prod_index in occurrences[sym]:
+            entry = remaining[prod_index]
+            entry[1] -= 1
+            if entry[1] == 0 and entry[0] not in nullable:
+                nullable.add(entry[0])
+                worklist.append(entry[0])
+    if stats is not None:
+        stats["iterations"] = iterations
+        stats["nullable"] = len(nullable)
+    return nullable
+
+
+def strongly_connected_components(nodes, edges):
+    """
+    Iterative Tarjan. Components are returned so that every component comes
+    after all the components it has edges to (dependencies first).
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(edges.get(root, ())))]
+
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(edges.get(child, ()))))
+                    break
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def _solve_inclusions(nodes, seeds, edges, stats=None):
+    """
+    Least solution of  S(n) = seeds[n] | (S(m) for m in edges[n]), over bitmasks.
+    Every member of a strongly connected component gets the same mask, so each
+    component is solved once, in dependency order, without any fixed-point loop.
+    With a `stats` dict, the sizes of the problem and of the solution are
+    stored in it: components take the place of fixed-point iterations.
     """
-    first = {nt: set() for nt in grammar}
-    terminals = {
-        sym
-        for prods in grammar.values()
-        for prod in prods
-        for sym in prod
-        if sym not in grammar and sym != 'eps'
-    }
+    solution = {}
+    components = strongly_connected_components(nodes, edges)
+    for component in components:
+        shared = 0
+        for node in component:
+            shared |= seeds[node]
+            for dep in edges.get(node, ()):
+                # Members of this component are not solved yet and contribute 0
+                shared |= solution.get(dep, 0)
+        for node in component:
+            solution[node] = shared
+    if stats is not None:
+        sizes = [mask.bit_count() for mask in solution.values()]
+        stats["components"] = len(components)
+        stats["largest_component"] = max(map(len, components), default=0)
+        stats["edges"] = sum(len(e) for e in edges.values())
+        stats["set_elements"] = sum(sizes)
+        stats["largest_set"] = max(sizes, default=0)
+    return solution
 
-    # Initialize with terminals
-    for t in terminals:
-        first[t] = {t}
 
+def compute_first_masks(grammar, symbols, nullable=None, stats=None):
+    """
+    FIRST sets as bitmasks over `symbols` (a SymbolTable).
+    The EPS bit is set for nullable non-terminals.
+    `nullable` can be passed in if it was already computed.
+    `stats`: optional dict filled by _solve_inclusions.
+    """
+    if nullable is None:
+        nullable = nullable_non_terminals(grammar)
+
+    # FIRST(A) gets every terminal that starts one of its productions directly,
+    # and FIRST(Y) - {eps} for every non-terminal Y in a nullable prefix of one.
+    seeds = {nt: 0 for nt in grammar}
+    edges = {nt: [] for nt in grammar}
+    for nt, productions in grammar.items():
+        for production in productions:
+            for symbol in production:
+                if symbol == 'eps':
+                    continue
+                if symbol in grammar:
+                    edges[nt].append(symbol)
+                    if symbol not in nullable:
+                        break
+                else:
+                    seeds[nt] |= symbols.bit(symbol)
+                    break
+
+    first = _solve_inclusions(grammar, seeds, edges, stats)
+    for nt in nullable:
+        first[nt] |= EPS
+    return first
+
+
+def compute_follow_masks(grammar, first, start_symbol, symbols, stats=None):
+    """
+    FOLLOW sets as bitmasks, from FIRST bitmasks. Symbols without an entry
+    in `first` are treated as terminals.
+    `stats`: optional dict filled by _solve_inclusions.
+    """
+    seeds = {nt: 0 for nt in grammar}
+    seeds[start_symbol] |= symbols.bit('$')
+    edges = {nt: [] for nt in grammar}
+
+    for A, productions in grammar.items():
+        for production in productions:
+            # Walk right to left, keeping FIRST(beta) - {eps} of the suffix seen so far
+            beta_first = 0
+            beta_nullable = True
+            for B in reversed(production):
+                if B in grammar:
+                    # Rule 2: FOLLOW(B) contains FIRST(beta) - {eps}
+                    seeds[B] |= beta_first
+                    # Rule 3: If beta =>* eps, FOLLOW(B) contains FOLLOW(A)
+                    if beta_nullable:
+                        edges[B].append(A)
+
+                symbol_first = first.get(B)
+                if symbol_first is None:
+                    symbol_first = symbols.bit(B)
+                if symbol_first & EPS:
+                    beta_first |= symbol_first & ~EPS
+                else:
+                    beta_first = symbol_first
+                    beta_nullable = False
+
+    return _solve_inclusions(grammar, seeds, edges, stats)
+
+
+def update_nullable(grammar, nullable, nodes):
+    """
+    Recomputes nullability for `nodes` only, in place. Every other
+    non-terminal keeps its entry in `nullable`, so no node may be needed
+    by a non-terminal outside `nodes`. Returns the nodes whose status changed.
+    """
+    before = {nt for nt in nodes if nt in nullable}
+    nullable.difference_update(nodes)
     changed = True
     while changed:
         changed = False
-        for nt, productions in grammar.items():
-            for production in productions:
-                # Rule: For X -> Y1 Y2 ... Yk
-                for symbol in production:
-                    # All of FIRST(Y1) - {eps} is in FIRST(X)
-                    first_y = first.get(symbol, {symbol}) # Handles terminals directly
-                    
-                    before_len = len(first[nt])
-                    first[nt].update(first_y - {'eps'})
-                    if len(first[nt]) > before_len:
-                        changed = True
-
-                    # If eps not in FIRST(Y1), then we stop.
-                    if 'eps' not in first_y:
+        for nt in nodes:
+            if nt in nullable:
+                continue
+            for production in grammar[nt]:
+                if all(sym == 'eps' or sym in nullable for sym in production):
+                    nullable.add(nt)
+                    changed = True
+                    break
+    return {nt for nt in nodes if (nt in nullable) != (nt in before)}
+
+
+def update_first_masks(grammar, symbols, nullable, first, nodes):
+    """
+    Recomputes FIRST for `nodes` only, in place. Non-terminals outside
+    `nodes` are taken as already solved (none of them may depend on a node).
+    Returns the nodes whose mask changed.
+    """
+    seeds = {nt: 0 for nt in nodes}
+    edges = {nt: [] for nt in nodes}
+    for nt in nodes:
+        for production in grammar[nt]:
+            for symbol in production:
+                if symbol == 'eps':
+                    continue
+                if symbol in grammar:
+                    if symbol in nodes:
+                        edges[nt].append(symbol)
+                    else:
+                        seeds[nt] |= first[symbol] & ~EPS
+                    if symbol not in nullable:
                         break
                 else:
-                    # If we finished the loop (all symbols' FIRST sets contained eps)
-                    # then add eps to FIRST(X)
-                    before_len = len(first[nt])
-                    first[nt].add('eps')
-                    if len(first[nt]) > before_len:
-                        changed = True
-    
-    # Remove terminals from the final dictionary if they were added
-    final_first = {k: v for k, v in first.items() if k in grammar}
-    return final_first
-
-def _first_of_sequence(sequence, first_sets):
-    """Helper to compute FIRST set for a sequence of symbols (e.g., beta)."""
-    result = set()
-    for symbol in sequence:
-        symbol_first = first_sets.get(symbol, {symbol})
-        result.update(symbol_first - {'eps'})
-        if 'eps' not in symbol_first:
-            return result
-    # If we get through the whole loop, it means all symbols can be eps
-    result.add('eps')
-    return result
+                    seeds[nt] |= symbols.bit(symbol)
+                    break
+
+    solution = _solve_inclusions(nodes, seeds, edges)
+    changed = set()
+    for nt, mask in solution.items():
+        if nt in nullable:
+            mask |= EPS
+        if first.get(nt) != mask:
+            changed.add(nt)
+        first[nt] = mask
+    return changed
+
+
+def update_follow_masks(grammar, first, follow, start_symbol, symbols, nodes, occurrences):
+    """
+    Recomputes FOLLOW for `nodes` only, in place. `occurrences[B]` lists the
+    non-terminals with B in one of their productions. FOLLOW of the others
+    must not depend on a node. Returns the nodes whose mask changed.
+    """
+    seeds = {nt: 0 for nt in nodes}
+    edges = {nt: [] for nt in nodes}
+    if start_symbol in seeds:
+        seeds[start_symbol] |= symbols.bit('$')
+
+    visited = set()
+    for B in nodes:
+        for A in occurrences.get(B, ()):
+            if A in visited:
+                continue
+            visited.add(A)
+            for production in grammar[A]:
+                beta_first = 0
+                beta_nullable = True
+                for sym in reversed(production):
+                    if sym in nodes:
+                        seeds[sym] |= beta_first
+                        if beta_nullable:
+                            if A in nodes:
+                                edges[sym].append(A)
+                            else:
+                                seeds[sym] |= follow[A]
+                    symbol_first = first.get(sym)
+                    if symbol_first is None:
+                        symbol_first = symbols.bit(sym)
+                    if symbol_first & EPS:
+                        beta_first |= symbol_first & ~EPS
+                    else:
+                        beta_first = symbol_first
+                        beta_nullable = False
+
+    solution = _solve_inclusions(nodes, seeds, edges)
+    changed = set()
+    for nt, mask in solution.items():
+        if follow.get(nt) != mask:
+            changed.add(nt)
+        follow[nt] = mask
+    return changed
+
+
+def compute_first(grammar):
+    """
+    Compute FIRST sets for all non-terminals in the grammar.
+    """
+    symbols = SymbolTable.from_grammar(grammar)
+    first = compute_first_masks(grammar, symbols)
+    return {nt: symbols.to_set(first[nt]) for nt in grammar}
 
 
 def compute_follow(grammar, first, start_symbol):
     """
     Compute FOLLOW sets for all non-terminals.
     """
-    follow = {nt: set() for nt in grammar}
-    follow[start_symbol].add('$')
-
-    changed = True
-    while changed:
-        changed = False
-        for A, productions in grammar.items():
-            for production in productions:
-                for i, B in enumerate(production):
-                    if B in grammar:  # B must be a non-terminal
-                        beta = production[i + 1:]
-                        
-                        before_len = len(follow[B])
-
-                        if beta:
-                            # Rule 2: FOLLOW(B) contains FIRST(beta) - {eps}
-                            first_beta = _first_of_sequence(beta, first)
-                            follow[B].update(first_beta - {'eps'})
-
-                            # Rule 3: If FIRST(beta) contains eps, FOLLOW(B) contains FOLLOW(A)
-                            if 'eps' in first_beta:
-                                follow[B].update(follow[A])
-                        else:
-                            # Rule 3: For A -> alpha B, FOLLOW(B) contains FOLLOW(A)
-                            follow[B].update(follow[A])
-
-                        if len(follow[B]) > before_len:
-                            changed = True
-    return follow
+    symbols = SymbolTable.from_grammar(grammar)
+    first_masks = {sym: symbols.mask(s) for sym, s in first.items()}
+    follow = compute_follow_masks(grammar, first_masks, start_symbol, symbols)
+    return {nt: symbols.to_set(follow[nt]) for nt in grammar}
 
 
 # Example usage
 if __name__ == "__main__":
+    import sys
     from grammar_utils import read_grammar
 
-    grammar = read_grammar("tests/sample_grammar.txt")
+    # read_grammar takes the grammar text, not a path
+    with open(sys.argv[1] if len(sys.argv) > 1 else "tests/sample_grammar.txt") as f:
+        grammar = read_grammar(f.read())
     start_symbol = list(grammar.keys())[0]
 
     first = compute_first(grammar)
@@ -0,0 +1,479 @@
+# grammar_cache.py
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from grammar_utils import read_grammar, detect_left_recursion, find_symbols
+from first_follow import compute_first_masks, compute_follow_masks, nullable_non_terminals
+from parsing_table import compile_parsing_table
+from symbol_table import SymbolTable
+from codegen import GeneratedParser
+from lalr import build_lalr_table
+from earley import EarleyGrammar
+from error_recovery import RecoveryTable
+from lexer import Lexer, read_token_definitions
+from serialize import AnalysisEncoding
+from shared_store import SharedGrammarStore
+from metrics import StageTimer, metrics
+
+
+def normalize_grammar_text(grammar_text):
+    """
+    Returns a canonical form of the grammar text.
+    Blank lines, comments and lines without '->' are dropped (read_grammar
+    ignores them too) and the whitespace inside every rule is collapsed,
+    so texts that only differ in formatting normalize to the same string.
+    Token definitions ('%' lines) are kept as they are, after the rules.
+    """
+    lines = []
+    token_lines = []
+    for line in grammar_text.strip().split('\n'):
+        line = line.strip()
+        if line.startswith("%"):
+            token_lines.append(line)
+            continue
+        if not line or line.startswith("#") or "->" not in line:
+            continue
+        lhs, rhs = line.split("->", 1)
+        alternatives = " | ".join(" ".join(prod.split()) for prod in rhs.split("|"))
+        lines.append(f"{lhs.strip()} -> {alternatives}")
+    return "\n".join(lines + token_lines)
+
+
+def grammar_key(grammar_text):
+    """Content hash of the normalized grammar text."""
+    normalized = normalize_grammar_text(grammar_text)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _estimate_size(obj, seen=None):
+    """Rough deep size (in bytes) of the dicts/lists/sets/strings we cache."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += _estimate_size(k, seen) + _estimate_size(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += _estimate_size(item, seen)
+    elif hasattr(obj, "__dict__"):
+        size += _estimate_size(vars(obj), seen)
+    return size
+
+
+class CompiledGrammar:
+    """
+    Everything the grammar pipeline produces for one grammar text:
+    the grammar itself, FIRST/FOLLOW sets, the LL(1) table and its conflicts.
+    FIRST/FOLLOW are kept as bitmasks over `symbols` and the table as a
+    CompiledTable; the `first`/`follow` string sets and the `parsing_table`
+    dict view are only built (once) when a response needs them.
+    If the grammar is left-recursive (directly or not) only `grammar`,
+    `recursive_rules` and `nullable` are filled in, the later stages are skipped.
+    `profile` holds the time and counters of each stage when the grammar was
+    compiled in this process tree (StageTimer.stages, see metrics.py).
+    `size` estimates the memory held: the compiled stages (`base_size`) plus
+    the products built on first use so far (`lazy_size`, see account).
+    """
+
+    def __init__(self, key, grammar, start_symbol, recursive_rules, symbols=None,
+                 first_masks=None, follow_masks=None, table=None, conflicts=None,
+                 nullable=None, size=None, profile=None, token_defs=None):
+        self.key = key
+        self.token_defs = token_defs or []
+        self.profile = profile
+        self.profile_recorded = False
+        self.nullable = nullable
+        self.grammar = grammar
+        self.start_symbol = start_symbol
+        self.recursive_rules = recursive_rules
+        self.symbols = symbols
+        self.first_masks = first_masks
+        self.follow_masks = follow_masks
+        self.table = table
+        self.conflicts = conflicts if conflicts is not None else []
+        self._first = None
+        self._follow = None
+        self._parsing_table = None
+        self._generated_parser = None
+        self._lalr = None
+        self._earley = None
+        self._encoding = None
+        self._recovery = None
+        self._lexer = None
+        # The GrammarCache holding this grammar, told when lazy products grow it
+        self.cache = None
+        if size is None:
+            size = _estimate_size(
+                (grammar, recursive_rules, symbols,
+                 first_masks, follow_masks, table, self.conflicts)
+            )
+        self.base_size = size
+        self.lazy_size = 0
+
+    def __getstate__(self):
+        # The cache (and its lock) stays in this process
+        state = self.__dict__.copy()
+        state["cache"] = None
+        return state
+
+    @property
+    def size(self):
+        return self.base_size + self.lazy_size
+
+    def account(self, product):
+        """
+        Adds a product built on first use to `size` (and to its cache's
+        total, which may evict entries) and returns it. What the compiled
+        stages already hold is not counted again.
+        """
+        seen = {id(self), id(self.grammar), id(self.symbols), id(self.table),
+                id(self.first_masks), id(self.follow_masks), id(self.conflicts)}
+        seen.update(id(p) for productions in self.grammar.values() for p in productions)
+        grown = _estimate_size(product, seen)
+        if self.cache is not None:
+            self.cache.resize(self, grown)
+        else:
+            self.lazy_size += grown
+        return product
+
+    @property
+    def valid(self):
+        return not self.recursive_rules and len(self.conflicts) == 0
+
+    @property
+    def first(self):
+        if self._first is None and self.first_masks is not None:
+            self._first = self.account(
+                {nt: self.symbols.to_set(m) for nt, m in self.first_masks.items()})
+        return self._first
+
+    @property
+    def follow(self):
+        if self._follow is None and self.follow_masks is not None:
+            self._follow = self.account(
+                {nt: self.symbols.to_set(m) for nt, m in self.follow_masks.items()})
+        return self._follow
+
+    @property
+    def parsing_table(self):
+        if self._parsing_table is None and self.table is not None:
+            self._parsing_table = self.account(self.table.to_dict())
+        return self._parsing_table
+
+    @property
+    def generated_parser(self):
+        """Generated-code recognizer (see codegen.py), built on first use. Needs a valid grammar."""
+        if self._generated_parser is None and self.valid:
+            self._generated_parser = self.account(
+                GeneratedParser(self.table, self.start_symbol, self.key))
+        return self._generated_parser
+
+    @property
+    def lalr(self):
+        """
+        LALR(1) tables (see lalr.py), built on first use. Unlike the LL(1)
+        table they also exist for left-recursive grammars.
+        """
+        if self._lalr is None:
+            start = time.perf_counter()
+            self._lalr = self.account(build_lalr_table(self.grammar, self.start_symbol, self.symbols,
+                                                       self.first_masks, self.nullable))
+            metrics.observe("ll1_stage_seconds", {"stage": "lalr"}, time.perf_counter() - start)
+        return self._lalr
+
+    @property
+    def lalr_built(self):
+        return self._lalr is not None
+
+    @property
+    def encoding(self):
+        """
+        Pre-encoded /analyze sections (see serialize.py), filled in as they
+        are requested; each section is accounted for when it is encoded.
+        """
+        if self._encoding is None:
+            self._encoding = AnalysisEncoding(self)
+        return self._encoding
+
+    @property
+    def recovery(self):
+        """Expected-token and synchronization sets for error recovery (see error_recovery.py). Needs a valid grammar."""
+        if self._recovery is None and self.valid:
+            self._recovery = self.account(RecoveryTable(self.table, self.follow_masks))
+        return self._recovery
+
+    @property
+    def lexer(self):
+        """
+        Lexer for the grammar's token definitions (see lexer.py), compiled on
+        first use; None when the grammar declares no tokens.
+        """
+        if self._lexer is None and self.token_defs:
+            self._lexer = self.account(Lexer(self.token_defs, find_symbols(self.grammar)[1]))
+        return self._lexer
+
+    @property
+    def earley(self):
+        """
+        Earley parser tables (see earley.py), built on first use. Work for
+        any grammar: the fallback when there is no LL(1) table.
+        """
+        if self._earley is None:
+            start = time.perf_counter()
+            self._earley = self.account(EarleyGrammar(self.grammar, self.start_symbol, self.symbols,
+                                                      self.first_masks, self.follow_masks, self.nullable))
+            metrics.observe("ll1_stage_seconds", {"stage": "earley"}, time.perf_counter() - start)
+        return self._earley
+
+
+def compile_grammar(grammar_text, key=None):
+    """
+    Runs the full pipeline (read -> left recursion check -> FIRST -> FOLLOW -> table)
+    for a grammar text and returns a CompiledGrammar.
+    """
+    timer = StageTimer()
+    if key is None:
+        key = grammar_key(grammar_text)
+    timer.lap("hash", bytes=len(grammar_text))
+
+    grammar = read_grammar(grammar_text)
+    start_symbol = list(grammar.keys())[0]
+    token_defs = read_token_definitions(grammar_text)
+    timer.lap("read_grammar", rules=len(grammar),
+              productions=sum(len(productions) for productions in grammar.values()))
+
+    nullable_stats = {}
+    nullable = nullable_non_terminals(grammar, nullable_stats)
+    timer.lap("nullable", **nullable_stats)
+    recursive_rules = detect_left_recursion(grammar, nullable)
+    timer.lap("left_recursion", recursive=len(recursive_rules))
+
+    if recursive_rules:
+        return _with_lexer(CompiledGrammar(key, grammar, start_symbol, recursive_rules,
+                                           nullable=nullable, profile=timer.stages,
+                                           token_defs=token_defs))
+
+    symbols = SymbolTable.from_grammar(grammar)
+    first_stats = {}
+    first = compute_first_masks(grammar, symbols, nullable, first_stats)
+    timer.lap("first", **first_stats)
+    follow_stats = {}
+    follow = compute_follow_masks(grammar, first, start_symbol, symbols, follow_stats)
+    timer.lap("follow", **follow_stats)
+    table, conflicts = compile_parsing_table(grammar, first, follow, symbols)
+    timer.lap("table", table_bytes=table.rows.nbytes, productions=len(table.productions),
+              conflicts=len(conflicts))
+    return _with_lexer(CompiledGrammar(key, grammar, start_symbol, recursive_rules, symbols,
+                                       first, follow, table, conflicts, nullable,
+                                       profile=timer.stages, token_defs=token_defs))
+
+
+def _with_lexer(compiled):
+    """Builds the lexer right away, so bad token patterns fail the compile."""
+    compiled.lexer
+    return compiled
+
+
+class RegistryFullError(Exception):
+    """Raised when registering a grammar would exceed the registry limits."""
+
+
+class GrammarCache:
+    """
+    LRU cache of compiled grammars keyed by the normalized grammar hash.
+    Entries are evicted (least recently used first) when either the
+    entry limit or the estimated memory limit is exceeded.
+
+    Grammars registered through `register` are pinned: they live outside
+    the LRU and stay available by ID until `unregister` is called. Pinned
+    grammars have their own entry and memory limits (`max_registered`,
+    `max_registered_bytes`); `register` raises RegistryFullError past them.
+
+    With a `shared_store` (see shared_store.py) misses are first looked up
+    in the store, compiled grammars are published to it, and registrations
+    are visible to every process using the same store.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024,
+                 max_registered=256, max_registered_bytes=64 * 1024 * 1024,
+                 shared_store=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_registered = max_registered
+        self.max_registered_bytes = max_registered_bytes
+        self.shared_store = shared_store
+        self._entries = OrderedDict()
+        self._pinned = {}
+        self._bytes = 0
+        self._pinned_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, grammar_text):
+        """Returns the compiled grammar for this text, compiling it on a miss."""
+        compiled = self.peek(grammar_text)
+        if compiled is None:
+            # Compile outside the lock so other grammars are not blocked
+            compiled = self.compile(grammar_text)
+        return compiled
+
+    def peek(self, grammar_text):
+        """Cache lookup only: the compiled grammar, or None on a miss (counted)."""
+        key = grammar_key(grammar_text)
+        with self._lock:
+            compiled = self._pinned.get(key)
+            if compiled is None:
+                compiled = self._entries.get(key)
+            if compiled is not None:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+            return None
+
+    def compile(self, grammar_text):
+        """The miss path of get(): compiles (or loads from the shared store) and caches."""
+        key = grammar_key(grammar_text)
+        if self.shared_store is not None:
+            compiled = self.shared_store.get_or_compile(
+                key, lambda: compile_grammar(grammar_text, key)
+            )
+        else:
+            compiled = compile_grammar(grammar_text, key)
+        self.put(compiled)
+        return compiled
+
+    def put(self, compiled):
+        # Fresh compiles carry their stage profile; feed it to /metrics once
+        if compiled.profile is not None and not compiled.profile_recorded:
+            compiled.profile_recorded = True
+            metrics.record_stages(compiled.profile)
+        with self._lock:
+            old = self._entries.pop(compiled.key, None)
+            if old is not None:
+                self._bytes -= old.size
+            compiled.cache = self
+            self._entries[compiled.key] = compiled
+            self._bytes += compiled.size
+            self._evict()
+
+    def resize(self, compiled, grown):
+        """
+        Grows an entry by `grown` bytes (a lazy product, see
+        CompiledGrammar.account), evicting entries if the LRU is now over
+        its memory limit.
+        """
+        with self._lock:
+            compiled.lazy_size += grown
+            key = compiled.key
+            if self._entries.get(key) is compiled:
+                self._bytes += grown
+                self._evict()
+            if self._pinned.get(key) is compiled:
+                self._pinned_bytes += grown
+
+    def register(self, compiled):
+        """
+        Pins a compiled grammar so it can be looked up by its key.
+        Raises RegistryFullError if that would exceed the registration limits.
+        """
+        with self._lock:
+            if compiled.key in self._pinned:
+                return compiled.key
+            if (len(self._pinned) >= self.max_registered
+                    or self._pinned_bytes + compiled.size > self.max_registered_bytes):
+                raise RegistryFullError(
+                    f"Grammar registry is full ({len(self._pinned)} grammars, "
+                    f"{self._pinned_bytes} bytes); unregister a grammar first."
+                )
+            compiled.cache = self
+            self._pinned[compiled.key] = compiled
+            self._pinned_bytes += compiled.size
+        if self.shared_store is not None:
+            self.shared_store.mark_registered(compiled)
+        return compiled.key
+
+    def unregister(self, key):
+        """Unpins a registered grammar. Returns False if the ID is unknown."""
+        shared = self.shared_store is not None and self.shared_store.unmark_registered(key)
+        return self._unpin(key) or shared
+
+    def _unpin(self, key):
+        with self._lock:
+            compiled = self._pinned.pop(key, None)
+            if compiled is None:
+                return False
+            self._pinned_bytes -= compiled.size
+            return True
+
+    def lookup(self, key):
+        """Returns a registered grammar by ID, or None."""
+        with self._lock:
+            compiled = self._pinned.get(key)
+        if self.shared_store is None:
+            return compiled
+
+        # Another worker may have registered or unregistered it
+        if not self.shared_store.is_registered(key):
+            if compiled is not None:
+                self._unpin(key)
+            return None
+        if compiled is None:
+            compiled = self.shared_store.load(key)
+            if compiled is not None:
+                try:
+                    self.register(compiled)
+                except RegistryFullError:
+                    pass  # still served, just not pinned in this worker
+        return compiled
+
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone exceeds max_bytes
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= old.size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+            self._bytes = 0
+            self._pinned_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "registered": len(self._pinned),
+                "registered_bytes": self._pinned_bytes,
+                "max_registered": self.max_registered,
+                "max_registered_bytes": self.max_registered_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "shared_store": self.shared_store.stats() if self.shared_store else None,
+            }
+
+
+# Shared by all routes in main.py. Setting GRAMMAR_STORE_DIR shares compiled
+# grammars between worker processes (uvicorn --workers, see shared_store.py).
+_store_dir = os.environ.get("GRAMMAR_STORE_DIR")
+grammar_cache = GrammarCache(shared_store=SharedGrammarStore(_store_dir) if _store_dir else None)
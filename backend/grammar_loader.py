@@ -0,0 +1,172 @@
+# grammar_loader.py
+#
+# Strict, streaming grammar loader. Same syntax as read_grammar
+# (LHS -> RHS1 | RHS2 ..., '#' comments, eps for epsilon), but malformed
+# lines are reported with their line and column instead of being skipped,
+# and the rules go into a GrammarStore: interned symbols and one flat
+# int array for all production bodies.
+import mmap
+from array import array
+
+
+class GrammarSyntaxError(ValueError):
+    """A malformed grammar line. line and column are 1-based."""
+
+    def __init__(self, message, line, column):
+        super().__init__(f"line {line}, column {column}: {message}")
+        self.message = message
+        self.line = line
+        self.column = column
+
+
+class GrammarStore:
+    """
+    Indexed rule storage. Every symbol name is interned once; production p
+    is body[offsets[p]:offsets[p + 1]] (symbol IDs) and lhs[p] is the ID of
+    its left-hand side. `rules` maps a non-terminal ID to its production
+    IDs, in definition order, and keeps the non-terminals in order too.
+    """
+
+    def __init__(self):
+        self.symbols = []
+        self.index = {}
+        self.rules = {}
+        self.lhs = array('i')
+        self.offsets = array('i', [0])
+        self.body = array('i')
+
+    def __len__(self):
+        return len(self.lhs)
+
+    def intern(self, name):
+        sym = self.index.get(name)
+        if sym is None:
+            sym = self.index[name] = len(self.symbols)
+            self.symbols.append(name)
+        return sym
+
+    def add_production(self, lhs, names):
+        """Appends production lhs -> names and returns its ID."""
+        lhs_id = self.intern(lhs)
+        p = len(self.lhs)
+        self.lhs.append(lhs_id)
+        self.body.extend(self.intern(name) for name in names)
+        self.offsets.append(len(self.body))
+        self.rules.setdefault(lhs_id, []).append(p)
+        return p
+
+    @property
+    def non_terminals(self):
+        return [self.symbols[nt] for nt in self.rules]
+
+    def production(self, p):
+        """Production p's right-hand side as a list of names."""
+        symbols = self.symbols
+        return [symbols[s] for s in self.body[self.offsets[p]:self.offsets[p + 1]]]
+
+    def to_dict(self):
+        """The {LHS: [[symbol, ...], ...]} grammar that read_grammar returns."""
+        return {
+            self.symbols[nt]: [self.production(p) for p in productions]
+            for nt, productions in self.rules.items()
+        }
+
+    @classmethod
+    def from_dict(cls, grammar):
+        store = cls()
+        for nt in grammar:
+            store.intern(nt)
+        for nt, productions in grammar.items():
+            for production in productions:
+                store.add_production(nt, production)
+        return store
+
+
+def _parse_line(store, line, lineno):
+    stripped = line.strip()
+    if not stripped or stripped.startswith("#") or stripped.startswith("%"):
+        # '%' lines are token definitions (see lexer.py)
+        return
+    indent = len(line) - len(line.lstrip())
+
+    arrow = line.find("->")
+    if arrow < 0:
+        raise GrammarSyntaxError("expected '->'", lineno, indent + 1)
+    lhs = line[:arrow].split()
+    if not lhs:
+        raise GrammarSyntaxError("missing left-hand side", lineno, arrow + 1)
+    if len(lhs) > 1:
+        column = line.index(lhs[1], line.index(lhs[0]) + len(lhs[0])) + 1
+        raise GrammarSyntaxError("left-hand side must be a single symbol", lineno, column)
+
+    start = arrow + 2
+    rhs = line[start:]
+    second = rhs.find("->")
+    if second >= 0:
+        raise GrammarSyntaxError("unexpected '->'", lineno, start + second + 1)
+
+    # Validate every alternative before adding any, so errors leave no partial rule
+    alternatives = []
+    for alternative in rhs.split("|"):
+        names = alternative.split()
+        if not names:
+            raise GrammarSyntaxError("empty alternative (write eps for epsilon)", lineno, start + 1)
+        alternatives.append(names)
+        start += len(alternative) + 1
+    for names in alternatives:
+        store.add_production(lhs[0], names)
+
+
+def _iter_lines(source, chunk_size):
+    """Text lines of a str, bytes-like object, mmap or (text/binary) file."""
+    if isinstance(source, str):
+        yield from source.splitlines()
+        return
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        view = source
+        start = 0
+        end = len(view)
+        while start < end:
+            stop = view.find(b"\n", start)
+            if stop < 0:
+                stop = end
+            yield bytes(view[start:stop]).decode("utf-8")
+            start = stop + 1
+        return
+
+    # File object: read in chunks, never the whole file at once
+    partial = source.read(0)
+    for chunk in iter(lambda: source.read(chunk_size), partial[:0]):
+        lines = (partial + chunk).split(b"\n" if isinstance(chunk, bytes) else "\n")
+        partial = lines.pop()
+        for line in lines:
+            yield line.decode("utf-8") if isinstance(line, bytes) else line
+    if partial:
+        yield partial.decode("utf-8") if isinstance(partial, bytes) else partial
+
+
+def load_grammar(source, chunk_size=64 * 1024):
+    """
+    Loads a grammar from a str, bytes-like object, mmap or file object into
+    a GrammarStore. Raises GrammarSyntaxError on the first malformed line.
+    """
+    store = GrammarStore()
+    for lineno, line in enumerate(_iter_lines(source, chunk_size), 1):
+        if isinstance(line, str) and line.endswith("\r"):
+            line = line[:-1]
+        _parse_line(store, line, lineno)
+    if not store.rules:
+        raise GrammarSyntaxError("grammar has no rules", 1, 1)
+    return store
+
+
+def load_grammar_file(path):
+    """load_grammar over a read-only memory map of the file."""
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            raise GrammarSyntaxError("grammar has no rules", 1, 1)
+        with buffer:
+            return load_grammar(buffer)
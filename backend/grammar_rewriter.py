@@ -49,4 +49,233 @@ def grammar_to_string(grammar):
     for nt, productions in grammar.items():
         rhs = " | ".join([" ".join(prod) for prod in productions])
         lines.append(f"{nt} -> {rhs}")
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
+
+# -------------------------------
+# Full repair pipeline
+# -------------------------------
+
+def _fresh_name(base, taken):
+    """base', base'', ... -- the first name not in `taken`."""
+    name = f"{base}'"
+    while name in taken:
+        name += "'"
+    taken.add(name)
+    return name
+
+
+def _concat(prefix, suffix):
+    """Joins two productions, dropping eps markers. An empty result is ['eps']."""
+    joined = [sym for sym in prefix if sym != 'eps'] + [sym for sym in suffix if sym != 'eps']
+    return joined or ['eps']
+
+
+def _dedupe(productions):
+    seen = set()
+    unique = []
+    for prod in productions:
+        key = tuple(prod)
+        if key not in seen:
+            seen.add(key)
+            unique.append(prod)
+    return unique
+
+
+def remove_useless_symbols(grammar, start_symbol):
+    """
+    Removes non-generating non-terminals (those that derive no terminal string)
+    and then the ones unreachable from the start symbol.
+    Linear in the grammar size (worklist + one graph walk).
+    Returns (new_grammar, removed_non_terminals).
+    """
+    # Generating: same counting worklist as the nullable computation
+    generating = set()
+    worklist = []
+    remaining = []
+    occurrences = {nt: [] for nt in grammar}
+    for nt, productions in grammar.items():
+        for production in productions:
+            count = 0
+            for sym in production:
+                if sym in grammar:
+                    count += 1
+                    occurrences[sym].append(len(remaining))
+            remaining.append([nt, count])
+            if count == 0 and nt not in generating:
+                generating.add(nt)
+                worklist.append(nt)
+    while worklist:
+        sym = worklist.pop()
+        for index in occurrences[sym]:
+            entry = remaining[index]
+            entry[1] -= 1
+            if entry[1] == 0 and entry[0] not in generating:
+                generating.add(entry[0])
+                worklist.append(entry[0])
+
+    if start_symbol not in generating:
+        raise ValueError(f"Start symbol '{start_symbol}' does not derive any terminal string.")
+
+    pruned = {}
+    for nt, productions in grammar.items():
+        if nt in generating:
+            pruned[nt] = [
+                prod for prod in productions
+                if all(sym in generating or sym not in grammar for sym in prod)
+            ]
+
+    reachable = {start_symbol}
+    stack = [start_symbol]
+    while stack:
+        for production in pruned[stack.pop()]:
+            for sym in production:
+                if sym in pruned and sym not in reachable:
+                    reachable.add(sym)
+                    stack.append(sym)
+
+    new_grammar = {nt: prods for nt, prods in pruned.items() if nt in reachable}
+    removed = [nt for nt in grammar if nt not in new_grammar]
+    return new_grammar, removed
+
+
+def _eliminate_direct(nt, productions, new_grammar, taken):
+    """Direct left recursion elimination for one non-terminal, with a fresh A' name."""
+    recursive = [prod[1:] for prod in productions if prod and prod[0] == nt]
+    if not recursive:
+        new_grammar[nt] = productions
+        return
+    base = [prod for prod in productions if not (prod and prod[0] == nt)]
+    if not base:
+        raise ValueError(f"Non-terminal '{nt}' has left recursion but no non-recursive base case.")
+
+    new_nt = _fresh_name(nt, taken)
+    new_grammar[nt] = [_concat(prod, [new_nt]) for prod in base]
+    # A -> A alone is a cycle that adds nothing; drop it
+    new_grammar[new_nt] = [_concat(alpha, [new_nt]) for alpha in recursive if alpha]
+    new_grammar[new_nt].append(['eps'])
+
+
+def eliminate_left_recursion(grammar, nullable=None):
+    """
+    Removes direct and indirect left recursion.
+    Only the non-terminals in left-recursive strongly connected components of
+    the left-corner graph are rewritten (ordering + substitution, then direct
+    elimination, as in the textbook algorithm); the rest of the grammar is
+    copied as-is, so the cost stays near-linear when recursive components are
+    small. Left recursion hidden behind a nullable prefix cannot be removed
+    this way and raises ValueError.
+    """
+    from first_follow import nullable_non_terminals, strongly_connected_components
+    from grammar_utils import _left_corner_graph, detect_left_recursion
+
+    if nullable is None:
+        nullable = nullable_non_terminals(grammar)
+    edges = _left_corner_graph(grammar, nullable)
+    taken = set(grammar)
+
+    rewritten = {nt: [list(prod) for prod in productions] for nt, productions in grammar.items()}
+    added = {}
+    for component in strongly_connected_components(grammar, edges):
+        if len(component) == 1 and component[0] not in edges[component[0]]:
+            continue
+        members = set(component)
+        order = [nt for nt in grammar if nt in members]
+        for i, A in enumerate(order):
+            productions = rewritten[A]
+            # Substitute A -> Aj gamma for every earlier Aj, in order
+            for Aj in order[:i]:
+                if not any(prod and prod[0] == Aj for prod in productions):
+                    continue
+                substituted = []
+                for prod in productions:
+                    if prod and prod[0] == Aj:
+                        substituted.extend(_concat(delta, prod[1:]) for delta in rewritten[Aj])
+                    else:
+                        substituted.append(prod)
+                productions = _dedupe(substituted)
+
+            new_nts = {}
+            _eliminate_direct(A, productions, new_nts, taken)
+            rewritten[A] = new_nts.pop(A)
+            added.update(new_nts)
+
+    rewritten.update(added)
+    still_recursive = detect_left_recursion(rewritten)
+    if still_recursive:
+        raise ValueError(
+            "Left recursion through nullable symbols could not be removed automatically "
+            f"in non-terminal(s): {', '.join(still_recursive)}"
+        )
+    return rewritten
+
+
+def left_factor(grammar):
+    """
+    Left-factors every non-terminal: alternatives that share a prefix are
+    merged as A -> prefix A' with A' -> (the different suffixes).
+    This walks the prefix trie of each non-terminal's alternatives one level
+    at a time, so every symbol is looked at a bounded number of times.
+    """
+    taken = set(grammar)
+    new_grammar = {}
+
+    def factor(nt, productions):
+        productions = _dedupe(productions)
+        groups = {}
+        for prod in productions:
+            first = prod[0] if prod and prod != ['eps'] else None
+            groups.setdefault(first, []).append(prod)
+
+        result = []
+        for first, group in groups.items():
+            if first is None or len(group) == 1:
+                result.extend(group)
+                continue
+            # Longest common prefix of the group: walk down the trie while it does not branch
+            prefix_len = 1
+            shortest = min(len(prod) for prod in group)
+            while prefix_len < shortest and len({prod[prefix_len] for prod in group}) == 1:
+                prefix_len += 1
+            new_nt = _fresh_name(nt, taken)
+            result.append(group[0][:prefix_len] + [new_nt])
+            new_grammar[new_nt] = None  # reserve the slot, keeps A' right after A
+            factor(new_nt, [prod[prefix_len:] or ['eps'] for prod in group])
+        new_grammar[nt] = result
+
+    for nt, productions in grammar.items():
+        new_grammar[nt] = None
+        factor(nt, productions)
+    return new_grammar
+
+
+def repair_grammar(grammar, start_symbol=None, nullable=None):
+    """
+    Full automatic repair: useless symbol removal, left recursion elimination
+    (direct and indirect), left factoring, and a final cleanup of symbols the
+    rewrites made unreachable.
+    Returns (new_grammar, changes) where changes lists what was done.
+    """
+    if start_symbol is None:
+        start_symbol = next(iter(grammar))
+    changes = []
+
+    new_grammar, removed = remove_useless_symbols(grammar, start_symbol)
+    if removed:
+        changes.append(f"Removed useless non-terminal(s): {', '.join(removed)}")
+        nullable = None  # the grammar changed, recompute below
+
+    from grammar_utils import detect_left_recursion
+    recursive = detect_left_recursion(new_grammar, nullable)
+    if recursive:
+        new_grammar = eliminate_left_recursion(new_grammar, nullable)
+        changes.append(f"Eliminated left recursion in: {', '.join(recursive)}")
+
+    factored = left_factor(new_grammar)
+    if len(factored) != len(new_grammar):
+        changes.append("Left-factored common prefixes")
+    new_grammar = factored
+
+    new_grammar, removed = remove_useless_symbols(new_grammar, start_symbol)
+    if removed:
+        changes.append(f"Removed unreachable non-terminal(s): {', '.join(removed)}")
+    return new_grammar, changes
@@ -5,12 +5,13 @@ def read_grammar(grammar_text): # Changed parameter from file_path
     Reads a grammar from a multi-line string.
     Each line: LHS -> RHS1 | RHS2 ...
     RHS symbols are space-separated, epsilon = eps
+    Lines starting with '%' are token definitions (see lexer.py).
     """
     grammar = {}
     # Split the input string into lines
     for line in grammar_text.strip().split('\n'):
         line = line.strip()
-        if not line or line.startswith("#"):
+        if not line or line.startswith("#") or line.startswith("%"):
             continue
         
         # Check for '->' to ensure it's a valid rule line
@@ -29,6 +30,16 @@ def read_grammar(grammar_text): # Changed parameter from file_path
             
     return grammar
 
+
+def split_input(input_string):
+    """
+    Token names of a parser input: a string is split on whitespace, a list
+    or any other iterable of names (e.g. Lexer.names()) is taken as is.
+    """
+    if isinstance(input_string, str):
+        return input_string.split()
+    return list(input_string)
+
 # ... rest of the file
 
 
@@ -70,6 +81,42 @@ def detect_direct_left_recursion(grammar):
 
     return recursive_non_terminals
 
+
+def _left_corner_graph(grammar, nullable):
+    """A -> B when B can be the leftmost symbol of a sentential form derived from A in one step."""
+    edges = {nt: [] for nt in grammar}
+    for nt, productions in grammar.items():
+        for production in productions:
+            for symbol in production:
+                if symbol == 'eps':
+                    continue
+                if symbol not in grammar:
+                    break
+                edges[nt].append(symbol)
+                if symbol not in nullable:
+                    break
+    return edges
+
+
+def detect_left_recursion(grammar, nullable=None):
+    """
+    Detects direct, indirect and hidden (through a nullable prefix) left recursion.
+    Returns the left-recursive non-terminals, in grammar order.
+    Linear in the grammar size: one left-corner graph plus one SCC pass.
+    """
+    from first_follow import nullable_non_terminals, strongly_connected_components
+
+    if nullable is None:
+        nullable = nullable_non_terminals(grammar)
+    edges = _left_corner_graph(grammar, nullable)
+
+    recursive = set()
+    for component in strongly_connected_components(grammar, edges):
+        if len(component) > 1 or component[0] in edges[component[0]]:
+            recursive.update(component)
+    return [nt for nt in grammar if nt in recursive]
+
+
 # Example usage
 if __name__ == "__main__":
     grammar = read_grammar("tests/sample_grammar.txt")
@@ -0,0 +1,331 @@
+# incremental.py
+#
+# Incremental re-analysis for the grammar editor. An AnalysisSession keeps
+# the last grammar with its nullable set, FIRST/FOLLOW bitmasks and table
+# rows. update() diffs the new grammar rule by rule and re-solves only the
+# non-terminals whose results can depend on the changed rules:
+#   nullable: users of a changed rule through eps-only productions
+#   FIRST   : users through the left-corner graph
+#   FOLLOW  : symbols next to a changed rule or a changed FIRST set, plus
+#             everything their FOLLOW sets flow into
+# Only the table rows reading one of those results are rebuilt.
+import threading
+import uuid
+from collections import OrderedDict
+
+from grammar_utils import read_grammar, detect_left_recursion
+from first_follow import (
+    nullable_non_terminals, strongly_connected_components,
+    compute_first_masks, compute_follow_masks,
+    update_nullable, update_first_masks, update_follow_masks,
+)
+from parsing_table import build_table_row
+from symbol_table import EPS, SymbolTable
+
+
+def _in_eps_only_production(productions, sym, grammar):
+    """True if sym occurs in a production made only of non-terminals (and eps)."""
+    for production in productions:
+        if sym in production and all(s == 'eps' or s in grammar for s in production):
+            return True
+    return False
+
+
+def _in_left_corner(productions, sym, grammar, nullable):
+    """True if sym can start a production (after a nullable prefix)."""
+    for production in productions:
+        for s in production:
+            if s == 'eps':
+                continue
+            if s == sym:
+                return True
+            if s not in grammar or s not in nullable:
+                break
+    return False
+
+
+class AnalysisSession:
+    """
+    FIRST/FOLLOW/table analysis of one grammar that is edited over time.
+    The attributes mirror CompiledGrammar (grammar, start_symbol,
+    recursive_rules, nullable, first, follow, parsing_table, conflicts,
+    valid), so a session can be rendered like a cache entry.
+    `last_update` tells what the latest update() recomputed.
+    """
+
+    def __init__(self, grammar_text=None):
+        self.lock = threading.Lock()
+        self.grammar = None
+        self.start_symbol = None
+        self.recursive_rules = []
+        self.nullable = set()
+        self.symbols = None
+        self.first_masks = {}
+        self.follow_masks = {}
+        self.rows = {}
+        self.row_conflicts = {}
+        self.occurrences = {}   # symbol -> non-terminals with it in a production
+        self.first = {}
+        self.follow = {}
+        self.last_update = None
+        if grammar_text is not None:
+            self.update(grammar_text)
+
+    @property
+    def parsing_table(self):
+        if self.recursive_rules:
+            return None
+        return {nt: self.rows[nt] for nt in self.grammar}
+
+    @property
+    def conflicts(self):
+        if self.recursive_rules:
+            return []
+        return [c for nt in self.grammar for c in self.row_conflicts[nt]]
+
+    @property
+    def valid(self):
+        return not self.recursive_rules and not any(self.row_conflicts.values())
+
+    def update(self, grammar_text):
+        """Analyzes a new version of the grammar, reusing what the edit did not touch."""
+        grammar = read_grammar(grammar_text)
+        start_symbol = list(grammar.keys())[0]
+        if self.grammar is None or self.recursive_rules or start_symbol != self.start_symbol:
+            return self._rebuild(grammar, start_symbol)
+
+        old = self.grammar
+        changed = {nt for nt in grammar.keys() | old.keys() if grammar.get(nt) != old.get(nt)}
+        # A symbol that became (or stopped being) a non-terminal changes every rule using it
+        for sym in grammar.keys() ^ old.keys():
+            changed |= self.occurrences.get(sym, set())
+        self.grammar = grammar
+        if not changed:
+            self.last_update = self._stats("incremental", changed)
+            return self
+
+        self._update_occurrences(old, grammar, changed)
+        removed = old.keys() - grammar.keys()
+        for nt in removed:
+            self.nullable.discard(nt)
+            for store in (self.first_masks, self.follow_masks, self.first,
+                          self.follow, self.rows, self.row_conflicts):
+                store.pop(nt, None)
+        roots = {nt for nt in changed if nt in grammar}
+
+        # nullable
+        nullable_nodes = self._reverse_closure(
+            roots, lambda a, x: _in_eps_only_production(grammar[a], x, grammar)
+        )
+        nullable_changed = update_nullable(grammar, self.nullable, nullable_nodes)
+
+        # FIRST
+        first_nodes = self._reverse_closure(
+            roots | nullable_changed,
+            lambda a, x: _in_left_corner(grammar[a], x, grammar, self.nullable)
+        )
+        recursive = self._left_recursive(first_nodes)
+        if recursive:
+            # The table cannot be built; the next update starts over
+            self.recursive_rules = [nt for nt in grammar if nt in recursive]
+            self.last_update = self._stats("incremental", changed, nullable_nodes, first_nodes)
+            return self
+        for nt in roots:
+            for production in grammar[nt]:
+                for sym in production:
+                    if sym not in grammar:
+                        self.symbols.intern(sym)
+        first_changed = update_first_masks(
+            grammar, self.symbols, self.nullable, self.first_masks, first_nodes
+        )
+
+        # FOLLOW
+        follow_nodes = self._follow_nodes(old, changed, first_changed)
+        follow_changed = update_follow_masks(
+            grammar, self.first_masks, self.follow_masks, self.start_symbol,
+            self.symbols, follow_nodes, self.occurrences
+        )
+
+        # Table rows reading a changed rule, FIRST or FOLLOW set
+        rows = roots | follow_changed
+        for sym in first_changed:
+            rows.update(user for user in self.occurrences.get(sym, ())
+                        if _in_left_corner(grammar[user], sym, grammar, self.nullable))
+
+        to_set = self.symbols.to_set
+        for nt in first_changed:
+            self.first[nt] = to_set(self.first_masks[nt])
+        for nt in follow_changed:
+            self.follow[nt] = to_set(self.follow_masks[nt])
+        for nt in rows:
+            self._build_row(nt)
+
+        self.last_update = self._stats(
+            "incremental", changed, nullable_nodes, first_nodes, follow_nodes, rows
+        )
+        return self
+
+    def _rebuild(self, grammar, start_symbol):
+        """Full analysis; used for the first version and after left recursion."""
+        self.grammar = grammar
+        self.start_symbol = start_symbol
+        self.nullable = nullable_non_terminals(grammar)
+        self.occurrences = {}
+        self._update_occurrences({}, grammar, grammar.keys())
+        self.rows = {}
+        self.row_conflicts = {}
+        self.recursive_rules = detect_left_recursion(grammar, self.nullable)
+        if self.recursive_rules:
+            self.first_masks, self.follow_masks, self.first, self.follow = {}, {}, {}, {}
+            self.last_update = self._stats("full", grammar.keys())
+            return self
+
+        self.symbols = SymbolTable.from_grammar(grammar)
+        self.first_masks = compute_first_masks(grammar, self.symbols, self.nullable)
+        self.follow_masks = compute_follow_masks(
+            grammar, self.first_masks, start_symbol, self.symbols
+        )
+        self.first = {nt: self.symbols.to_set(m) for nt, m in self.first_masks.items()}
+        self.follow = {nt: self.symbols.to_set(m) for nt, m in self.follow_masks.items()}
+        for nt in grammar:
+            self._build_row(nt)
+        everything = set(grammar)
+        self.last_update = self._stats(
+            "full", everything, everything, everything, everything, everything
+        )
+        return self
+
+    def _build_row(self, nt):
+        self.rows[nt], self.row_conflicts[nt] = build_table_row(
+            nt, self.grammar, self.first_masks, self.follow_masks, self.symbols
+        )
+
+    def _update_occurrences(self, old, new, changed):
+        occurrences = self.occurrences
+        for nt in changed:
+            for production in old.get(nt, ()):
+                for sym in production:
+                    users = occurrences.get(sym)
+                    if users is not None:
+                        users.discard(nt)
+        for nt in changed:
+            for production in new.get(nt, ()):
+                for sym in production:
+                    occurrences.setdefault(sym, set()).add(nt)
+
+    def _reverse_closure(self, roots, depends):
+        """roots plus every non-terminal that (transitively) depends on one of them."""
+        seen = set(roots)
+        stack = list(roots)
+        while stack:
+            sym = stack.pop()
+            for user in self.occurrences.get(sym, ()):
+                if user not in seen and depends(user, sym):
+                    seen.add(user)
+                    stack.append(user)
+        return seen
+
+    def _left_recursive(self, nodes):
+        """
+        Left-recursive non-terminals among `nodes`. The previous version had
+        no left recursion, so a new cycle goes through a recomputed node, and
+        every node on it depends on that node (it is in `nodes` too).
+        """
+        grammar = self.grammar
+        edges = {}
+        for nt in nodes:
+            targets = edges[nt] = []
+            for production in grammar[nt]:
+                for sym in production:
+                    if sym == 'eps':
+                        continue
+                    if sym not in grammar:
+                        break
+                    if sym in nodes:
+                        targets.append(sym)
+                    if sym not in self.nullable:
+                        break
+        recursive = set()
+        for component in strongly_connected_components(nodes, edges):
+            if len(component) > 1 or component[0] in edges[component[0]]:
+                recursive.update(component)
+        return recursive
+
+    def _follow_nodes(self, old, changed, first_changed):
+        """Non-terminals whose FOLLOW set may differ after the edit."""
+        grammar = self.grammar
+        nodes = {nt for nt in changed if nt in grammar}
+        # Symbols of the old and new versions of the changed rules
+        for nt in changed:
+            for productions in (old.get(nt, ()), grammar.get(nt, ())):
+                for production in productions:
+                    nodes.update(sym for sym in production if sym in grammar)
+        # Symbols followed by a non-terminal whose FIRST set changed
+        for sym in first_changed:
+            for user in self.occurrences.get(sym, ()):
+                for production in grammar[user]:
+                    if sym not in production:
+                        continue
+                    last = len(production) - 1 - production[::-1].index(sym)
+                    nodes.update(s for s in production[:last] if s in grammar)
+
+        # FOLLOW(A) flows into the symbols that can end a production of A
+        stack = list(nodes)
+        while stack:
+            nt = stack.pop()
+            for production in grammar[nt]:
+                for sym in reversed(production):
+                    if sym == 'eps':
+                        continue
+                    if sym not in grammar:
+                        break
+                    if sym not in nodes:
+                        nodes.add(sym)
+                        stack.append(sym)
+                    if not self.first_masks[sym] & EPS:
+                        break
+        return nodes
+
+    def _stats(self, mode, changed, nullable=(), first=(), follow=(), rows=()):
+        return {
+            "mode": mode,
+            "changed_rules": sorted(changed),
+            "recomputed": {
+                "nullable": len(nullable),
+                "first": len(first),
+                "follow": len(follow),
+                "table_rows": len(rows),
+            },
+        }
+
+
+class SessionStore:
+    """Bounded LRU of analysis sessions, keyed by a random session ID."""
+
+    def __init__(self, max_sessions=256):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, session):
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+
+# Shared by the /analyze/sessions routes in main.py
+analysis_sessions = SessionStore()
@@ -0,0 +1,383 @@
+# lalr.py
+#
+# LALR(1) tables, for grammars LL(1) cannot handle without rewriting (left
+# recursion, common prefixes, ...). The driver is in lr_simulator.py.
+#
+# Construction:
+#   - LR(0) item sets are built from their kernels; a kernel is a sorted
+#     tuple of item numbers, hashed to find states already built.
+#   - Lookaheads are computed with the spontaneous / propagated method:
+#     the closure of every kernel item is taken once with a dummy lookahead,
+#     over the FIRST bitmasks of first_follow.py. The EPS bit doubles as the
+#     dummy (a real lookahead never contains eps). Spontaneous lookaheads
+#     are then pushed along the propagation edges with a worklist.
+#   - ACTION and GOTO rows are sparse: identical rows are stored once and
+#     the rest are packed into one array by row displacement (PackedRows).
+from array import array
+
+from first_follow import compute_first_masks
+from packed_rows import PackedRows
+from symbol_table import EPS, END, SymbolTable, iter_bits
+
+# ACTION cells: 0 = error, s + 1 = shift to state s, -(p + 1) = reduce by
+# production p. Reducing by production 0 (the augmented start) is accept.
+ERROR_ACTION = 0
+ACCEPT_ACTION = -1
+NO_STATE = -1
+
+class LALRTable:
+    """
+    Compact LALR(1) ACTION/GOTO tables.
+
+    Terminals keep their SymbolTable positions ('eps' and '$' are 0 and 1).
+    Production 0 is the augmented start  S' -> S; the others are the
+    grammar's productions in grammar order (the grammar's own lists).
+
+    As in yacc, every state's most frequent reduction is its default
+    reduction and every non-terminal's most frequent GOTO target its default
+    target; only the other entries are stored, in PackedRows. A default
+    reduction may run before an error is detected, but never shifts a bad
+    token. Use action_at / goto_at, which apply the defaults.
+    `conflicts` lists (state, terminal, kept action, dropped action, kind);
+    a table with conflicts resolves shift/reduce as shift and reduce/reduce
+    in favour of the earlier production, like yacc.
+    """
+
+    def __init__(self, start_symbol, terminals, non_terminals, productions, lhs,
+                 n_states, action=None, default_reduction=None, goto=None,
+                 default_goto=None, conflicts=None, symbols=None, first_masks=None):
+        self.start_symbol = start_symbol
+        self.terminals = terminals
+        self.t_index = {t: i for i, t in enumerate(terminals)}
+        self.n_terminals = len(terminals)
+        self.non_terminals = non_terminals
+        self.n_non_terminals = len(non_terminals)
+        self.productions = productions
+        self.lhs = lhs
+        self.rhs_len = array('i', (sum(sym != 'eps' for sym in p) for p in productions))
+        self.n_states = n_states
+        self.action = action
+        self.default_reduction = default_reduction
+        self.goto = goto
+        self.default_goto = default_goto
+        self.conflicts = conflicts if conflicts is not None else []
+        self.symbols = symbols
+        self.first_masks = first_masks
+
+    def action_at(self, state, terminal_id):
+        cell = self.action.get(state, terminal_id)
+        return cell if cell != ERROR_ACTION else self.default_reduction[state]
+
+    def goto_at(self, state, nt_id):
+        target = self.goto.get(state, nt_id)
+        return target if target != NO_STATE else self.default_goto[nt_id]
+
+    def expected(self, state):
+        """
+        Terminals with an action in `state` (for error messages). Complete
+        for the states errors are detected in: they have no default reduction.
+        """
+        return [self.terminals[t] for t in sorted(self.action.row(state))]
+
+    def describe(self, cell):
+        """Readable form of an ACTION cell: 'shift 4', 'reduce E → E + T', 'accept'."""
+        if cell > 0:
+            return f"shift {cell - 1}"
+        if cell == ACCEPT_ACTION:
+            return "accept"
+        if cell < 0:
+            p = -cell - 1
+            return f"reduce {self.non_terminals[self.lhs[p]]} → {' '.join(self.productions[p])}"
+        return "error"
+
+    def to_dict(self):
+        """
+        The compact tables as stored:
+            {"action": {state: {terminal: "s4" | "r2" | "acc", "$default": "r3"}},
+             "goto": {state: {nt: state}}, "default_goto": {nt: state}}
+        "$default" is the state's default reduction; goto only lists targets
+        that differ from the non-terminal's default. Empty rows are left out.
+        """
+        action = {}
+        goto = {}
+        for state in range(self.n_states):
+            row = {}
+            for t_id, cell in sorted(self.action.row(state).items()):
+                if cell > 0:
+                    row[self.terminals[t_id]] = f"s{cell - 1}"
+                elif cell == ACCEPT_ACTION:
+                    row[self.terminals[t_id]] = "acc"
+                else:
+                    row[self.terminals[t_id]] = f"r{-cell - 1}"
+            if self.default_reduction[state] != ERROR_ACTION:
+                row["$default"] = f"r{-self.default_reduction[state] - 1}"
+            if row:
+                action[state] = row
+            row = {self.non_terminals[nt_id]: target
+                   for nt_id, target in sorted(self.goto.row(state).items())}
+            if row:
+                goto[state] = row
+        default_goto = {
+            self.non_terminals[nt_id]: target
+            for nt_id, target in enumerate(self.default_goto) if target != NO_STATE
+        }
+        return {"action": action, "goto": goto, "default_goto": default_goto}
+
+    def stats(self):
+        return {
+            "states": self.n_states,
+            "action_rows": len(self.action.base),
+            "goto_rows": len(self.goto.base),
+            "bytes": (self.action.nbytes + self.goto.nbytes
+                      + self.default_reduction.itemsize * len(self.default_reduction)
+                      + self.default_goto.itemsize * len(self.default_goto)),
+        }
+
+
+def _augmented_name(grammar, start_symbol):
+    name = start_symbol + "'"
+    while name in grammar:
+        name += "'"
+    return name
+
+
+def build_lalr_table(grammar, start_symbol=None, symbols=None, first=None, nullable=None):
+    """
+    LALR(1) table for a grammar from read_grammar. FIRST bitmasks over
+    `symbols` are reused when given (CompiledGrammar has them for grammars
+    without left recursion), otherwise computed with compute_first_masks.
+    """
+    if start_symbol is None:
+        start_symbol = next(iter(grammar))
+    if symbols is None or first is None:
+        symbols = SymbolTable.from_grammar(grammar)
+        first = compute_first_masks(grammar, symbols, nullable)
+
+    terminals = list(symbols.symbols)
+    T = len(terminals)
+    non_terminals = list(grammar) + [_augmented_name(grammar, start_symbol)]
+    N = len(non_terminals)
+    code = {t: i for i, t in enumerate(terminals)}
+    code.update((nt, T + i) for i, nt in enumerate(non_terminals))
+
+    # Productions, and items numbered production by production: the item
+    # (p, dot) is item_base[p] + dot
+    productions = [[start_symbol]]
+    lhs = array('i', [N - 1])
+    for nt, alternatives in grammar.items():
+        for production in alternatives:
+            productions.append(production)
+            lhs.append(code[nt] - T)
+
+    next_sym = array('i')       # symbol code after the dot, -1 at the end
+    item_prod = array('i')
+    beta_first = []             # FIRST(beta) - {eps} for  A -> alpha . X beta
+    beta_nullable = bytearray()
+    item_base = array('i')
+    start_items = [[] for _ in range(N)]
+
+    def first_of(c):
+        return 1 << c if c < T else first[non_terminals[c - T]]
+
+    for p, production in enumerate(productions):
+        rhs = [code[sym] for sym in production if sym != 'eps']
+        base = len(next_sym)
+        item_base.append(base)
+        start_items[lhs[p]].append(base)
+        suffix = [(0, 1)] * (len(rhs) + 1)
+        mask, nullable_suffix = 0, 1
+        for d in range(len(rhs) - 1, -1, -1):
+            suffix[d] = (mask, nullable_suffix)
+            f = first_of(rhs[d])
+            if f & EPS:
+                mask |= f & ~EPS
+            else:
+                mask, nullable_suffix = f, 0
+        for d in range(len(rhs) + 1):
+            next_sym.append(rhs[d] if d < len(rhs) else -1)
+            item_prod.append(p)
+            beta_first.append(suffix[d][0])
+            beta_nullable.append(suffix[d][1])
+
+    # ----- LR(0) item sets -----
+    kernels = [(item_base[0],)]
+    state_of = {kernels[0]: 0}
+    transitions = []
+    state = 0
+    while state < len(kernels):
+        closure = list(kernels[state])
+        seen = bytearray(N)
+        for item in closure:
+            X = next_sym[item]
+            if X >= T and not seen[X - T]:
+                seen[X - T] = 1
+                closure.extend(start_items[X - T])
+        groups = {}
+        for item in closure:
+            X = next_sym[item]
+            if X >= 0:
+                groups.setdefault(X, []).append(item + 1)
+        moves = {}
+        for X, kernel in groups.items():
+            kernel = tuple(sorted(kernel))
+            target = state_of.get(kernel)
+            if target is None:
+                target = state_of[kernel] = len(kernels)
+                kernels.append(kernel)
+            moves[X] = target
+        transitions.append(moves)
+        state += 1
+    n_states = len(kernels)
+
+    # ----- lookaheads -----
+    # Kernel items get global IDs; kernel_ids[state][item] -> ID
+    kernel_ids = []
+    n_kernel_items = 0
+    for kernel in kernels:
+        kernel_ids.append({item: n_kernel_items + i for i, item in enumerate(kernel)})
+        n_kernel_items += len(kernel)
+    lookahead = [0] * n_kernel_items
+    propagate = [[] for _ in range(n_kernel_items)]
+    lookahead[kernel_ids[0][item_base[0]]] = END
+
+    # Eps productions are reduced from closure items: (state, p) -> spontaneous
+    # lookaheads, and the kernel items whose lookaheads they inherit
+    eps_spontaneous = {}
+    eps_inherited = {}
+
+    closures = {}
+
+    def closure_lookaheads(X, mask):
+        """LR(1) closure from non-terminal X with lookaheads `mask`: {nt code: mask}."""
+        key = (X, mask)
+        result = closures.get(key)
+        if result is not None:
+            return result
+        result = {}
+        work = [(X, mask)]
+        while work:
+            Y, m = work.pop()
+            old = result.get(Y, 0)
+            new = m & ~old
+            if not new:
+                continue
+            result[Y] = old | new
+            for item in start_items[Y - T]:
+                Z = next_sym[item]
+                if Z >= T:
+                    m2 = beta_first[item] | (new if beta_nullable[item] else 0)
+                    if m2:
+                        work.append((Z, m2))
+        closures[key] = result
+        return result
+
+    for state, kernel in enumerate(kernels):
+        moves = transitions[state]
+        ids = kernel_ids[state]
+        # Kernel items with the same closure key share one closure
+        by_key = {}
+        for item in kernel:
+            g = ids[item]
+            X = next_sym[item]
+            if X < 0:
+                continue
+            # The kernel item itself moves with its own (propagated) lookaheads
+            propagate[g].append(kernel_ids[moves[X]][item + 1])
+            if X >= T:
+                key = (X, beta_first[item] | (EPS if beta_nullable[item] else 0))
+                by_key.setdefault(key, []).append(g)
+
+        for (X, mask), sources in by_key.items():
+            for Y, m in closure_lookaheads(X, mask).items():
+                spontaneous = m & ~EPS
+                inherited = m & EPS
+                for item in start_items[Y - T]:
+                    Z = next_sym[item]
+                    if Z >= 0:
+                        target = kernel_ids[moves[Z]][item + 1]
+                        lookahead[target] |= spontaneous
+                        if inherited:
+                            for g in sources:
+                                propagate[g].append(target)
+                    else:
+                        key = (state, item_prod[item])
+                        eps_spontaneous[key] = eps_spontaneous.get(key, 0) | spontaneous
+                        if inherited:
+                            eps_inherited.setdefault(key, []).extend(sources)
+
+    work = [g for g in range(n_kernel_items) if lookahead[g]]
+    while work:
+        g = work.pop()
+        m = lookahead[g]
+        for target in propagate[g]:
+            if m & ~lookahead[target]:
+                lookahead[target] |= m
+                work.append(target)
+
+    # ----- ACTION / GOTO -----
+    reductions = [[] for _ in range(n_states)]
+    for state, kernel in enumerate(kernels):
+        ids = kernel_ids[state]
+        for item in kernel:
+            if next_sym[item] < 0:
+                reductions[state].append((item_prod[item], lookahead[ids[item]]))
+    for (state, p), mask in eps_spontaneous.items():
+        for g in eps_inherited.get((state, p), ()):
+            mask |= lookahead[g]
+        reductions[state].append((p, mask))
+
+    table = LALRTable(start_symbol, terminals, non_terminals, productions, lhs,
+                      n_states, symbols=symbols, first_masks=first)
+    action_rows = []
+    goto_rows = []
+    default_reduction = array('i', [ERROR_ACTION]) * n_states
+    goto_counts = [{} for _ in range(N)]
+    conflicts = table.conflicts
+    for state in range(n_states):
+        row = {}
+        goto_row = {}
+        for X, target in transitions[state].items():
+            if X < T:
+                row[X] = target + 1
+            else:
+                goto_row[X - T] = target
+                counts = goto_counts[X - T]
+                counts[target] = counts.get(target, 0) + 1
+        for p, mask in sorted(reductions[state]):
+            cell = -(p + 1)
+            for t in iter_bits(mask):
+                existing = row.get(t, ERROR_ACTION)
+                if existing == ERROR_ACTION:
+                    row[t] = cell
+                elif existing != cell:
+                    # Shift wins; otherwise the earlier production (sorted) is kept
+                    kind = "SHIFT/REDUCE" if existing > 0 else "REDUCE/REDUCE"
+                    conflicts.append((state, terminals[t], table.describe(existing),
+                                      table.describe(cell), kind))
+        # Default reduction: the most frequent one (never accept, which
+        # must only happen on '$')
+        counts = {}
+        for cell in row.values():
+            if cell < ACCEPT_ACTION:
+                counts[cell] = counts.get(cell, 0) + 1
+        if counts:
+            default = min(counts, key=lambda cell: (-counts[cell], -cell))
+            default_reduction[state] = default
+            row = {t: cell for t, cell in row.items() if cell != default}
+        action_rows.append(row)
+        goto_rows.append(goto_row)
+
+    default_goto = array('i', [NO_STATE]) * N
+    for nt_id, counts in enumerate(goto_counts):
+        if counts:
+            default_goto[nt_id] = min(counts, key=lambda target: (-counts[target], target))
+    for goto_row in goto_rows:
+        for nt_id in [nt_id for nt_id, target in goto_row.items()
+                      if target == default_goto[nt_id]]:
+            del goto_row[nt_id]
+
+    table.action = PackedRows(action_rows, T, ERROR_ACTION)
+    table.default_reduction = default_reduction
+    table.goto = PackedRows(goto_rows, N, NO_STATE)
+    table.default_goto = default_goto
+    return table
@@ -0,0 +1,270 @@
+# lexer.py
+#
+# Regex lexer in front of the parsers, for grammars whose text declares
+# tokens:
+#
+#   %token NUM [0-9]+
+#   %token id [A-Za-z_][A-Za-z0-9_]*
+#   %ignore \s+
+#   %ignore //[^\n]*
+#
+# The name of a %token is the grammar terminal it produces. Terminals of the
+# grammar without a %token match their own text ("+", "(", "while"; a word
+# only when no word character follows). %ignore patterns are skipped; without
+# any, whitespace is. All patterns are compiled into one bytes regex of
+# alternatives, tried in this order: %ignore, literals (longest first),
+# %token in declaration order; the first alternative that matches wins.
+#
+# Input is scanned in place (bytes, bytearray, memoryview, mmap; str is
+# encoded once): tokens are (type, start, end) byte spans produced lazily,
+# and text is only copied out when asked for.
+import re
+from array import array
+
+_DEFAULT_IGNORE = r"\s+"
+
+# Largest text LexerSplitter holds back between chunks (one token, or
+# unmatched text that may still become one)
+MAX_HELD_BYTES = 64 * 1024
+
+
+class LexerError(ValueError):
+    """
+    A bad token definition, or input no token matches. For input errors
+    `position` is the byte offset and line/column are 1-based.
+    """
+
+    def __init__(self, message, position=None, line=None, column=None):
+        self.reason = message
+        if line is not None:
+            message = f"line {line}, column {column}: {message}"
+        super().__init__(message)
+        self.position = position
+        self.line = line
+        self.column = column
+
+
+def read_token_definitions(grammar_text):
+    """
+    The %token / %ignore lines of a grammar text, in order, as
+    (name, pattern) pairs; name is None for %ignore.
+    """
+    definitions = []
+    for number, line in enumerate(grammar_text.split('\n'), 1):
+        line = line.strip()
+        if not line.startswith('%'):
+            continue
+        directive, _, rest = line.partition(' ')
+        rest = rest.strip()
+        if directive == '%token':
+            name, _, pattern = rest.partition(' ')
+            pattern = pattern.strip()
+            if not name or not pattern:
+                raise LexerError(f"line {number}: expected '%token NAME PATTERN'")
+            definitions.append((name, pattern))
+        elif directive == '%ignore':
+            if not rest:
+                raise LexerError(f"line {number}: expected '%ignore PATTERN'")
+            definitions.append((None, rest))
+        else:
+            raise LexerError(f"line {number}: unknown directive {directive!r}")
+    return definitions
+
+
+def _as_buffer(data):
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    return data
+
+
+class Token:
+    """One token: its type (terminal name) and [start, end) span in the source buffer."""
+
+    __slots__ = ("type", "start", "end", "source")
+
+    def __init__(self, type, start, end, source):
+        self.type = type
+        self.start = start
+        self.end = end
+        self.source = source
+
+    @property
+    def value(self):
+        """The token's bytes, as a view into the source (no copy)."""
+        return memoryview(self.source)[self.start:self.end]
+
+    @property
+    def text(self):
+        return bytes(self.value).decode("utf-8")
+
+    def __repr__(self):
+        return f"Token({self.type!r}, {self.start}, {self.end})"
+
+
+class Lexer:
+    """
+    Compiled lexer for a list of token definitions (read_token_definitions)
+    and the grammar's terminals. `types` are the token type names; type -1
+    is skipped input.
+    """
+
+    def __init__(self, definitions, terminals=()):
+        declared = [name for name, _ in definitions if name is not None]
+        ignore = [pattern for name, pattern in definitions if name is None] or [_DEFAULT_IGNORE]
+        literals = sorted((t for t in terminals if t != '$' and t not in declared),
+                          key=lambda t: (-len(t), t))
+
+        alternatives = [(-1, pattern) for pattern in ignore]
+        self.types = []
+        for literal in literals:
+            pattern = re.escape(literal)
+            if literal[-1:].isalnum() or literal[-1:] == '_':
+                pattern += r"(?![A-Za-z0-9_])"
+            alternatives.append((len(self.types), pattern))
+            self.types.append(literal)
+        for name, pattern in definitions:
+            if name is not None:
+                alternatives.append((len(self.types), pattern))
+                self.types.append(name)
+
+        # One group per alternative; m.lastindex is the outer group (its
+        # inner groups close before it), so map group numbers to types
+        parts = []
+        group_types = [-1]
+        for type_id, pattern in alternatives:
+            try:
+                compiled = re.compile(pattern.encode("utf-8"))
+            except re.error as e:
+                raise LexerError(f"bad pattern {pattern!r}: {e}")
+            if compiled.fullmatch(b""):
+                raise LexerError(f"pattern {pattern!r} matches the empty string")
+            parts.append(f"({pattern})")
+            group_types.append(type_id)
+            group_types.extend([-2] * compiled.groups)
+        try:
+            self.regex = re.compile("|".join(parts).encode("utf-8"))
+        except re.error as e:
+            raise LexerError(f"token patterns do not combine: {e}")
+        self.group_types = group_types
+
+    def _scan(self, data):
+        """(type, start, end) of every match, skipped input included (type -1)."""
+        match = self.regex.match
+        group_types = self.group_types
+        pos = 0
+        stop = len(data)
+        while pos < stop:
+            m = match(data, pos)
+            if m is None or m.end() == pos:
+                raise self._error(data, pos)
+            end = m.end()
+            yield group_types[m.lastindex], pos, end
+            pos = end
+
+    def spans(self, data):
+        """
+        Lazily yields (type, start, end) for the tokens of `data` (byte
+        offsets); skipped input is left out. Raises LexerError at the first
+        byte no pattern matches.
+        """
+        for span in self._scan(_as_buffer(data)):
+            if span[0] >= 0:
+                yield span
+
+    def tokens(self, data):
+        """Lazily yields Token objects over `data` (see spans)."""
+        data = _as_buffer(data)
+        types = self.types
+        for type_id, start, end in self.spans(data):
+            yield Token(types[type_id], start, end, data)
+
+    def names(self, data):
+        """Lazily yields the token type names: what the parsers take as input."""
+        types = self.types
+        for type_id, _, _ in self.spans(data):
+            yield types[type_id]
+
+    def codes(self, data, t_index):
+        """
+        Terminal IDs of the tokens (t_index: terminal name -> ID, e.g. a
+        CompiledTable's), as an array; no per-token strings are built.
+        """
+        code_of = array('i', (t_index.get(name, -1) for name in self.types))
+        return array('i', (code_of[type_id] for type_id, _, _ in self.spans(data)))
+
+    def splitter(self, max_held=None):
+        return LexerSplitter(self, MAX_HELD_BYTES if max_held is None else max_held)
+
+    def _error(self, data, pos):
+        # Only copied on error; memoryview has no count/rfind
+        before = bytes(data[:pos])
+        line = before.count(b"\n") + 1
+        column = pos - (before.rfind(b"\n") + 1) + 1
+        char = bytes(data[pos:pos + 1])
+        return LexerError(f"no token matches {char!r}", pos, line, column)
+
+
+class LexerSplitter:
+    """
+    Incremental lexing of chunked input, with the interface of
+    stream_parser.TokenSplitter: feed() returns the names of the tokens
+    completed so far. The last match of a chunk (token or skipped text) may
+    continue in the next chunk, so it is held back and lexed again with it;
+    so is unmatched text at the end of a chunk, which may be the start of a
+    token. At most max_held bytes are held back: unmatched text followed by
+    more than that, or a single match longer than that, raises LexerError,
+    so memory stays bounded and no byte is rescanned more than
+    max_held / chunk size times.
+    """
+
+    def __init__(self, lexer, max_held=MAX_HELD_BYTES):
+        self.lexer = lexer
+        self.max_held = max_held
+        self._partial = b""
+        self._offset = 0          # bytes before _partial
+        self._line = 1            # line and column where _partial starts
+        self._column = 1
+
+    def feed(self, chunk):
+        data = self._partial + _as_buffer(chunk)
+        matches = []
+        try:
+            for match in self.lexer._scan(data):
+                matches.append(match)
+        except LexerError as e:
+            if len(data) - e.position > self.max_held:
+                raise self._relocate(data, e)
+        held = matches.pop()[1] if matches else 0
+        if len(data) - held > self.max_held:
+            raise self._relocate(data, LexerError(
+                f"token longer than {self.max_held} bytes", held, 1, held + 1))
+        self._advance(data, held)
+        types = self.lexer.types
+        return [types[type_id] for type_id, _, _ in matches if type_id >= 0]
+
+    def close(self):
+        data, self._partial = self._partial, b""
+        try:
+            return list(self.lexer.names(data))
+        except LexerError as e:
+            raise self._relocate(data, e)
+
+    def _advance(self, data, held):
+        consumed = bytes(data[:held])
+        newlines = consumed.count(b"\n")
+        if newlines:
+            self._line += newlines
+            self._column = held - consumed.rfind(b"\n")
+        else:
+            self._column += held
+        self._offset += held
+        self._partial = bytes(data[held:])
+
+    def _relocate(self, data, error):
+        """An error at a position in `data` as one at its place in the whole input."""
+        if error.line == 1:
+            column = self._column + error.column - 1
+        else:
+            column = error.column
+        return LexerError(error.reason, self._offset + error.position,
+                          self._line + error.line - 1, column)
@@ -0,0 +1,184 @@
+# lr_simulator.py
+#
+# Shift-reduce driver for LALR(1) tables (see lalr.py), parallel to the
+# LL(1) driver in parser_simulator.py: same trace step format
+# ({"stack", "input", "action"}) and same parse tree JSON. Every token is
+# shifted once and every reduction builds one tree node, so it runs in
+# linear time.
+from array import array
+
+from grammar_utils import split_input
+from lalr import ACCEPT_ACTION, ERROR_ACTION
+from parse_tree import ParseTree
+
+# Step kinds recorded by LRTrace
+SHIFT, REDUCE, LR_ERROR, ACCEPT = 0, 1, 2, 3
+
+
+def _token_codes(table, input_tokens):
+    """Terminal IDs of the tokens; unknown tokens get -1 (they have no action)."""
+    t_index = table.t_index
+    return [t_index.get(tok, -1) for tok in input_tokens]
+
+
+def _replay(table, input_tokens, deltas):
+    """Turns (kind, arg) deltas back into {"stack", "input", "action"} snapshots."""
+    stack = ["$"]
+    pointer = 0
+    for kind, arg in deltas:
+        step = {"stack": stack[::-1], "input": input_tokens[pointer:], "action": ""}
+        if kind == SHIFT:
+            step["action"] = f"Shift '{input_tokens[pointer]}'"
+            stack.append(input_tokens[pointer])
+            pointer += 1
+        elif kind == REDUCE:
+            lhs = table.non_terminals[table.lhs[arg]]
+            step["action"] = f"Reduce {lhs} → {' '.join(table.productions[arg])}"
+            n = table.rhs_len[arg]
+            if n:
+                del stack[-n:]
+            stack.append(lhs)
+        elif kind == ACCEPT:
+            step["action"] = "Accepted"
+        else:
+            current_token = input_tokens[pointer] if pointer < len(input_tokens) else None
+            expected = ", ".join(table.expected(arg))
+            step["action"] = (f"ERROR: No action for ACTION[{arg}, {current_token}]"
+                              f" (expected: {expected})")
+        yield step
+
+
+class LRTrace:
+    """Shift-reduce steps as (kind, arg) deltas, expanded only when iterated."""
+
+    def __init__(self, table, input_tokens):
+        self.table = table
+        self.input_tokens = input_tokens
+        self.kinds = array('b')
+        self.args = array('i')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        return _replay(self.table, self.input_tokens, zip(self.kinds, self.args))
+
+    def to_list(self):
+        return list(self)
+
+
+def _drive(table, token_codes, nodes):
+    """
+    Core shift-reduce loop. Yields one (kind, arg) delta per step; arg is the
+    production for REDUCE and the state for LR_ERROR. If `nodes` is a list,
+    parse tree nodes are kept on it in step with the state stack.
+    """
+    # LALRTable.action_at / goto_at, inlined
+    a_row, a_base, a_check, a_values = (table.action.row_of, table.action.base,
+                                        table.action.check, table.action.values)
+    g_row, g_base, g_check, g_values = (table.goto.row_of, table.goto.base,
+                                        table.goto.check, table.goto.values)
+    default_reduction = table.default_reduction
+    default_goto = table.default_goto
+    lhs = table.lhs
+    rhs_len = table.rhs_len
+    names = table.non_terminals
+    build = nodes is not None
+
+    states = [0]
+    pointer = 0
+    while True:
+        state = states[-1]
+        code = token_codes[pointer]
+        cell = default_reduction[state]
+        if code >= 0:
+            r = a_row[state]
+            i = a_base[r] + code
+            if a_check[i] == r:
+                cell = a_values[i]
+        if cell > 0:
+            yield SHIFT, 0
+            states.append(cell - 1)
+            if build:
+                nodes.append({"name": table.terminals[code], "children": []})
+            pointer += 1
+        elif cell == ACCEPT_ACTION:
+            yield ACCEPT, 0
+            return
+        elif cell < 0:
+            p = -cell - 1
+            n = rhs_len[p]
+            if n:
+                del states[-n:]
+            A = lhs[p]
+            r = g_row[states[-1]]
+            i = g_base[r] + A
+            states.append(g_values[i] if g_check[i] == r else default_goto[A])
+            yield REDUCE, p
+            if build:
+                if n:
+                    children = nodes[-n:]
+                    del nodes[-n:]
+                else:
+                    # Same eps leaf as the LL(1) tree
+                    children = [{"name": "eps", "children": []}]
+                nodes.append({"name": names[lhs[p]], "children": children})
+        else:
+            yield LR_ERROR, state
+            return
+
+
+def lr_parse_with_trace(table, input_string):
+    """
+    Runs the shift-reduce parser. Returns (LRTrace, parse_tree, status).
+    On a rejected input the tree is the start symbol over whatever was
+    built so far.
+    """
+    input_tokens = split_input(input_string) + ['$']
+    trace = LRTrace(table, input_tokens)
+    kinds = trace.kinds
+    args = trace.args
+    nodes = []
+    for kind, arg in _drive(table, _token_codes(table, input_tokens), nodes):
+        kinds.append(kind)
+        args.append(arg)
+
+    if kinds[-1] == ACCEPT:
+        return trace, nodes[-1], "Accepted"
+    return trace, {"name": table.start_symbol, "children": nodes}, "Rejected"
+
+
+def lr_recognize(table, input_string):
+    """Accept/reject only (no trace, no tree). Returns "Accepted" or "Rejected"."""
+    codes = _token_codes(table, split_input(input_string))
+    codes.append(table.t_index['$'])
+    for kind, _ in _drive(table, codes, None):
+        if kind == ACCEPT:
+            return "Accepted"
+        if kind == LR_ERROR:
+            return "Rejected"
+
+
+def lr_parse_to_dict(table, input_string, tree_format="nested"):
+    """
+    lr_parse_with_trace as the API returns it:
+    {"trace_steps": [...], "parse_tree": {...}, "result": status}.
+    tree_format="columns" gives the tree as ParseTree.to_columns().
+    Module-level so it can run in a worker process.
+    """
+    trace, tree, status = lr_parse_with_trace(table, input_string)
+    if tree_format == "columns":
+        tree = ParseTree.from_dict(tree, table.non_terminals).to_columns()
+    return {"trace_steps": trace.to_list(), "parse_tree": tree, "result": status}
+
+
+def lr_parse_input_string(grammar, start_symbol, input_string):
+    """
+    Counterpart of parse_input_string: builds the LALR(1) table of the
+    grammar and parses. Returns (trace_steps, parse_tree, status).
+    """
+    from lalr import build_lalr_table
+
+    table = build_lalr_table(grammar, start_symbol)
+    trace, tree, status = lr_parse_with_trace(table, input_string)
+    return trace.to_list(), tree, status
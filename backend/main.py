@@ -1,11 +1,29 @@
-from fastapi import FastAPI, HTTPException
+import json
+import tempfile
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from grammar_utils import read_grammar, find_symbols, detect_direct_left_recursion
-from grammar_rewriter import eliminate_direct_left_recursion, grammar_to_string
-from first_follow import compute_first, compute_follow
-from parsing_table import compute_parsing_table
-from parser_simulator import parse_input_string
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from grammar_rewriter import repair_grammar, grammar_to_string
+from grammar_utils import split_input
+from parser_simulator import parse_to_dict, recognize, stream_trace
+from lr_simulator import lr_parse_to_dict, lr_recognize
+from earley import earley_parse_to_dict, earley_recognize, MAX_EARLEY_TOKENS
+from error_recovery import parse_to_dict_with_recovery, recover_errors
+from lexer import LexerError
+from grammar_cache import grammar_cache, compile_grammar, RegistryFullError
+from batch_parser import parse_batch, MAX_BATCH_SIZE
+from stream_parser import StreamParser, TokenSplitter
+from incremental import AnalysisSession, analysis_sessions
+from snapshot import dumps_snapshot
+from executor import cpu_executor, OverloadedError, JobTimeoutError, ClientDisconnected
+from metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, current_profile, metrics
+from serialize import dumps
 
 app = FastAPI(title="LL(1) Parser API", version="1.0")
 
@@ -16,7 +34,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile"],
 )
+# Request timings for /metrics, X-Profile for requests that ask for it
+app.add_middleware(MetricsMiddleware)
 
 # -------------------------------
 # 📍 Models
@@ -25,9 +46,262 @@ class GrammarInput(BaseModel):
     grammar_text: str
 
 
+# "full": trace + parse tree + result, "recognize": result only (no trace/tree work)
+ParseMode = Literal["full", "recognize"]
+
+# "ll1": LL(1) table (parser_simulator.py), "lalr": LALR(1) tables (lalr.py,
+# lr_simulator.py), which also take left-recursive and non-LL(1) grammars,
+# "earley": general parser (earley.py) for any grammar, ambiguous ones included.
+# "auto" is ll1 when the grammar has an LL(1) table and earley otherwise.
+AnalyzeMethod = Literal["ll1", "lalr"]
+ParseMethod = Literal["auto", "ll1", "lalr", "earley"]
+
+# "nested": {"name", "children"} dicts, "columns": flat arrays (parse_tree.py),
+# much smaller and faster to encode on large inputs
+TreeFormat = Literal["nested", "columns"]
+
+
+class AnalyzeInput(GrammarInput):
+    method: AnalyzeMethod = "ll1"
+    # LL(1) only: sections to return (default all, see serialize.SECTIONS),
+    # a page of non-terminals, and the numbered table encoding
+    fields: Optional[List[str]] = None
+    offset: int = Field(0, ge=0)
+    limit: Optional[int] = Field(None, ge=1)
+    table_encoding: Literal["nested", "compact"] = "nested"
+
+
 class ParseInput(BaseModel):
     grammar_text: str
     input_string: str
+    mode: ParseMode = "full"
+    method: ParseMethod = "auto"
+    tree_format: TreeFormat = "nested"
+    # LL(1) only: go on after errors and report all of them (see error_recovery.py)
+    recover: bool = False
+
+
+class GrammarParseInput(BaseModel):
+    input_string: str
+    mode: ParseMode = "full"
+    method: ParseMethod = "auto"
+    tree_format: TreeFormat = "nested"
+    recover: bool = False
+
+
+class BatchParseInput(BaseModel):
+    grammar_text: str
+    inputs: List[str] = Field(max_length=MAX_BATCH_SIZE)
+    include_trace: bool = False
+
+
+# -------------------------------
+# 📍 Helpers
+# -------------------------------
+def _check_parsable(compiled):
+    """Raises a 400 if the compiled grammar cannot drive the LL(1) parser."""
+    if compiled.recursive_rules:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Grammar is not LL(1): Left recursion detected in non-terminal(s): {', '.join(compiled.recursive_rules)}"
+        )
+    if compiled.conflicts:
+        raise HTTPException(status_code=400, detail="Grammar is not LL(1): parsing table has conflicts.")
+
+
+async def _run_job(request, fn, *args, cost, timeout=None, processes=True):
+    """
+    Runs CPU work on the bounded executor (see executor.py): inline when
+    cheap, else in a thread or worker process. Busy -> 503, too slow -> 504.
+    """
+    profile = current_profile()
+    start = time.perf_counter() if profile is not None else 0.0
+    try:
+        result = await cpu_executor.run(
+            fn, *args, cost=cost, timeout=timeout, processes=processes,
+            is_disconnected=request.is_disconnected
+        )
+        if profile is not None:
+            # Queueing included: compare with the stages it ran
+            profile.add(f"job:{getattr(fn, '__name__', 'call')}", time.perf_counter() - start)
+        return result
+    except OverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except JobTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected as e:
+        # Nobody is listening any more; 499 is only seen in the logs
+        raise HTTPException(status_code=499, detail=str(e))
+
+
+async def _get_compiled(request, grammar_text, timeout=None):
+    """Cache lookup inline; on a miss the grammar is compiled on the executor."""
+    profile = current_profile()
+    compiled = grammar_cache.peek(grammar_text)
+    if compiled is not None:
+        if profile is not None:
+            profile.cache = "hit"
+        return compiled
+    if grammar_cache.shared_store is not None:
+        # The shared store's compile lock must be taken in this process
+        compiled = await _run_job(request, grammar_cache.compile, grammar_text,
+                                  cost=len(grammar_text), timeout=timeout, processes=False)
+    else:
+        compiled = await _run_job(request, compile_grammar, grammar_text,
+                                  cost=len(grammar_text), timeout=timeout)
+        grammar_cache.put(compiled)
+    if profile is not None:
+        # No stages: another worker compiled it into the shared store
+        profile.cache = "miss" if compiled.profile else "shared"
+        profile.add_stages(compiled.profile or {})
+    return compiled
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with serialize.dumps (orjson when installed)."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def _record_serialize(seconds, size):
+    metrics.observe("ll1_stage_seconds", {"stage": "serialize"}, seconds)
+    profile = current_profile()
+    if profile is not None:
+        profile.add("serialize", seconds, bytes=size)
+
+
+def _json_response(payload, native=False):
+    """
+    Encodes a response, timed as the "serialize" stage. Payloads go through
+    jsonable_encoder like FastAPI's own responses, unless native=True: the
+    payload only holds JSON types already (dicts, lists, str, int).
+    """
+    start = time.perf_counter()
+    response = FastJSONResponse(payload if native else jsonable_encoder(payload))
+    _record_serialize(time.perf_counter() - start, len(response.body))
+    return response
+
+
+def _encoded_response(body, seconds):
+    """Response for a body encoded on the executor in `seconds`."""
+    _record_serialize(seconds, len(body))
+    return Response(content=body, media_type="application/json")
+
+
+def _build_lalr(compiled):
+    return compiled.lalr
+
+
+async def _get_lalr(request, compiled, cost, timeout=None):
+    """LALR(1) tables of a compiled grammar, built on the executor the first time."""
+    table = await _run_job(request, _build_lalr, compiled, cost=0 if compiled.lalr_built else cost,
+                           timeout=timeout, processes=False)
+    if table.conflicts:
+        raise HTTPException(status_code=400, detail="Grammar is not LALR(1): parsing table has conflicts.")
+    return table
+
+
+def _build_earley(compiled):
+    return compiled.earley
+
+
+def _build_recovery(compiled):
+    return compiled.recovery
+
+
+def _lex(lexer, input_string):
+    """Token names of raw input text through a grammar's lexer (see lexer.py)."""
+    try:
+        return list(lexer.names(input_string))
+    except LexerError as e:
+        raise HTTPException(status_code=400, detail=f"Lexical error: {e}")
+
+
+def _lex_all(lexer, inputs):
+    tokens = []
+    for i, input_string in enumerate(inputs):
+        try:
+            tokens.append(list(lexer.names(input_string)))
+        except LexerError as e:
+            raise HTTPException(status_code=400, detail=f"Lexical error in input {i}: {e}")
+    return tokens
+
+
+async def _parse_with(request, compiled, input_string, mode="full", timeout=None, method="ll1",
+                      tree_format="nested", recover=False):
+    """
+    Runs the LL(1) simulator with an already compiled grammar, or the
+    LALR(1) / Earley one depending on `method` (see ParseMethod).
+    recover: LL(1) with error recovery, the result gets an "errors" list.
+    Grammars with token definitions lex the input first.
+    The result only holds JSON types.
+    """
+    if compiled.lexer is not None:
+        input_string = await _run_job(request, _lex, compiled.lexer, input_string,
+                                      cost=len(input_string), timeout=timeout, processes=False)
+    if method == "auto":
+        method = "ll1" if compiled.valid or recover else "earley"
+    if recover and method != "ll1":
+        raise HTTPException(status_code=400, detail="Error recovery is only available with the LL(1) parser.")
+
+    if method == "earley":
+        tokens = split_input(input_string)
+        if len(tokens) > MAX_EARLEY_TOKENS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Input too long for the Earley parser: {len(tokens)} tokens (max {MAX_EARLEY_TOKENS})."
+            )
+        grammar = await _run_job(request, _build_earley, compiled, cost=compiled.size,
+                                 timeout=timeout, processes=False)
+        # Up to cubic time on ambiguous grammars: a superlinear cost keeps all
+        # but tiny inputs off the event loop, and the run stops at the deadline
+        cost = len(tokens) ** 2
+        deadline = time.monotonic() + cpu_executor.timeout_for(timeout)
+        if mode == "recognize":
+            result = await _run_job(request, earley_recognize, grammar, tokens, deadline,
+                                    cost=cost, timeout=timeout)
+            return {"result": result, "method": "earley"}
+        response = await _run_job(request, earley_parse_to_dict, grammar, tokens, tree_format, deadline,
+                                  cost=cost, timeout=timeout)
+        response["method"] = "earley"
+        return response
+
+    if method == "lalr":
+        table = await _get_lalr(request, compiled, compiled.size, timeout)
+        if mode == "recognize":
+            result = await _run_job(request, lr_recognize, table, input_string,
+                                    cost=len(input_string), timeout=timeout)
+            return {"result": result}
+        return await _run_job(request, lr_parse_to_dict, table, input_string, tree_format,
+                              cost=len(input_string), timeout=timeout)
+
+    _check_parsable(compiled)
+
+    if recover:
+        recovery = await _run_job(request, _build_recovery, compiled, cost=compiled.size,
+                                  timeout=timeout, processes=False)
+        if mode == "recognize":
+            return await _run_job(request, recover_errors, recovery, compiled.start_symbol,
+                                  input_string, cost=len(input_string), timeout=timeout)
+        return await _run_job(request, parse_to_dict_with_recovery, recovery, compiled.start_symbol,
+                              input_string, tree_format, cost=len(input_string), timeout=timeout)
+
+    if mode == "recognize" and not isinstance(input_string, str):
+        result = await _run_job(request, recognize, compiled.table, compiled.start_symbol,
+                                input_string, cost=len(input_string), timeout=timeout)
+        return {"result": result}
+
+    if mode == "recognize":
+        # Generated-code recognizer, compiled once per grammar and cached with it.
+        # Generated modules cannot be pickled, so it never goes to a process.
+        result = await _run_job(request, compiled.generated_parser.recognize, input_string,
+                                cost=len(input_string), timeout=timeout, processes=False)
+        return {"result": result}
+
+    # Trace + tree; the trace is a delta log, the step snapshots are only built in parse_to_dict
+    return await _run_job(request, parse_to_dict, compiled.table, compiled.start_symbol,
+                          input_string, tree_format, cost=len(input_string), timeout=timeout)
 
 
 # -------------------------------
@@ -38,86 +312,498 @@ def home():
     return {"message": "LL(1) Parser Backend is running."}
 
 
-@app.post("/analyze")
-def analyze_grammar(data: GrammarInput):
-    try:
-        grammar = read_grammar(data.grammar_text)
-        recursive_rules = detect_direct_left_recursion(grammar)
-
-        # --- THIS IS THE NEW LOGIC ---
-        if recursive_rules:
-            fixed_grammar = eliminate_direct_left_recursion(grammar)
-            fixed_grammar_text = grammar_to_string(fixed_grammar)
-
-            # Return a special response telling the frontend about the problem AND the fix
-            return {
-                "analysis_error": "Direct left recursion detected.",
-                "error_type": "LEFT_RECURSION",
-                "recursive_non_terminals": recursive_rules,
-                "repaired_grammar_text": fixed_grammar_text
-            }
-        # --- END NEW LOGIC ---
-
-        # If no recursion, proceed as normal
-        start_symbol = list(grammar.keys())[0]
-        first = compute_first(grammar)
-        # ... (rest of the function)
-        follow = compute_follow(grammar, first, start_symbol)
-        parsing_table, conflicts = compute_parsing_table(grammar, first, follow)
+def _analysis_response(compiled):
+    """/analyze output for a CompiledGrammar or an AnalysisSession."""
+    recursive_rules = compiled.recursive_rules
+
+    # --- THIS IS THE NEW LOGIC ---
+    if recursive_rules:
+        # Direct, indirect or hidden left recursion: run the full repair pipeline
+        fixed_grammar, changes = repair_grammar(
+            compiled.grammar, compiled.start_symbol, compiled.nullable
+        )
+        fixed_grammar_text = grammar_to_string(fixed_grammar)
+
+        # Return a special response telling the frontend about the problem AND the fix
         return {
-            "grammar": grammar,
-            "first": first,
-            "follow": follow,
-            "parsing_table": parsing_table,
-            "conflicts": conflicts,
-            "valid": len(conflicts) == 0
+            "analysis_error": "Left recursion detected.",
+            "error_type": "LEFT_RECURSION",
+            "recursive_non_terminals": recursive_rules,
+            "repaired_grammar_text": fixed_grammar_text,
+            "repair_steps": changes
         }
+    # --- END NEW LOGIC ---
+
+    # If no recursion, FIRST/FOLLOW/table come straight from the cache
+    # Sets as sorted lists, like the cached encoding of /analyze (serialize.py)
+    response = {
+        "grammar": compiled.grammar,
+        "first": {nt: sorted(symbols) for nt, symbols in compiled.first.items()},
+        "follow": {nt: sorted(symbols) for nt, symbols in compiled.follow.items()},
+        "parsing_table": compiled.parsing_table,
+        "conflicts": compiled.conflicts,
+        "valid": compiled.valid
+    }
+    if response["conflicts"]:
+        # Left factoring / useless symbol removal may remove the conflicts
+        response.update(_repair_fields(compiled))
+    return response
+
+
+def _repair_fields(compiled):
+    """repaired_grammar_text / repair_steps for a grammar with conflicts, or {}."""
+    try:
+        fixed_grammar, changes = repair_grammar(
+            compiled.grammar, compiled.start_symbol, compiled.nullable
+        )
+    except ValueError:
+        return {}
+    if not changes:
+        return {}
+    return {"repaired_grammar_text": grammar_to_string(fixed_grammar), "repair_steps": changes}
+
+
+def _encoded_analysis(compiled, data):
+    """
+    /analyze body of a grammar without left recursion, from its cached
+    encoding (serialize.py). Returns (body, seconds spent encoding).
+    """
+    start = time.perf_counter()
+    encoding = compiled.encoding
+    extras = ()
+    if compiled.conflicts and (data.fields is None or "conflicts" in data.fields):
+        extras = (encoding.extra("repair", lambda: _repair_fields(compiled)),)
+    body = encoding.render(data.fields, data.offset, data.limit, data.table_encoding, extras)
+    return body, time.perf_counter() - start
+
 
+def _analysis_error(e):
+    # Catch our ValueError from the rewriter
+    if isinstance(e, ValueError):
+        return HTTPException(status_code=400, detail=str(e))
+    return HTTPException(status_code=400, detail=f"Invalid grammar: {str(e)}")
+
+
+def _lalr_analysis_response(compiled):
+    """/analyze output for method="lalr" (no left recursion check: LR handles it)."""
+    table = compiled.lalr
+    symbols = table.symbols
+    tables = table.to_dict()
+    return {
+        "method": "lalr",
+        "grammar": compiled.grammar,
+        "first": {nt: sorted(symbols.to_set(table.first_masks[nt])) for nt in compiled.grammar},
+        # Production numbers of the "rN" actions; 0 is the augmented start
+        "productions": [
+            [table.non_terminals[table.lhs[p]], production]
+            for p, production in enumerate(table.productions)
+        ],
+        "states": table.n_states,
+        "action_table": tables["action"],
+        "goto_table": tables["goto"],
+        "default_goto": tables["default_goto"],
+        "table_stats": table.stats(),
+        "conflicts": [list(conflict) for conflict in table.conflicts],
+        "valid": not table.conflicts
+    }
+
+
+@app.post("/analyze")
+async def analyze_grammar(data: AnalyzeInput, request: Request, timeout: Optional[float] = None):
+    """
+    method="ll1" (default): FIRST/FOLLOW and the LL(1) table, or the repaired
+    grammar. method="lalr": the LALR(1) ACTION/GOTO tables.
+    For LL(1), `fields`, `offset`/`limit` and `table_encoding` select what is
+    returned (see AnalysisEncoding in serialize.py).
+    timeout (seconds) is capped by PARSE_TIMEOUT, see executor.py.
+    """
+    try:
+        compiled = await _get_compiled(request, data.grammar_text, timeout)
+        # The response (set views, repair) is built from shared objects: thread tier
+        if data.method == "lalr":
+            response = await _run_job(request, _lalr_analysis_response, compiled,
+                                      cost=len(data.grammar_text), timeout=timeout, processes=False)
+            return _json_response(response, native=True)
+        if compiled.recursive_rules:
+            response = await _run_job(request, _analysis_response, compiled,
+                                      cost=len(data.grammar_text), timeout=timeout, processes=False)
+            return _json_response(response)
+        body, seconds = await _run_job(request, _encoded_analysis, compiled, data,
+                                       cost=len(data.grammar_text), timeout=timeout, processes=False)
+        return _encoded_response(body, seconds)
+    except HTTPException:
+        raise
     except Exception as e:
-        # Catch our ValueError from the rewriter
-        if isinstance(e, ValueError):
-            raise HTTPException(status_code=400, detail=str(e))
-        raise HTTPException(status_code=400, detail=f"Invalid grammar: {str(e)}")
+        raise _analysis_error(e)
+
+
+def _new_session(grammar_text):
+    session = AnalysisSession(grammar_text)
+    return session, _analysis_response(session)
+
+
+def _update_session(session, grammar_text):
+    """Applies an edit under the session lock; returns (response, last_update)."""
+    with session.lock:
+        try:
+            session.update(grammar_text)
+            return _analysis_response(session), session.last_update
+        except Exception:
+            # The session may be half-updated; start over on the next edit
+            session.grammar = None
+            raise
+
+
+@app.post("/analyze/sessions")
+async def create_analysis_session(data: GrammarInput, request: Request, timeout: Optional[float] = None):
+    """
+    Same output as /analyze, plus a session_id. Later versions of the grammar
+    go to PUT /analyze/sessions/{session_id}, which only re-solves what changed.
+    """
+    try:
+        # Sessions are shared mutable objects: thread tier
+        session, response = await _run_job(request, _new_session, data.grammar_text,
+                                           cost=len(data.grammar_text), timeout=timeout,
+                                           processes=False)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _analysis_error(e)
+    session_id = analysis_sessions.create(session)
+    return {"session_id": session_id, **response, "incremental": session.last_update}
+
+
+@app.put("/analyze/sessions/{session_id}")
+async def update_analysis_session(session_id: str, data: GrammarInput, request: Request,
+                                  timeout: Optional[float] = None):
+    """Re-analyzes an edited grammar incrementally. `incremental` tells what was recomputed."""
+    session = analysis_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown session id: {session_id}")
+    try:
+        response, last_update = await _run_job(request, _update_session, session, data.grammar_text,
+                                               cost=len(data.grammar_text), timeout=timeout,
+                                               processes=False)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _analysis_error(e)
+    return {"session_id": session_id, **response, "incremental": last_update}
+
+
+@app.delete("/analyze/sessions/{session_id}")
+def delete_analysis_session(session_id: str):
+    if not analysis_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown session id: {session_id}")
+    return {"session_id": session_id, "deleted": True}
 
 
 @app.post("/parse")
-def parse_string(data: ParseInput):
+async def parse_string(data: ParseInput, request: Request, timeout: Optional[float] = None):
     """
     Input: Grammar + input string
     Output: Parsing trace, parse tree, and result (Accepted/Rejected)
+    timeout (seconds) is capped by PARSE_TIMEOUT, see executor.py.
     """
     try:
-        grammar = read_grammar(data.grammar_text)
-        recursive_rules = detect_direct_left_recursion(grammar)
-        if recursive_rules:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Grammar is not LL(1): Direct left recursion detected in non-terminal(s): {', '.join(recursive_rules)}"
-            )
-        # --- END OF BLOCK ---
-        start_symbol = list(grammar.keys())[0]
+        compiled = await _get_compiled(request, data.grammar_text, timeout)
+        return _json_response(
+            await _parse_with(request, compiled, data.input_string, data.mode, timeout, data.method,
+                              data.tree_format, data.recover),
+            native=True
+        )
 
-        first = compute_first(grammar)
-        follow = compute_follow(grammar, first, start_symbol)
-        parsing_table, conflicts = compute_parsing_table(grammar, first, follow)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error during parsing: {str(e)}")
 
-        if conflicts:
-            raise HTTPException(...)
 
-        # === CHANGE 4: Update variable names ===
-        trace_steps, tree, status = parse_input_string(grammar, parsing_table, start_symbol, data.input_string)
-        
-        # === CHANGE 5: Update the return object key ===
-        return {
-            "trace_steps": trace_steps, # Renamed from "trace"
-            "parse_tree": tree,
-            "result": status
-        }
+def _ndjson_records(records):
+    # serialize.dumps: the closing record holds the whole (maybe deep) tree
+    for kind, record in records:
+        yield dumps({"type": kind, **record}) + b"\n"
 
+
+def _sse_records(records):
+    for kind, record in records:
+        yield b"event: " + kind.encode() + b"\ndata: " + dumps(record) + b"\n\n"
+
+
+def _result_records(response):
+    """A finished /parse result as stream records: its steps, then the rest."""
+    for step in response.pop("trace_steps"):
+        yield "step", step
+    yield "result", response
+
+
+@app.post("/parse/stream")
+async def parse_string_stream(data: ParseInput, request: Request,
+                              format: Literal["ndjson", "sse"] = "ndjson",
+                              timeout: Optional[float] = None):
+    """
+    Streaming variant of /parse: every trace step is sent as soon as the parser
+    produces it, and the parse tree + result come in a closing record.
+    format=ndjson: one JSON object per line, {"type": "step" | "result", ...}
+    format=sse   : Server-Sent Events named "step" and "result"
+    method works as for /parse. Only the plain LL(1) parser produces its steps
+    incrementally; the LALR(1) and Earley parsers (and error recovery) run to
+    the end on the executor first, then their steps are sent.
+    """
+    try:
+        compiled = await _get_compiled(request, data.grammar_text, timeout)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid grammar: {str(e)}")
+
+    method = data.method
+    if method == "auto":
+        method = "ll1" if compiled.valid or data.recover else "earley"
+    if method == "ll1" and not data.recover:
+        _check_parsable(compiled)
+        input_string = data.input_string
+        if compiled.lexer is not None:
+            input_string = await _run_job(request, _lex, compiled.lexer, input_string,
+                                          cost=len(input_string), timeout=timeout, processes=False)
+        records = stream_trace(compiled.table, compiled.start_symbol, input_string)
+    else:
+        try:
+            response = await _parse_with(request, compiled, data.input_string, "full", timeout,
+                                         method, data.tree_format, data.recover)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error during parsing: {str(e)}")
+        records = _result_records(response)
+    if format == "sse":
+        return StreamingResponse(_sse_records(records), media_type="text/event-stream")
+    return StreamingResponse(_ndjson_records(records), media_type="application/x-ndjson")
+
+
+@app.post("/parse/batch")
+async def parse_batch_strings(data: BatchParseInput, request: Request,
+                              timeout: Optional[float] = None):
+    """
+    Input: Grammar + list of input strings
+    Output: One {index, result[, trace_steps, parse_tree]} record per input, in input order
+    """
+    try:
+        compiled = await _get_compiled(request, data.grammar_text, timeout)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid grammar: {str(e)}")
+
+    _check_parsable(compiled)
+    inputs = data.inputs
+    if compiled.lexer is not None:
+        inputs = await _run_job(request, _lex_all, compiled.lexer, inputs,
+                                cost=sum(len(s) for s in inputs), timeout=timeout, processes=False)
+    # parse_batch fans out to the process pool itself; it only needs a thread slot
+    results = await _run_job(
+        request, parse_batch, compiled.grammar, compiled.table, compiled.start_symbol,
+        inputs, data.include_trace,
+        cost=sum(len(s) for s in data.inputs), timeout=timeout, processes=False
+    )
+    return {
+        "count": len(results),
+        "accepted": sum(1 for r in results if r["result"] == "Accepted"),
+        "results": results
+    }
+
+
+@app.post("/grammars")
+async def register_grammar(data: GrammarInput, request: Request):
+    """
+    Compiles a grammar once and returns a stable ID for it.
+    The ID is the content hash of the grammar, so registering the
+    same grammar twice returns the same ID.
+    """
+    try:
+        compiled = await _get_compiled(request, data.grammar_text)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid grammar: {str(e)}")
+
+    _check_parsable(compiled)
+    try:
+        grammar_id = grammar_cache.register(compiled)
+    except RegistryFullError as e:
+        raise HTTPException(status_code=507, detail=str(e))
+    return {
+        "grammar_id": grammar_id,
+        "start_symbol": compiled.start_symbol
+    }
+
+
+@app.delete("/grammars/{grammar_id}")
+def unregister_grammar(grammar_id: str):
+    if not grammar_cache.unregister(grammar_id):
+        raise HTTPException(status_code=404, detail=f"Unknown grammar id: {grammar_id}")
+    return {"grammar_id": grammar_id, "deleted": True}
+
+
+@app.get("/grammars/{grammar_id}/parser.py")
+def download_generated_parser(grammar_id: str):
+    """Source of the generated recognizer module for a registered grammar."""
+    compiled = grammar_cache.lookup(grammar_id)
+    if compiled is None:
+        raise HTTPException(status_code=404, detail=f"Unknown grammar id: {grammar_id}")
+    return PlainTextResponse(
+        compiled.generated_parser.source,
+        media_type="text/x-python",
+        headers={"Content-Disposition": f'attachment; filename="ll1_parser_{grammar_id[:12]}.py"'}
+    )
+
+
+@app.get("/grammars/{grammar_id}/snapshot")
+def download_snapshot(grammar_id: str):
+    """Binary snapshot of a registered grammar (see snapshot.py), loadable with load_snapshot."""
+    compiled = grammar_cache.lookup(grammar_id)
+    if compiled is None:
+        raise HTTPException(status_code=404, detail=f"Unknown grammar id: {grammar_id}")
+    return Response(
+        dumps_snapshot(compiled),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{grammar_id[:12]}.ll1snap"'}
+    )
+
+
+@app.post("/grammars/{grammar_id}/parse")
+async def parse_with_grammar_id(grammar_id: str, data: GrammarParseInput, request: Request,
+                                timeout: Optional[float] = None):
+    """Same output as /parse, using a grammar registered through POST /grammars."""
+    compiled = grammar_cache.lookup(grammar_id)
+    if compiled is None:
+        raise HTTPException(status_code=404, detail=f"Unknown grammar id: {grammar_id}")
+    try:
+        return _json_response(
+            await _parse_with(request, compiled, data.input_string, data.mode, timeout, data.method,
+                              data.tree_format, data.recover),
+            native=True
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error during parsing: {str(e)}")
 
 
+def _feed_stream(parser, splitter, chunk, spool):
+    """
+    Tokenizes one body chunk and feeds it to a StreamParser, writing the
+    events to spool as NDJSON. chunk=None flushes the last partial token.
+    """
+    tokens = splitter.feed(chunk) if chunk is not None else splitter.close()
+    for token in tokens:
+        if parser.status is not None:
+            break
+        events = parser.feed(token)
+        if spool is not None:
+            for event in events:
+                spool.write((json.dumps(event) + "\n").encode("utf-8"))
+
+
+def _finish_stream(parser, splitter, spool):
+    _feed_stream(parser, splitter, None, spool)
+    events = parser.finish()
+    if spool is not None:
+        for event in events:
+            spool.write((json.dumps(event) + "\n").encode("utf-8"))
+    return events[-1]
+
+
+def _iter_spool(spool, chunk_size=64 * 1024):
+    try:
+        spool.seek(0)
+        for chunk in iter(lambda: spool.read(chunk_size), b""):
+            yield chunk
+    finally:
+        spool.close()
+
+
+@app.post("/grammars/{grammar_id}/parse/stream")
+async def parse_stream(grammar_id: str, request: Request, events: bool = False):
+    """
+    Parses a (possibly chunked) raw request body against a registered grammar.
+    Every body chunk is tokenized and parsed in the threadpool as it arrives,
+    so the event loop is never blocked and only the parse stack is kept.
+    events=false: returns {result, tokens, error}
+    events=true : returns the parse events as NDJSON, one per line. They are
+                  spooled (to disk past 1 MB) while the body is read, then sent.
+    """
+    compiled = grammar_cache.lookup(grammar_id)
+    if compiled is None:
+        raise HTTPException(status_code=404, detail=f"Unknown grammar id: {grammar_id}")
+    _check_parsable(compiled)
+
+    parser = StreamParser(compiled.table, compiled.start_symbol, events=events)
+    splitter = compiled.lexer.splitter() if compiled.lexer is not None else TokenSplitter()
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024) if events else None
+
+    try:
+        # The body is read here, never from inside the response iterator
+        async for chunk in request.stream():
+            if parser.status is not None:
+                continue  # drain the rest of the body
+            await run_in_threadpool(_feed_stream, parser, splitter, chunk, spool)
+        end = await run_in_threadpool(_finish_stream, parser, splitter, spool)
+    except UnicodeDecodeError:
+        if spool is not None:
+            spool.close()
+        raise HTTPException(status_code=400, detail="Request body is not valid UTF-8.")
+    except LexerError as e:
+        if spool is not None:
+            spool.close()
+        raise HTTPException(status_code=400, detail=f"Lexical error: {e}")
+
+    if events:
+        return StreamingResponse(_iter_spool(spool), media_type="application/x-ndjson")
+    return {"result": end["result"], "tokens": end["tokens"], "error": parser.error}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters and size of the compiled-grammar cache."""
+    return grammar_cache.stats()
+
+
+@app.get("/executor/stats")
+def executor_stats():
+    """Slots in use, queue depth and per-tier counters of the CPU executor."""
+    return cpu_executor.stats()
+
+
+def _state_gauges():
+    """Cache and executor state, read when /metrics is scraped."""
+    cache = grammar_cache.stats()
+    executor = cpu_executor.stats()
+    gauges = [
+        ("ll1_grammar_cache_hits_total", "counter", "Compiled-grammar cache hits.", {}, cache["hits"]),
+        ("ll1_grammar_cache_misses_total", "counter", "Compiled-grammar cache misses.", {}, cache["misses"]),
+        ("ll1_grammar_cache_evictions_total", "counter", "Compiled grammars evicted.", {}, cache["evictions"]),
+        ("ll1_grammar_cache_entries", "gauge", "Compiled grammars in the cache.", {}, cache["entries"]),
+        ("ll1_grammar_cache_bytes", "gauge", "Estimated size of the cache.", {}, cache["bytes"]),
+        ("ll1_registered_grammars", "gauge", "Grammars registered with POST /grammars.", {}, cache["registered"]),
+        ("ll1_executor_running", "gauge", "CPU jobs holding an executor slot.", {}, executor["running"]),
+        ("ll1_executor_queue_depth", "gauge", "CPU jobs waiting for a slot.", {}, executor["queue_depth"]),
+    ]
+    for tier in ("inline", "thread", "process"):
+        gauges.append(("ll1_executor_jobs_total", "counter", "CPU jobs started, by tier.",
+                       {"tier": tier}, executor[tier]))
+    for outcome in ("completed", "rejected", "timeouts", "cancelled"):
+        gauges.append(("ll1_executor_outcomes_total", "counter", "CPU jobs by outcome.",
+                       {"outcome": outcome}, executor[outcome]))
+    return gauges
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Stage timings, request latencies, cache and executor state (Prometheus text format)."""
+    return PlainTextResponse(metrics.render(_state_gauges()), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 # -------------------------------
 # 🚀 Run locally: uvicorn main:app --reload
 # -------------------------------
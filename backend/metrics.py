@@ -0,0 +1,257 @@
+# metrics.py
+#
+# Instrumentation of the grammar pipeline and the HTTP API.
+#
+# - StageTimer: wall time and counters of each stage of one compile
+#   (read_grammar, nullable, first, follow, table). compile_grammar always
+#   runs one (a handful of perf_counter calls per compile) and keeps the
+#   result on the CompiledGrammar, so it survives the worker processes.
+# - MetricsRegistry: process-wide histograms and counters, exported in the
+#   Prometheus text format by GET /metrics. Disabled with LL1_METRICS=0.
+# - RequestProfile: opt-in per request with an `X-Profile: 1` request header.
+#   The stages the request went through are returned as compact JSON in an
+#   `X-Profile` response header. Without the header nothing is collected.
+# - MetricsMiddleware: pure ASGI middleware tying the last two to requests.
+import contextvars
+import json
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get("LL1_METRICS", "1") != "0"
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram buckets in seconds (upper bounds, +Inf is implicit)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class StageTimer:
+    """Times consecutive stages: {stage: {"seconds": ..., **counters}}."""
+
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage, **counters):
+        """Ends `stage` (started by the previous lap) with optional counters."""
+        now = time.perf_counter()
+        counters["seconds"] = now - self._last
+        self.stages[stage] = counters
+        self._last = now
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Histograms and counters keyed by (metric name, label tuple).
+    Every method is a no-op when the registry is disabled.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+
+    def observe(self, name, labels, value, help=""):
+        if not self.enabled:
+            return
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+                self._help.setdefault(name, help)
+            histogram.observe(value)
+
+    def inc(self, name, labels, amount=1, help=""):
+        if not self.enabled:
+            return
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            if key not in self._counters:
+                self._help.setdefault(name, help)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def record_stages(self, stages):
+        """Adds the stages of one compile (StageTimer.stages) to the registry."""
+        if not self.enabled or not stages:
+            return
+        for stage, counters in stages.items():
+            for item, value in counters.items():
+                if item == "seconds":
+                    self.observe("ll1_stage_seconds", {"stage": stage}, value,
+                                 "Wall time of each pipeline stage.")
+                elif item.startswith("largest_"):
+                    continue  # maxima do not add up; X-Profile has them
+                else:
+                    self.inc("ll1_stage_items_total", {"stage": stage, "item": item}, value,
+                             "Work done by each pipeline stage (iterations, set sizes, ...).")
+
+    def observe_request(self, method, route, status, seconds):
+        self.observe("ll1_http_request_seconds",
+                     {"method": method, "route": route, "status": str(status)}, seconds,
+                     "HTTP request latency up to the end of the response.")
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self, gauges=()):
+        """
+        Prometheus text exposition of the registry, followed by `gauges`:
+        (name, type, help, labels, value) tuples read at scrape time
+        (cache and executor state).
+        """
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items(), key=lambda kv: kv[0])
+            counters = sorted(self._counters.items(), key=lambda kv: kv[0])
+            help_text = dict(self._help)
+
+        declared = set()
+
+        def declare(name, kind, text):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), h in histograms:
+            declare(name, "histogram", help_text.get(name, ""))
+            cumulative = 0
+            for bound, count in zip(BUCKETS, h.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {h.count}")
+            lines.append(f"{name}_sum{_labels(labels)} {h.sum!r}")
+            lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        for (name, labels), value in counters:
+            declare(name, "counter", help_text.get(name, ""))
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for name, kind, text, labels, value in gauges:
+            if value is None:
+                continue
+            declare(name, kind, text)
+            lines.append(f"{name}{_labels(tuple(labels.items()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+# ----- per-request profiles -----
+
+_current_profile = contextvars.ContextVar("ll1_profile", default=None)
+
+
+def current_profile():
+    """The RequestProfile of the running request, or None (the default)."""
+    return _current_profile.get()
+
+
+class RequestProfile:
+    """Stages of one request, returned in the X-Profile response header."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.cache = None
+        self.stages = []
+
+    def add(self, stage, seconds, **counters):
+        self.stages.append({"stage": stage, "ms": round(seconds * 1e3, 3), **counters})
+
+    def add_stages(self, stages):
+        """Adds the stages of a compile (StageTimer.stages)."""
+        for stage, counters in stages.items():
+            counters = dict(counters)
+            self.add(stage, counters.pop("seconds"), **counters)
+
+    def to_header(self):
+        data = {"total_ms": round((time.perf_counter() - self.start) * 1e3, 3)}
+        if self.cache is not None:
+            data["cache"] = self.cache
+        data["stages"] = self.stages
+        return json.dumps(data, separators=(",", ":"))
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request into the registry (labelled with the route
+    template, not the raw path, to keep label values bounded) and serves
+    X-Profile for requests that ask for it.
+    """
+
+    def __init__(self, app, registry=None):
+        self.app = app
+        self.registry = registry if registry is not None else metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                if value.strip() not in (b"", b"0", b"false"):
+                    profile = RequestProfile()
+                break
+        if profile is None and not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_profile(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile is not None:
+                    message["headers"] = list(message.get("headers", ())) + [
+                        (b"x-profile", profile.to_header().encode("latin-1"))
+                    ]
+            await send(message)
+
+        token = _current_profile.set(profile) if profile is not None else None
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            if token is not None:
+                _current_profile.reset(token)
+            route = scope.get("route")
+            self.registry.observe_request(
+                scope["method"], getattr(route, "path", "unmatched"), status,
+                time.perf_counter() - start
+            )
+
+
+# Shared by grammar_cache.py and main.py
+metrics = MetricsRegistry()
@@ -0,0 +1,129 @@
+# packed_rows.py
+#
+# Sparse table rows packed by row displacement, shared by the LALR(1)
+# ACTION/GOTO tables (lalr.py) and the LL(1) table (parsing_table.py).
+from array import array
+
+# Free slots PackedRows tries per row before appending it at the end
+PACK_TRIES = 32
+
+
+class PackedRows:
+    """
+    Sparse table rows packed into one array by row displacement, as yacc
+    does. Identical rows are stored once; row r starts at base[r] and owns
+    the slots whose check entry is r:
+        r = row_of[key];  i = base[r] + column
+        value = values[i] if check[i] == r else default
+    """
+
+    def __init__(self, rows, width, default):
+        """rows: one {column: value} dict per key (state)."""
+        self.default = default
+        self.width = width
+        self.row_of = array('i')
+        unique = []
+        seen = {}
+        for row in rows:
+            entries = tuple(sorted(row.items()))
+            r = seen.get(entries)
+            if r is None:
+                r = seen[entries] = len(unique)
+                unique.append(entries)
+            self.row_of.append(r)
+
+        check = array('i')
+        values = array('i')
+        used = bytearray()          # occupancy of check, searched with find()
+        base = array('i', [0]) * len(unique)
+        first_free = 0
+        # Densest rows first: they are the hardest to fit
+        for r in sorted(range(len(unique)), key=lambda r: -len(unique[r])):
+            entries = unique[r]
+            if not entries:
+                continue
+            c0 = entries[0][0]
+            size = len(used)
+            # First fit among a few free slots for the first column, else at the end
+            d = max(0, size - c0)
+            slot = max(first_free, c0)
+            for _ in range(PACK_TRIES):
+                slot = used.find(0, slot)
+                if slot < 0:
+                    break
+                if all(i >= size or not used[i] for i in (slot - c0 + c for c, _ in entries)):
+                    d = slot - c0
+                    break
+                slot += 1
+            grow = d + entries[-1][0] + 1 - size
+            if grow > 0:
+                check.extend(array('i', [-1]) * grow)
+                values.extend(array('i', [default]) * grow)
+                used.extend(bytes(grow))
+            base[r] = d
+            for c, v in entries:
+                check[d + c] = r
+                values[d + c] = v
+                used[d + c] = 1
+            first_free = used.find(0, first_free)
+            if first_free < 0:
+                first_free = len(used)
+        # Every base + column must be a valid index
+        grow = max(base, default=0) + width - len(check)
+        if grow > 0:
+            check.extend(array('i', [-1]) * grow)
+            values.extend(array('i', [default]) * grow)
+        self.base = base
+        self.check = check
+        self.values = values
+
+    @classmethod
+    def from_arrays(cls, width, default, row_of, base, check, values):
+        """Rows already packed (see `arrays`), e.g. views into a snapshot."""
+        packed = cls.__new__(cls)
+        packed.width = width
+        packed.default = default
+        packed.row_of, packed.base, packed.check, packed.values = row_of, base, check, values
+        return packed
+
+    @property
+    def arrays(self):
+        return self.row_of, self.base, self.check, self.values
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("row_of", "base", "check", "values"):
+            if isinstance(state[name], memoryview):
+                # Views mapped from a shared snapshot (see shared_store.py) are pickled as a copy
+                copy = array('i')
+                copy.frombytes(state[name].cast("B"))
+                state[name] = copy
+        return state
+
+    def get(self, key, column):
+        r = self.row_of[key]
+        i = self.base[r] + column
+        return self.values[i] if self.check[i] == r else self.default
+
+    def row(self, key):
+        """{column: value} of the non-default entries of a row."""
+        r = self.row_of[key]
+        base = self.base[r]
+        values = self.values
+        # Find the slots owned by r at C speed: rows are wide and mostly empty
+        owners = bytes(memoryview(self.check)[base:base + self.width].cast("B"))
+        needle = array('i', [r]).tobytes()
+        entries = {}
+        i = owners.find(needle)
+        while i >= 0:
+            if i % 4:
+                i = owners.find(needle, i + 1)
+                continue
+            c = i >> 2
+            entries[c] = values[base + c]
+            i = owners.find(needle, i + 4)
+        return entries
+
+    @property
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in self.arrays)
@@ -0,0 +1,210 @@
+# parse_tree.py
+#
+# Array-backed parse tree. One node is one slot in a handful of parallel
+# int arrays instead of a {"name", "children"} dict plus its list:
+#
+#   symbol[i]       index into `names`
+#   parent[i]       parent node, -1 for the root
+#   first_child[i]  first child; -1 for leaves and unexpanded non-terminals,
+#                   EPS_CHILD when the node was expanded with an eps production
+#                   (the eps leaf is not stored)
+#   child_count[i]
+#   start[i], end[i]  token span [start, end), -1 if the parser never got there
+#
+# The children of a node are always consecutive slots, allocated after the
+# node itself, so both the nested JSON and the parent links can be rebuilt in
+# one pass over the arrays. The nested dict form is only built by to_dict();
+# to_columns() is the flat encoding of the same arrays.
+from array import array
+
+EPS_CHILD = -2
+
+
+class TreeNode:
+    """Read-only view of one node of a ParseTree."""
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def name(self):
+        return self.tree.names[self.tree.symbol[self.index]]
+
+    @property
+    def span(self):
+        return self.tree.start[self.index], self.tree.end[self.index]
+
+    @property
+    def parent(self):
+        p = self.tree.parent[self.index]
+        return TreeNode(self.tree, p) if p >= 0 else None
+
+    @property
+    def children(self):
+        tree, i = self.tree, self.index
+        first = tree.first_child[i]
+        if first < 0:
+            return []
+        return [TreeNode(tree, c) for c in range(first, first + tree.child_count[i])]
+
+    def __repr__(self):
+        return f"TreeNode({self.name!r}, span={self.span})"
+
+
+class ParseTree:
+    """
+    Parse tree over a symbol name table (for the LL(1) simulator the
+    CompiledTable's `names`, so symbol IDs are the stack codes).
+    """
+
+    def __init__(self, names, root_symbol=None):
+        self.names = names
+        self.symbol = array('i')
+        self.parent = array('i')
+        self.first_child = array('i')
+        self.child_count = array('i')
+        self.start = array('i')
+        self.end = array('i')
+        if root_symbol is not None:
+            self.add_node(root_symbol, -1)
+
+    def __len__(self):
+        return len(self.symbol)
+
+    @property
+    def root(self):
+        return TreeNode(self, 0)
+
+    def node(self, index):
+        return TreeNode(self, index)
+
+    def add_node(self, symbol, parent):
+        self.symbol.append(symbol)
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.child_count.append(0)
+        self.start.append(-1)
+        self.end.append(-1)
+        return len(self.symbol) - 1
+
+    def expand(self, index, symbols):
+        """Gives node `index` the children `symbols` (empty: an eps production). Returns the first child."""
+        first = len(self.symbol)
+        if not symbols:
+            self.first_child[index] = EPS_CHILD
+            return first
+        n = len(symbols)
+        self.symbol.extend(symbols)
+        self.parent.extend(array('i', [index]) * n)
+        self.first_child.extend(array('i', [-1]) * n)
+        self.child_count.extend(array('i', [0]) * n)
+        self.start.extend(array('i', [-1]) * n)
+        self.end.extend(array('i', [-1]) * n)
+        self.first_child[index] = first
+        self.child_count[index] = n
+        return first
+
+    def close_spans(self):
+        """
+        Fills in the end (and missing starts) of the non-terminal spans from
+        their children; leaves must already have theirs. Children come after
+        their parent, so one backwards pass is enough.
+        """
+        first_child, child_count, start, end = self.first_child, self.child_count, self.start, self.end
+        for i in range(len(self.symbol) - 1, -1, -1):
+            first = first_child[i]
+            if first >= 0:
+                last = first + child_count[i] - 1
+                if end[last] >= 0:
+                    end[i] = end[last]
+                if start[i] < 0 and start[first] >= 0:
+                    start[i] = start[first]
+            elif first == EPS_CHILD:
+                end[i] = start[i]
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.symbol, self.parent, self.first_child,
+                                                self.child_count, self.start, self.end))
+
+    def to_dict(self):
+        """The nested {"name", "children"} JSON of the LL(1) simulator, built in one pass."""
+        names, symbol, parent, first_child = self.names, self.symbol, self.parent, self.first_child
+        nodes = []
+        append = nodes.append
+        for i in range(len(symbol)):
+            node = {"name": names[symbol[i]], "children": []}
+            append(node)
+            if i:
+                nodes[parent[i]]["children"].append(node)
+            if first_child[i] == EPS_CHILD:
+                node["children"].append({"name": "eps", "children": []})
+        return nodes[0] if nodes else None
+
+    def to_columns(self):
+        """
+        Flat columnar encoding: the arrays as lists, plus the name table.
+        first_child is -2 for nodes expanded with an eps production.
+        """
+        return {
+            "names": list(self.names),
+            "symbol": self.symbol.tolist(),
+            "parent": self.parent.tolist(),
+            "first_child": self.first_child.tolist(),
+            "child_count": self.child_count.tolist(),
+            "start": self.start.tolist(),
+            "end": self.end.tolist(),
+        }
+
+    @classmethod
+    def from_columns(cls, columns):
+        tree = cls(columns["names"])
+        for field in ("symbol", "parent", "first_child", "child_count", "start", "end"):
+            getattr(tree, field).extend(columns[field])
+        return tree
+
+    @classmethod
+    def from_dict(cls, root, non_terminals=()):
+        """
+        Array form of a nested tree (the LALR(1) and Earley parsers build
+        those). Spans are counted from the leaves that are not in
+        `non_terminals` (unexpanded non-terminals take no token).
+        """
+        names, codes = [], {}
+
+        def code(name):
+            c = codes.get(name)
+            if c is None:
+                c = codes[name] = len(names)
+                names.append(name)
+            return c
+
+        tree = cls(names, code(root["name"]))
+        queue = [(0, root)]
+        for index, node in queue:
+            children = node["children"]
+            if len(children) == 1 and children[0]["name"] == "eps" and not children[0]["children"]:
+                children = []
+                tree.first_child[index] = EPS_CHILD
+            elif children:
+                first = tree.expand(index, [code(child["name"]) for child in children])
+                queue.extend(zip(range(first, first + len(children)), children))
+
+        # Leaves in left-to-right order get consecutive token positions
+        position = 0
+        stack = [0]
+        first_child, child_count, start, end = tree.first_child, tree.child_count, tree.start, tree.end
+        while stack:
+            i = stack.pop()
+            first = first_child[i]
+            if first >= 0:
+                stack.extend(range(first + child_count[i] - 1, first - 1, -1))
+            elif first == EPS_CHILD:
+                start[i] = position
+            elif names[tree.symbol[i]] not in non_terminals:
+                start[i], end[i] = position, position + 1
+                position += 1
+        tree.close_spans()
+        return tree
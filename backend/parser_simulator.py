@@ -1,106 +1,268 @@
 # parser_simulator.py
-from grammar_utils import read_grammar
+from array import array
+
+from grammar_utils import read_grammar, split_input
 from first_follow import compute_first, compute_follow
-from parsing_table import compute_parsing_table
+from parsing_table import compute_parsing_table, CompiledTable, NO_RULE
+from parse_tree import ParseTree
 
 
 # backend/parser_simulator.py
 
-def parse_input_string(grammar, parsing_table, start_symbol, input_string):
-    input_tokens = input_string.split() + ['$']
-    stack = ['$', start_symbol]
-    pointer = 0
-    
-    # === CHANGE 1: Rename `trace` to `trace_steps` ===
-    trace_steps = [] 
-    
-    parse_tree = {"name": start_symbol, "children": []}
-    tree_stack = [parse_tree]
+# Step kinds recorded by ParseTrace. SKIP and MISSING only come from the
+# error-recovering driver (error_recovery.py), which also continues after ERROR.
+MATCH, EXPAND, ERROR, SKIP, MISSING = 0, 1, 2, 3, 4
 
-    while stack:
-        # --- Capture state at the *beginning* of the loop ---
-        # We use list() to make a snapshot copy of the stack
-        current_stack = list(stack) 
-        current_input = input_tokens[pointer:]
 
-        top = stack.pop()
-        current_token = input_tokens[pointer] if pointer < len(input_tokens) else None
+def _token_codes(table, input_tokens):
+    """Terminal IDs of the tokens; unknown tokens get -1 (they match nothing)."""
+    t_index = table.t_index
+    return [t_index.get(tok, -1) for tok in input_tokens]
+
+
+def _replay(table, start_symbol, input_tokens, deltas):
+    """
+    Turns (kind, arg) deltas back into {"stack", "input", "action"} snapshots.
+    `deltas` may be a lazy iterator, so steps can be produced while parsing.
+    """
+    names = table.names
+    stack = [table.t_index['$'], table.code(start_symbol)]
+    pointer = 0
 
-        # --- This is the data we will append ---
-        step_data = {
-            "stack": current_stack[::-1], # Reversed for user-friendly view
-            "input": current_input,
-            "action": "" # We'll fill this in
+    for kind, arg in deltas:
+        step = {
+            "stack": [names[c] for c in reversed(stack)],
+            "input": input_tokens[pointer:],
+            "action": ""
         }
+        top = stack.pop()
+        if kind == MATCH:
+            step["action"] = f"Match '{input_tokens[pointer]}'"
+            pointer += 1
+        elif kind == EXPAND:
+            production = table.productions[arg]
+            step["action"] = f"Expand {names[top]} → {' '.join(production)}"
+            stack.extend(table.push_codes[arg])
+        elif kind == SKIP:
+            step["action"] = f"ERROR: Skip '{input_tokens[pointer]}'"
+            stack.append(top)
+            pointer += 1
+        elif kind == MISSING:
+            step["action"] = f"ERROR: Missing '{names[top]}' before '{input_tokens[pointer]}'"
+        else:
+            current_token = input_tokens[pointer] if pointer < len(input_tokens) else None
+            step["action"] = f"ERROR: No rule for M[{names[arg]}, {current_token}]"
+        yield step
 
-        # Match terminal
-        if top == current_token:
-            step_data["action"] = f"Match '{current_token}'"
-            trace_steps.append(step_data)
-            
+
+ACCEPTED_STEP = {"stack": ["$"], "input": ["$"], "action": "Accepted"}
+
+
+class ParseTrace:
+    """
+    Parse steps recorded as O(1) deltas: one (kind, arg) pair per step, where
+    arg is the production index for EXPAND and the stack top for ERROR.
+    The {"stack", "input", "action"} snapshots are rebuilt by replaying the
+    deltas, only when the trace is iterated (i.e. serialized).
+    """
+
+    def __init__(self, table, start_symbol, input_tokens):
+        self.table = table
+        self.start_symbol = start_symbol
+        self.input_tokens = input_tokens
+        self.kinds = array('b')
+        self.args = array('i')
+        self.accepted = False
+
+    def __len__(self):
+        return len(self.kinds) + (1 if self.accepted else 0)
+
+    def __iter__(self):
+        yield from _replay(self.table, self.start_symbol, self.input_tokens,
+                           zip(self.kinds, self.args))
+        if self.accepted:
+            yield dict(ACCEPTED_STEP)
+
+    def to_list(self):
+        return list(self)
+
+
+def recognize(table, start_symbol, input_string):
+    """
+    Accept/reject only: no trace and no parse tree.
+    `table` must be a CompiledTable. Returns "Accepted" or "Rejected".
+    """
+    n_terminals = table.n_terminals
+    row_of, base, check, values = table.rows.arrays
+    push_codes = table.push_codes
+
+    codes = _token_codes(table, split_input(input_string))
+    codes.append(table.t_index['$'])
+    stack = [table.t_index['$'], table.code(start_symbol)]
+    pointer = 0
+
+    while stack:
+        top = stack.pop()
+        # A '$' inside a production can be matched before the end of the stack
+        code = codes[pointer] if pointer < len(codes) else -1
+        if top == code:
             pointer += 1
-            if tree_stack:
-                tree_stack.pop()
+            continue
+        if top < n_terminals or code < 0:
+            return "Rejected"
+        r = row_of[top - n_terminals]
+        i = base[r] + code
+        if check[i] != r:
+            return "Rejected"
+        p = values[i]
+        stack.extend(push_codes[p])
+    return "Accepted"
+
 
-        # Epsilon production
-        elif top == 'eps':
-            step_data["action"] = f"Expand {top} → ε"
-            trace_steps.append(step_data)
+def _drive(table, start_symbol, token_codes, parse_tree):
+    """
+    Core LL(1) loop over a CompiledTable. Yields one (kind, arg) delta per step
+    and fills in parse_tree (a ParseTree holding just the start symbol) as
+    productions are applied. The last delta is ERROR if the input is rejected.
+    """
+    n_terminals = table.n_terminals
+    row_of, base, check, values = table.rows.arrays
+    push_codes = table.push_codes
+    child_codes = table.child_codes
+    expand = parse_tree.expand
+    start = parse_tree.start
+    end = parse_tree.end
+
+    stack = [table.t_index['$'], table.code(start_symbol)]
+    pointer = 0
+    tree_stack = [0]
+
+    while stack:
+        top = stack.pop()
+        current_code = token_codes[pointer] if pointer < len(token_codes) else -1
 
+        # Match terminal
+        if top == current_code:
+            yield MATCH, 0
             if tree_stack:
-                tree_stack.pop()
+                node = tree_stack.pop()
+                start[node] = pointer
+                end[node] = pointer + 1
+            pointer += 1
+            continue
 
-        # Error: No rule
-        elif top not in parsing_table or current_token not in parsing_table[top]:
-            step_data["action"] = f"ERROR: No rule for M[{top}, {current_token}]"
-            trace_steps.append(step_data)
-            return trace_steps, parse_tree, "Rejected"
+        production_index = NO_RULE
+        if top >= n_terminals and current_code >= 0:
+            r = row_of[top - n_terminals]
+            i = base[r] + current_code
+            if check[i] == r:
+                production_index = values[i]
+
+        # Error: No rule (also covers a terminal on the stack that does not match)
+        if production_index == NO_RULE:
+            yield ERROR, top
+            return
 
         # Expand using parsing table
-        else:
-            production = parsing_table[top][current_token]
-            rhs = production if production != ['eps'] else []
-            
-            step_data["action"] = f"Expand {top} → {' '.join(production)}"
-            trace_steps.append(step_data)
-
-            current_node = tree_stack.pop() if tree_stack else None
-
-            if current_node:
-                current_node["children"] = [{"name": sym, "children": []} for sym in production]
-                for child in reversed(current_node["children"]):
-                    if child["name"] != 'eps':
-                        stack.append(child["name"])
-                        tree_stack.append(child)
-            else:
-                for sym in reversed(rhs):
-                    if sym != 'eps':
-                        stack.append(sym)
-
-    # === CHANGE 2: Add the final "Accepted" state ===
-    trace_steps.append({
-        "stack": ["$"],
-        "input": ["$"],
-        "action": "Accepted"
-    })
-    
-    status = "Accepted"
-    
-    # === CHANGE 3: Return `trace_steps` ===
-    return trace_steps, parse_tree, status
+        yield EXPAND, production_index
+
+        if tree_stack:
+            node = tree_stack.pop()
+            start[node] = pointer
+            children = child_codes[production_index]
+            first = expand(node, children)
+            tree_stack.extend(range(first + len(children) - 1, first - 1, -1))
+        stack.extend(push_codes[production_index])
+
+
+def parse_with_trace(table, start_symbol, input_string):
+    """
+    Runs the LL(1) parser on a CompiledTable.
+    Returns (ParseTrace, ParseTree, status); the trace is a lazy delta log
+    and the tree array-backed (see parse_tree.py).
+    """
+    input_tokens = split_input(input_string) + ['$']
+    trace = ParseTrace(table, start_symbol, input_tokens)
+    kinds = trace.kinds
+    args = trace.args
+
+    parse_tree = ParseTree(table.names, table.code(start_symbol))
+    for kind, arg in _drive(table, start_symbol, _token_codes(table, input_tokens), parse_tree):
+        kinds.append(kind)
+        args.append(arg)
+    parse_tree.close_spans()
+
+    if kinds and kinds[-1] == ERROR:
+        return trace, parse_tree, "Rejected"
+    trace.accepted = True
+    return trace, parse_tree, "Accepted"
+
+
+def parse_to_dict(table, start_symbol, input_string, tree_format="nested"):
+    """
+    parse_with_trace with the trace expanded, as the API returns it:
+    {"trace_steps": [...], "parse_tree": {...}, "result": status}.
+    tree_format="columns" gives the tree as ParseTree.to_columns().
+    Module-level so it can run in a worker process.
+    """
+    trace, tree, status = parse_with_trace(table, start_symbol, input_string)
+    tree = tree.to_columns() if tree_format == "columns" else tree.to_dict()
+    return {"trace_steps": trace.to_list(), "parse_tree": tree, "result": status}
+
+
+def stream_trace(table, start_symbol, input_string):
+    """
+    Generator version of parse_with_trace for streaming responses.
+    Yields ("step", snapshot) while the parser runs, without keeping earlier
+    steps, then one ("result", {"result": status, "parse_tree": tree}).
+    """
+    input_tokens = split_input(input_string) + ['$']
+    parse_tree = ParseTree(table.names, table.code(start_symbol))
+    last = [None]
+
+    def deltas():
+        for delta in _drive(table, start_symbol, _token_codes(table, input_tokens), parse_tree):
+            last[0] = delta[0]
+            yield delta
+
+    for step in _replay(table, start_symbol, input_tokens, deltas()):
+        yield "step", step
+
+    status = "Rejected" if last[0] == ERROR else "Accepted"
+    if status == "Accepted":
+        yield "step", dict(ACCEPTED_STEP)
+    yield "result", {"result": status, "parse_tree": parse_tree.to_dict()}
+
+
+def parse_input_string(grammar, parsing_table, start_symbol, input_string):
+    """
+    Runs the LL(1) parser on an input string.
+    `parsing_table` is a CompiledTable, or a table[NonTerminal][Terminal] dict
+    (which is compiled first). input_string may also be a list or iterable
+    of token names, e.g. Lexer.names() over raw source text.
+    Returns (trace_steps, parse_tree, status) with the trace fully materialized.
+    """
+    if not isinstance(parsing_table, CompiledTable):
+        parsing_table = CompiledTable.from_dict(grammar, parsing_table)
+    trace, parse_tree, status = parse_with_trace(parsing_table, start_symbol, input_string)
+    return trace.to_list(), parse_tree.to_dict(), status
 
 # ... rest of the file ...
 
 
 if __name__ == "__main__":
-    grammar = read_grammar("tests/sample_grammar.txt")
+    import sys
+
+    # read_grammar takes the grammar text, not a path
+    with open(sys.argv[1] if len(sys.argv) > 1 else "tests/sample_grammar.txt") as f:
+        grammar = read_grammar(f.read())
     start_symbol = list(grammar.keys())[0]
 
     first = compute_first(grammar)
     follow = compute_follow(grammar, first, start_symbol)
     parsing_table, conflicts = compute_parsing_table(grammar, first, follow)
 
-    input_str = "id + id * id"
+    input_str = sys.argv[2] if len(sys.argv) > 2 else "id + id * id"
     print("\n=== Parsing Trace ===")
     trace, tree, result = parse_input_string(grammar, parsing_table, start_symbol, input_str)
     for step in trace:
@@ -1,44 +1,241 @@
 # parsing_table.py
+from array import array
 
-def compute_parsing_table(grammar, first, follow):
+from packed_rows import PackedRows
+from symbol_table import EPS, SymbolTable, iter_bits
+
+NO_RULE = -1
+
+
+class CompiledTable:
     """
-    Build the LL(1) parsing table.
+    Array-backed LL(1) table.
+
+    Terminals and non-terminals get integer IDs. Every grammar production is
+    interned once in `productions` (as the grammar's own list) and the table
+    maps (nt_id, terminal_id) to a production index or NO_RULE. Most cells
+    are empty (a row only has entries for the FIRST/FOLLOW terminals of its
+    non-terminal), so the rows are packed by row displacement (PackedRows):
+        r = rows.row_of[nt_id];  i = rows.base[r] + terminal_id
+        production = rows.values[i] if rows.check[i] == r else NO_RULE
+
+    For the simulator every symbol also has a single code: terminals keep
+    their terminal ID, non-terminals use len(terminals) + nt_id.
+    `push_codes[p]` is production p's right-hand side, reversed and without
+    eps, ready to be pushed on a stack of codes; `child_codes[p]` is the same
+    in order (the children of a parse tree node, see parse_tree.py).
+    """
+
+    def __init__(self, non_terminals, terminals, rows=None):
+        self.non_terminals = list(non_terminals)
+        self.terminals = list(terminals)
+        self.nt_index = {nt: i for i, nt in enumerate(self.non_terminals)}
+        self.t_index = {t: i for i, t in enumerate(self.terminals)}
+        self.n_terminals = len(self.terminals)
+        self.names = self.terminals + self.non_terminals
+
+        self.productions = []
+        self.lhs = array('i')
+        self.push_codes = []
+        self.child_codes = []
+        if rows is None:
+            rows = self.pack([{}] * len(self.non_terminals))
+        elif len(rows.row_of) != len(self.non_terminals) or rows.width != self.n_terminals:
+            raise ValueError("Table rows do not match the grammar.")
+        self.rows = rows
+
+    def pack(self, rows):
+        """PackedRows of one {terminal_id: production index} dict per non-terminal."""
+        return PackedRows(rows, self.n_terminals, NO_RULE)
+
+    def code(self, sym):
+        """Stack code of a symbol: terminal ID, or n_terminals + non-terminal ID."""
+        nt = self.nt_index.get(sym)
+        if nt is not None:
+            return self.n_terminals + nt
+        return self.t_index[sym]
+
+    def add_production(self, lhs, production):
+        """Interns a production and returns its index."""
+        index = len(self.productions)
+        self.productions.append(production)
+        self.lhs.append(self.nt_index[lhs])
+        self.push_codes.append(tuple(
+            self.code(sym) for sym in reversed(production) if sym != 'eps'
+        ))
+        self.child_codes.append(self.push_codes[-1][::-1])
+        return index
+
+    def lookup(self, nt_id, terminal_id):
+        """Production index for M[nt, terminal], or NO_RULE."""
+        return self.rows.get(nt_id, terminal_id)
+
+    def row(self, nt_id):
+        """{terminal_id: production index} of the filled cells of a row."""
+        return self.rows.row(nt_id)
+
+    def to_dict(self):
+        """The table[NonTerminal][Terminal] = production view used by the API."""
+        terminals = self.terminals
+        productions = self.productions
+        return {
+            nt: {terminals[t_id]: productions[p] for t_id, p in self.row(nt_id).items()}
+            for nt_id, nt in enumerate(self.non_terminals)
+        }
+
+    @classmethod
+    def from_rows(cls, grammar, terminals, rows):
+        """
+        Rebuilds a table from its packed rows (see snapshot.py). Productions
+        are interned in grammar order, as compile_parsing_table does.
+        """
+        compiled = cls(grammar, terminals, rows)
+        for nt, productions in grammar.items():
+            for production in productions:
+                compiled.add_production(nt, production)
+        return compiled
+
+    @classmethod
+    def from_dict(cls, grammar, table):
+        """Compiles a table[NonTerminal][Terminal] = production dict."""
+        symbols = SymbolTable.from_grammar(grammar)
+        for row in table.values():
+            for terminal in row:
+                symbols.intern(terminal)
+        non_terminals = list(grammar)
+        for nt in table:
+            if nt not in grammar:
+                non_terminals.append(nt)
+
+        compiled = cls(non_terminals, symbols.symbols)
+        rows = [{} for _ in non_terminals]
+        interned = {}
+        for nt, row in table.items():
+            cells = rows[compiled.nt_index[nt]]
+            for terminal, production in row.items():
+                p = interned.get(id(production))
+                if p is None:
+                    p = interned[id(production)] = compiled.add_production(nt, production)
+                cells[compiled.t_index[terminal]] = p
+        compiled.rows = compiled.pack(rows)
+        return compiled
+
+
+def compile_parsing_table(grammar, first, follow, symbols):
+    """
+    Build the LL(1) parsing table from FIRST/FOLLOW bitmasks (see symbol_table.py).
     Returns:
-        table: dict of table[NonTerminal][Terminal] = production
+        table: CompiledTable
         conflicts: list of conflicts (empty if grammar is LL(1))
     """
-    table = {nt: {} for nt in grammar}
+    # Intern every terminal before the table width is fixed
+    for A in grammar:
+        for production in grammar[A]:
+            for sym in production:
+                if sym not in grammar:
+                    symbols.intern(sym)
+
+    compiled = CompiledTable(grammar, symbols.symbols)
+    productions = compiled.productions
+    names = compiled.terminals
+    rows = []
     conflicts = []
 
     for A in grammar:
+        cells = {}
+        rows.append(cells)
         for production in grammar[A]:
+            p = compiled.add_production(A, production)
+
             # Compute FIRST(alpha) for each production
-            first_alpha = set()
+            first_alpha = 0
             for sym in production:
                 if sym in grammar:
-                    first_alpha |= (first[sym] - {'eps'})
-                    if 'eps' not in first[sym]:
+                    first_alpha |= first[sym] & ~EPS
+                    if not first[sym] & EPS:
                         break
                 else:
-                    first_alpha.add(sym)
+                    first_alpha |= symbols.bit(sym)
                     break
             else:
-                first_alpha.add('eps')
+                first_alpha |= EPS
 
             # Fill parsing table
-            for terminal in first_alpha - {'eps'}:
-                if terminal in table[A]:
-                    conflicts.append((A, terminal, table[A][terminal], production, "FIRST/FIRST"))
-                table[A][terminal] = production
+            for pos in iter_bits(first_alpha & ~EPS):
+                existing = cells.get(pos)
+                if existing is not None:
+                    conflicts.append((A, names[pos], productions[existing], production, "FIRST/FIRST"))
+                cells[pos] = p
 
             # Add FOLLOW(A) if epsilon in FIRST(alpha)
-            if 'eps' in first_alpha:
-                for terminal in follow[A]:
-                    if terminal in table[A]:
-                        conflicts.append((A, terminal, table[A][terminal], production, "FIRST/FOLLOW"))
-                    table[A][terminal] = production
+            if first_alpha & EPS:
+                for pos in iter_bits(follow[A]):
+                    existing = cells.get(pos)
+                    if existing is not None:
+                        conflicts.append((A, names[pos], productions[existing], production, "FIRST/FOLLOW"))
+                    cells[pos] = p
+
+    compiled.rows = compiled.pack(rows)
+    return compiled, conflicts
+
+
+def build_table_row(A, grammar, first, follow, symbols):
+    """
+    One row of the LL(1) table, for incremental updates:
+    returns ({terminal: production}, conflicts of the row). Cells and
+    conflicts come out exactly as compile_parsing_table builds them.
+    """
+    cells = {}
+    conflicts = []
+    names = symbols.symbols
+    for production in grammar[A]:
+        first_alpha = 0
+        for sym in production:
+            if sym in grammar:
+                first_alpha |= first[sym] & ~EPS
+                if not first[sym] & EPS:
+                    break
+            else:
+                first_alpha |= symbols.bit(sym)
+                break
+        else:
+            first_alpha |= EPS
+
+        positions = list(iter_bits(first_alpha & ~EPS))
+        kinds = ["FIRST/FIRST"] * len(positions)
+        if first_alpha & EPS:
+            follow_positions = list(iter_bits(follow[A]))
+            positions += follow_positions
+            kinds += ["FIRST/FOLLOW"] * len(follow_positions)
+        for pos, kind in zip(positions, kinds):
+            existing = cells.get(pos)
+            if existing is not None:
+                conflicts.append((A, names[pos], existing, production, kind))
+            cells[pos] = production
+
+    row = {names[pos]: cells[pos] for pos in sorted(cells)}
+    return row, conflicts
 
-    return table, conflicts
+
+def compute_parsing_table_masks(grammar, first, follow, symbols):
+    """
+    Same as compile_parsing_table, but returns the table as nested dicts.
+    """
+    compiled, conflicts = compile_parsing_table(grammar, first, follow, symbols)
+    return compiled.to_dict(), conflicts
+
+
+def compute_parsing_table(grammar, first, follow):
+    """
+    Build the LL(1) parsing table.
+    Returns:
+        table: dict of table[NonTerminal][Terminal] = production
+        conflicts: list of conflicts (empty if grammar is LL(1))
+    """
+    symbols = SymbolTable.from_grammar(grammar)
+    first_masks = {nt: symbols.mask(first[nt]) for nt in grammar}
+    follow_masks = {nt: symbols.mask(follow[nt]) for nt in grammar}
+    return compute_parsing_table_masks(grammar, first_masks, follow_masks, symbols)
 
 
 def print_parsing_table(table):
@@ -66,10 +263,13 @@ def print_conflicts(conflicts):
 
 # Example usage
 if __name__ == "__main__":
+    import sys
     from grammar_utils import read_grammar
     from first_follow import compute_first, compute_follow
 
-    grammar = read_grammar("tests/sample_grammar.txt")
+    # read_grammar takes the grammar text, not a path
+    with open(sys.argv[1] if len(sys.argv) > 1 else "tests/sample_grammar.txt") as f:
+        grammar = read_grammar(f.read())
     start_symbol = list(grammar.keys())[0]
 
     first = compute_first(grammar)
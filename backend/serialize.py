@@ -0,0 +1,201 @@
+# serialize.py
+#
+# JSON encoding of the API's large payloads.
+#
+# - dumps(): orjson when it is installed, else the json module with the
+#   output settings of starlette's JSONResponse. Both give bytes. Both
+#   also recurse, orjson only 255 levels deep; deeper values (parse trees
+#   of long right-recursive inputs) go through an iterative encoder.
+# - AnalysisEncoding: the /analyze sections of one CompiledGrammar as
+#   pre-encoded JSON fragments (FIRST/FOLLOW as sorted lists, conflicts as
+#   lists), built on first use and cached with the grammar. A response is a
+#   byte join of fragments; pages and field subsets join fewer of them.
+import json
+
+try:
+    import orjson
+except ImportError:
+    # Same output, just slower
+    orjson = None
+
+# Sections of an LL(1) /analyze response, in response order
+SECTIONS = ("grammar", "first", "follow", "parsing_table", "conflicts", "valid")
+
+# Sections with one entry per non-terminal: these are the ones paginated
+PER_NON_TERMINAL = ("grammar", "first", "follow", "parsing_table")
+
+
+class _Raw(str):
+    """Output text queued by _dumps_iterative (as opposed to a str value)."""
+
+
+def _dumps_iterative(value):
+    """dumps() output without recursion, for values nested too deep for the C encoders."""
+    encode = json.JSONEncoder(ensure_ascii=False, allow_nan=False).encode
+    out = []
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if type(item) is _Raw:
+            out.append(item)
+        elif isinstance(item, dict):
+            stack.append(_Raw("}"))
+            items = list(item.items())
+            for i in range(len(items) - 1, -1, -1):
+                key, child = items[i]
+                if not isinstance(key, str):
+                    key = encode(key).strip('"')
+                stack.append(child)
+                stack.append(_Raw(("," if i else "") + encode(key) + ":"))
+            stack.append(_Raw("{"))
+        elif isinstance(item, (list, tuple)):
+            stack.append(_Raw("]"))
+            for i in range(len(item) - 1, -1, -1):
+                stack.append(item[i])
+                if i:
+                    stack.append(_Raw(","))
+            stack.append(_Raw("["))
+        else:
+            out.append(encode(item))
+    return "".join(out).encode("utf-8")
+
+
+def dumps(value):
+    """JSON bytes of a value made of dicts, lists, tuples, str, int, float, bool and None."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError as e:
+            # Anything else orjson refuses, json refuses too
+            if "Recursion limit" not in str(e):
+                raise
+            return _dumps_iterative(value)
+    try:
+        return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None,
+                          separators=(",", ":")).encode("utf-8")
+    except RecursionError:
+        return _dumps_iterative(value)
+
+
+def _join_object(items):
+    """b'{"k1":v1,"k2":v2}' from (key, encoded value) pairs."""
+    return b"{" + b",".join(dumps(key) + b":" + value for key, value in items) + b"}"
+
+
+class AnalysisEncoding:
+    """
+    Encoded /analyze sections of a CompiledGrammar without left recursion.
+
+    table_encoding="nested" gives parsing_table as {nt: {terminal: production}}
+    and conflicts with whole productions (the original response). "compact"
+    numbers everything instead: parsing_table is
+        {"terminals": [...], "rows": {nt: [[terminal index, production ID], ...]}}
+    and conflicts are [nt, terminal, production ID, production ID, kind].
+    Production IDs number the productions of the "grammar" section in order
+    (the order CompiledTable interns them in).
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.non_terminals = list(compiled.grammar)
+        self._fragments = {}
+        self._production_ids = None
+
+    def _cached(self, key, build):
+        # Concurrent first builds just do the same work twice
+        value = self._fragments.get(key)
+        if value is None:
+            value = self._fragments[key] = self.compiled.account(build())
+        return value
+
+    def _production_id(self, production):
+        if self._production_ids is None:
+            # By identity: the conflicts hold the table's production lists, and
+            # equal right-hand sides of different non-terminals are different IDs
+            self._production_ids = {id(rhs): p for p, rhs in enumerate(self.compiled.table.productions)}
+        return self._production_ids.get(id(production), -1)
+
+    def _entries(self, section, table_encoding):
+        """Per-non-terminal fragments b'"A":value' of a section."""
+        compiled = self.compiled
+        if section == "grammar":
+            value = compiled.grammar.__getitem__
+        elif section in ("first", "follow"):
+            masks = compiled.first_masks if section == "first" else compiled.follow_masks
+            to_set = compiled.symbols.to_set
+            value = lambda nt: sorted(to_set(masks[nt]))
+        elif table_encoding == "compact":
+            table = compiled.table
+
+            def value(nt):
+                return [[t, p] for t, p in sorted(table.row(table.nt_index[nt]).items())]
+        else:
+            rows = compiled.parsing_table
+            value = lambda nt: rows.get(nt, {})
+        return [dumps(nt) + b":" + dumps(value(nt)) for nt in self.non_terminals]
+
+    def entries(self, section, table_encoding="nested"):
+        key = (section, table_encoding if section == "parsing_table" else None)
+        return self._cached(key, lambda: self._entries(section, table_encoding))
+
+    def _table_header(self):
+        table = self.compiled.table
+        header = dumps({"terminals": table.terminals})
+        # '{...}' without the closing brace: the rows follow
+        return header[:-1] + b',"rows":'
+
+    def _conflicts(self, table_encoding):
+        conflicts = self.compiled.conflicts
+        if table_encoding == "compact":
+            conflicts = [
+                [nt, t, self._production_id(kept), self._production_id(dropped), kind]
+                for nt, t, kept, dropped, kind in conflicts
+            ]
+        return dumps(conflicts)
+
+    def section(self, section, table_encoding="nested", start=0, stop=None):
+        """
+        Encoded value of one section; per-non-terminal sections only hold
+        the non-terminals [start:stop].
+        """
+        if section in PER_NON_TERMINAL:
+            entries = self.entries(section, table_encoding)
+            if start or stop is not None:
+                entries = entries[start:stop]
+            body = b"{" + b",".join(entries) + b"}"
+            if section == "parsing_table" and table_encoding == "compact":
+                body = self._cached("table_header", self._table_header) + body + b"}"
+            return body
+        if section == "conflicts":
+            return self._cached(("conflicts", table_encoding), lambda: self._conflicts(table_encoding))
+        if section == "valid":
+            return b"true" if self.compiled.valid else b"false"
+        raise ValueError(f"Unknown section: {section}")
+
+    def extra(self, name, build):
+        """An additional JSON-native value, encoded once (e.g. the grammar repair)."""
+        return self._cached(("extra", name), lambda: dumps(build()))
+
+    def render(self, fields=None, offset=0, limit=None, table_encoding="nested", extras=()):
+        """
+        The response body. `fields`: sections to include (default all),
+        `offset`/`limit`: page of non-terminals for the per-non-terminal
+        sections, `extras`: encoded JSON objects whose members are added
+        at the end.
+        """
+        if fields is None:
+            fields = SECTIONS
+        unknown = [f for f in fields if f not in SECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Valid fields: {', '.join(SECTIONS)}")
+        stop = None if limit is None else offset + limit
+        items = [(f, self.section(f, table_encoding, offset, stop)) for f in SECTIONS if f in fields]
+        if limit is not None or offset:
+            items.append(("page", dumps({"offset": offset, "limit": limit,
+                                         "total": len(self.non_terminals)})))
+        body = _join_object(items)
+        for extra in extras:
+            if extra != b"{}":
+                body = body[:-1] + (b"," if items else b"") + extra[1:]
+                items = True
+        return body
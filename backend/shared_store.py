@@ -0,0 +1,125 @@
+# shared_store.py
+#
+# Compiled-grammar store shared by all worker processes on a host (e.g.
+# `uvicorn main:app --workers N` with GRAMMAR_STORE_DIR set, see
+# grammar_cache.py). Every grammar is one dense snapshot file named after
+# its content hash (see snapshot.py). Workers map the file read-only, so
+# its table cells are kept once in the page cache, not once per worker.
+# A lock file per grammar makes sure only one worker compiles it; the
+# others wait and then map the result.
+#
+# Registered grammars (POST /grammars) get a marker file, so any worker can
+# serve /grammars/{id}/... and a DELETE seen by one worker applies to all.
+import contextlib
+import mmap
+import os
+import re
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): concurrent compiles of one grammar are just duplicated
+    fcntl = None
+
+
+# Keys come from URLs: only grammar hashes may become file names
+_KEY_RE = re.compile(r"[0-9a-f]{64}")
+
+
+class SharedGrammarStore:
+    """Directory of dense grammar snapshots, keyed by grammar hash."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.loads = 0
+        self.compiles = 0
+
+    def _path(self, key, suffix):
+        if not _KEY_RE.fullmatch(key):
+            raise KeyError(key)
+        return os.path.join(self.directory, key + suffix)
+
+    @contextlib.contextmanager
+    def _lock(self, key):
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(key, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load(self, key):
+        """Maps the snapshot of a grammar, or returns None if nobody published it yet."""
+        from snapshot import SnapshotError, loads_snapshot
+
+        if not _KEY_RE.fullmatch(key):
+            return None
+        try:
+            with open(self._path(key, ".ll1snap"), "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        try:
+            # The table cells stay a view into the map (zero copy)
+            compiled = loads_snapshot(buffer)
+        except SnapshotError:
+            # Written by another snapshot/Python version: compile and replace it
+            return None
+        self.loads += 1
+        return compiled
+
+    def publish(self, compiled):
+        """Writes the snapshot of a compiled grammar, unless it is already there."""
+        from snapshot import save_snapshot
+
+        path = self._path(compiled.key, ".ll1snap")
+        if not os.path.exists(path):
+            save_snapshot(compiled, path, dense=True)
+
+    def get_or_compile(self, key, compile_fn):
+        """
+        Returns the mapped grammar for key. On a miss, compile_fn() runs in
+        exactly one worker at a time and its result is published.
+        """
+        compiled = self.load(key)
+        if compiled is not None:
+            return compiled
+        with self._lock(key):
+            # Another worker may have published it while we waited
+            compiled = self.load(key)
+            if compiled is None:
+                from snapshot import save_snapshot
+
+                compiled = compile_fn()
+                save_snapshot(compiled, self._path(key, ".ll1snap"), dense=True)
+                self.compiles += 1
+                # Swap the private table for the mapped one
+                mapped = self.load(key)
+                if mapped is not None:
+                    mapped.profile = compiled.profile
+                    compiled = mapped
+        return compiled
+
+    def mark_registered(self, compiled):
+        self.publish(compiled)
+        open(self._path(compiled.key, ".registered"), "a").close()
+
+    def unmark_registered(self, key):
+        """Returns False if the grammar was not registered."""
+        if not _KEY_RE.fullmatch(key):
+            return False
+        try:
+            os.remove(self._path(key, ".registered"))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def is_registered(self, key):
+        return bool(_KEY_RE.fullmatch(key)) and os.path.exists(self._path(key, ".registered"))
+
+    def stats(self):
+        return {"directory": self.directory, "loads": self.loads, "compiles": self.compiles}
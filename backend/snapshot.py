@@ -0,0 +1,184 @@
+# snapshot.py
+#
+# Versioned binary snapshots of a CompiledGrammar, so a worker can load a
+# precompiled grammar instead of running the pipeline again.
+#
+# Layout:
+#   header : b"LL1S", format version (u16), marshal version (u8),
+#            byte order of the arrays (b"<" or b">")
+#   payload: marshal of a dict of str/int/bytes/lists. The grammar is kept
+#            as a GrammarStore (flat int arrays), the table as the four
+#            arrays of its packed rows (parsing_table.py, packed_rows.py).
+# Dense snapshots (dense=True, used by shared_store.py) leave the table
+# arrays out of the payload and append them instead (row_of, base, check,
+# values), 8-byte aligned, then a footer (offset, then the length of each
+# array, as u64). Loaded from an mmap, the arrays are memoryviews over the
+# file: no copy, shared by every process that maps it.
+import marshal
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from grammar_cache import CompiledGrammar
+from grammar_loader import GrammarStore
+from packed_rows import PackedRows
+from parsing_table import CompiledTable, NO_RULE
+from symbol_table import SymbolTable
+
+SNAPSHOT_MAGIC = b"LL1S"
+SNAPSHOT_VERSION = 2
+
+_HEADER = struct.Struct("<4sHBc")
+_FOOTER = struct.Struct("<QQQQQ")
+_BYTE_ORDER = b"<" if sys.byteorder == "little" else b">"
+
+
+class SnapshotError(ValueError):
+    """Raised for data that is not a snapshot this version can read."""
+
+
+def _int_array(data, byte_order):
+    values = array('i')
+    values.frombytes(data)
+    if byte_order != _BYTE_ORDER:
+        values.byteswap()
+    return values
+
+
+def dumps_snapshot(compiled, dense=False):
+    """Serializes a CompiledGrammar to bytes (see the layout above)."""
+    store = GrammarStore.from_dict(compiled.grammar)
+    payload = {
+        "key": compiled.key,
+        "size": compiled.base_size,
+        "start_symbol": compiled.start_symbol,
+        "recursive_rules": list(compiled.recursive_rules),
+        "nullable": sorted(compiled.nullable or ()),
+        "tokens": [tuple(d) for d in compiled.token_defs],
+        "symbols": store.symbols,
+        "rules": [(nt, list(ps)) for nt, ps in store.rules.items()],
+        "lhs": store.lhs.tobytes(),
+        "offsets": store.offsets.tobytes(),
+        "body": store.body.tobytes(),
+    }
+
+    table = compiled.table
+    if table is not None:
+        # Conflicts reference productions by their index in the table
+        production_ids = {id(p): i for i, p in enumerate(table.productions)}
+        payload.update({
+            "terminals": compiled.symbols.symbols,
+            "first": [compiled.first_masks[nt] for nt in compiled.grammar],
+            "follow": [compiled.follow_masks[nt] for nt in compiled.grammar],
+            "conflicts": [
+                (A, t, production_ids[id(old)], production_ids[id(new)], kind)
+                for A, t, old, new, kind in compiled.conflicts
+            ],
+        })
+        if dense:
+            payload["dense_rows"] = True
+        else:
+            payload["rows"] = [a.tobytes() for a in table.rows.arrays]
+
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, marshal.version, _BYTE_ORDER)
+    data = header + marshal.dumps(payload)
+    if dense and table is not None:
+        arrays = table.rows.arrays
+        offset = -(-len(data) // 8) * 8
+        data += bytes(offset - len(data)) + b"".join(a.tobytes() for a in arrays)
+        data += _FOOTER.pack(offset, *(len(a) for a in arrays))
+    return data
+
+
+def _dense_rows(data, byte_order):
+    """The appended table arrays of a dense snapshot, as views into `data` when possible."""
+    if len(data) < _HEADER.size + _FOOTER.size:
+        raise SnapshotError("Snapshot is truncated.")
+    offset, *counts = _FOOTER.unpack_from(data, len(data) - _FOOTER.size)
+    if offset % 8 or counts[2] != counts[3] or offset + 4 * sum(counts) + _FOOTER.size != len(data):
+        raise SnapshotError("Corrupt snapshot: bad table footer.")
+    arrays = []
+    view = memoryview(data)
+    for count in counts:
+        part = view[offset:offset + 4 * count]
+        offset += 4 * count
+        arrays.append(_int_array(part, byte_order) if byte_order != _BYTE_ORDER else part.cast('i'))
+    return arrays
+
+
+def loads_snapshot(data):
+    """
+    Rebuilds a CompiledGrammar from dumps_snapshot output. `data` can be
+    bytes or an mmap; the table of a dense snapshot then stays in `data`.
+    """
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot is truncated.")
+    magic, version, marshal_version, byte_order = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("Not a grammar snapshot.")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version} (expected {SNAPSHOT_VERSION}).")
+    if marshal_version != marshal.version:
+        raise SnapshotError("Snapshot was written by an incompatible Python version.")
+    try:
+        payload = marshal.loads(memoryview(data)[_HEADER.size:])
+    except (EOFError, ValueError, TypeError) as e:
+        raise SnapshotError(f"Corrupt snapshot: {e}")
+
+    store = GrammarStore()
+    store.symbols = payload["symbols"]
+    store.index = {name: i for i, name in enumerate(store.symbols)}
+    store.rules = dict(payload["rules"])
+    store.lhs = _int_array(payload["lhs"], byte_order)
+    store.offsets = _int_array(payload["offsets"], byte_order)
+    store.body = _int_array(payload["body"], byte_order)
+    grammar = store.to_dict()
+
+    nullable = set(payload["nullable"])
+    # Token definitions (lexer.py); snapshots from before them have none
+    token_defs = [tuple(d) for d in payload.get("tokens", ())]
+    if "terminals" not in payload:
+        return CompiledGrammar(payload["key"], grammar, payload["start_symbol"],
+                               payload["recursive_rules"], nullable=nullable,
+                               size=payload["size"], token_defs=token_defs)
+
+    terminals = payload["terminals"]
+    symbols = SymbolTable(terminals[2:])
+    if payload.get("dense_rows"):
+        arrays = _dense_rows(data, byte_order)
+    else:
+        arrays = [_int_array(a, byte_order) for a in payload["rows"]]
+    rows = PackedRows.from_arrays(len(terminals), NO_RULE, *arrays)
+    table = CompiledTable.from_rows(grammar, terminals, rows)
+    first = dict(zip(grammar, payload["first"]))
+    follow = dict(zip(grammar, payload["follow"]))
+    productions = table.productions
+    conflicts = [
+        (A, t, productions[old], productions[new], kind)
+        for A, t, old, new, kind in payload["conflicts"]
+    ]
+    return CompiledGrammar(payload["key"], grammar, payload["start_symbol"],
+                           payload["recursive_rules"], symbols, first, follow,
+                           table, conflicts, nullable, size=payload["size"],
+                           token_defs=token_defs)
+
+
+def save_snapshot(compiled, path, dense=False):
+    """Writes a snapshot file atomically (readers never see a partial file)."""
+    data = dumps_snapshot(compiled, dense)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(path):
+    with open(path, "rb") as f:
+        return loads_snapshot(f.read())
@@ -0,0 +1,180 @@
+# stream_parser.py
+#
+# Streaming counterpart of parser_simulator.py: tokens are pulled from an
+# iterator (or pushed one at a time) and only the parse stack is kept, so
+# memory is bounded by nesting depth instead of input length.
+import mmap
+import re
+
+from parsing_table import NO_RULE
+
+_TOKEN_RE = re.compile(r'\S+')
+_TOKEN_RE_BYTES = re.compile(rb'\S+')
+
+
+class TokenSplitter:
+    """
+    Incremental whitespace tokenizer: feed it text or byte chunks and it
+    returns the tokens completed so far. A token cut by a chunk boundary is
+    held back until the next chunk (or close()).
+    """
+
+    def __init__(self):
+        self._partial = None
+
+    def feed(self, chunk):
+        if self._partial:
+            chunk = self._partial + chunk
+        parts = chunk.split()
+        # If the chunk does not end on whitespace its last token may continue
+        if parts and not chunk[-1:].isspace():
+            self._partial = parts.pop()
+        else:
+            self._partial = None
+        return [_decode(p) for p in parts]
+
+    def close(self):
+        partial, self._partial = self._partial, None
+        return [_decode(partial)] if partial else []
+
+
+def _decode(token):
+    return token.decode("utf-8") if isinstance(token, (bytes, bytearray)) else token
+
+
+def iter_tokens(source, chunk_size=64 * 1024):
+    """
+    Lazily yields whitespace-separated tokens from:
+      - a str, bytes, bytearray, memoryview or mmap (scanned in place with a regex)
+      - a file object (read chunk_size at a time)
+      - any other iterable of str/bytes chunks
+    """
+    if isinstance(source, str):
+        for m in _TOKEN_RE.finditer(source):
+            yield m.group()
+        return
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        for m in _TOKEN_RE_BYTES.finditer(source):
+            yield m.group().decode("utf-8")
+        return
+
+    if hasattr(source, "read"):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = source
+
+    splitter = TokenSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
+
+
+def iter_file_tokens(path):
+    """Yields the tokens of a file through a read-only memory map."""
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return
+        with buffer:
+            yield from iter_tokens(buffer)
+
+
+class StreamParser:
+    """
+    Push-based LL(1) parser over a CompiledTable.
+    Call feed(token) for every token and finish() at the end of input.
+    feed() returns the parse events the token produced (an empty tuple when
+    events=False); finish() always ends with the "end" record:
+        {"event": "expand", "symbol": A, "production": [...]}
+        {"event": "match", "token": t, "position": i}
+        {"event": "error", "symbol": top, "token": t, "position": i}
+        {"event": "end", "result": "Accepted" | "Rejected", "tokens": n}
+    expand/match events come in pre-order, so a consumer can rebuild the
+    parse tree from them.
+    """
+
+    def __init__(self, table, start_symbol, events=True):
+        self.table = table
+        self.events = events
+        self.end_code = table.t_index['$']
+        self.stack = [self.end_code, table.code(start_symbol)]
+        self.position = 0
+        self.status = None
+        self.error = None
+
+    def feed(self, token):
+        """Consumes one token. Tokens after the parse has finished are ignored."""
+        if self.status is not None:
+            return ()
+        return self._consume(token, self.table.t_index.get(token, -1))
+
+    def finish(self):
+        """Consumes the end marker '$' and returns the remaining events."""
+        out = self._consume('$', self.end_code) if self.status is None else []
+        end = {"event": "end", "result": self.status, "tokens": self.position}
+        return [*out, end]
+
+    def _consume(self, token, code):
+        table = self.table
+        stack = self.stack
+        n_terminals = table.n_terminals
+        row_of, base, check, values = table.rows.arrays
+        events = [] if self.events else None
+
+        while stack:
+            top = stack.pop()
+            if top == code:
+                if events is not None:
+                    events.append({"event": "match", "token": token, "position": self.position})
+                if code != self.end_code:
+                    self.position += 1
+                if not stack:
+                    self.status = "Accepted"
+                return events if events is not None else ()
+
+            p = NO_RULE
+            if top >= n_terminals and code >= 0:
+                r = row_of[top - n_terminals]
+                i = base[r] + code
+                if check[i] == r:
+                    p = values[i]
+            if p == NO_RULE:
+                stack.append(top)
+                self.status = "Rejected"
+                self.error = {
+                    "event": "error",
+                    "symbol": table.names[top],
+                    "token": token,
+                    "position": self.position
+                }
+                if events is not None:
+                    events.append(self.error)
+                return events if events is not None else ()
+
+            if events is not None:
+                events.append({
+                    "event": "expand",
+                    "symbol": table.names[top],
+                    "production": table.productions[p]
+                })
+            stack.extend(table.push_codes[p])
+
+        return events if events is not None else ()
+
+
+def stream_parse(table, start_symbol, tokens, events=True):
+    """
+    Generator version of StreamParser: pulls tokens from any iterable
+    (see iter_tokens / iter_file_tokens) and yields parse events, ending
+    with the {"event": "end", ...} record.
+    """
+    parser = StreamParser(table, start_symbol, events)
+    for token in tokens:
+        out = parser.feed(token)
+        if out:
+            yield from out
+        if parser.status is not None:
+            break
+    yield from parser.finish()
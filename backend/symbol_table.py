@@ -0,0 +1,71 @@
+# symbol_table.py
+#
+# FIRST/FOLLOW sets are stored as int bitmasks over interned terminals:
+# bit i is set when symbols[i] is in the set. Bit 0 is always 'eps' and
+# bit 1 is always '$', so EPS / END can be tested without a lookup.
+
+EPS = 1 << 0
+END = 1 << 1
+
+
+def iter_bits(mask):
+    """Yields the positions of the set bits of mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class SymbolTable:
+    """Maps terminal names to bit positions and back."""
+
+    def __init__(self, terminals=()):
+        self.symbols = []
+        self.index = {}
+        self.intern('eps')
+        self.intern('$')
+        for t in terminals:
+            self.intern(t)
+
+    @classmethod
+    def from_grammar(cls, grammar):
+        """Interns every terminal of the grammar, in order of first appearance."""
+        table = cls()
+        for productions in grammar.values():
+            for production in productions:
+                for sym in production:
+                    if sym not in grammar:
+                        table.intern(sym)
+        return table
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def intern(self, sym):
+        """Returns the bit position of sym, assigning a new one if needed."""
+        pos = self.index.get(sym)
+        if pos is None:
+            pos = len(self.symbols)
+            self.index[sym] = pos
+            self.symbols.append(sym)
+        return pos
+
+    def bit(self, sym):
+        return 1 << self.intern(sym)
+
+    def mask(self, symbols):
+        """Encodes an iterable of symbol names as a bitmask."""
+        result = 0
+        for sym in symbols:
+            result |= 1 << self.intern(sym)
+        return result
+
+    def to_set(self, mask):
+        """Decodes a bitmask back into a set of symbol names."""
+        symbols = self.symbols
+        return {symbols[i] for i in iter_bits(mask)}
+
+    def to_list(self, mask):
+        """Decodes a bitmask into a list of names, in interning order."""
+        symbols = self.symbols
+        return [symbols[i] for i in iter_bits(mask)]
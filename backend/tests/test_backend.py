@@ -1,6 +1,10 @@
+import json
+import time
+
 import pytest
 from fastapi.testclient import TestClient
 from main import app
+from batch_parser import MAX_BATCH_SIZE
 
 client = TestClient(app)
 
@@ -18,14 +22,14 @@ T -> F T'
 T' -> * F T' | eps
 F -> ( E ) | id"""
 
-    response = client.post("/upload_grammar", json={"grammar": grammar_text})
+    response = client.post("/analyze", json={"grammar_text": grammar_text})
     data = response.json()
 
     assert response.status_code == 200
-    assert "FIRST" in data
-    assert "FOLLOW" in data
-    assert "table" in data
-    assert data["grammar"]["E"][0] == "T E'"
+    assert "first" in data
+    assert "follow" in data
+    assert "parsing_table" in data
+    assert data["grammar"]["E"][0] == ["T", "E'"]
 
 def test_parse_input():
     """Check parsing of input string using uploaded grammar."""
@@ -35,15 +39,359 @@ T -> F T'
 T' -> * F T' | eps
 F -> ( E ) | id"""
 
-    # Step 1: upload grammar
-    client.post("/upload_grammar", json={"grammar": grammar_text})
-
-    # Step 2: parse input string
-    response = client.post("/parse_input", json={"input": "id + id * id"})
+    # /parse takes the grammar with every request (compiled once, then cached)
+    response = client.post("/parse", json={"grammar_text": grammar_text,
+                                           "input_string": "id + id * id"})
     data = response.json()
 
     assert response.status_code == 200
-    assert "trace" in data
+    assert "trace_steps" in data
     assert "parse_tree" in data
     assert "result" in data
     assert data["result"] == "Accepted"
+
+def test_analyze_and_parse_share_compiled_grammar():
+    """/parse should reuse the grammar compiled by /analyze."""
+    grammar_text = """S -> a S b | eps"""
+
+    before = client.get("/cache/stats").json()
+    assert client.post("/analyze", json={"grammar_text": grammar_text}).status_code == 200
+    response = client.post("/parse", json={"grammar_text": grammar_text, "input_string": "a a b b"})
+    after = client.get("/cache/stats").json()
+
+    assert response.status_code == 200
+    assert response.json()["result"] == "Accepted"
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+
+def test_register_grammar_and_parse_by_id():
+    """A registered grammar can be parsed against with only the input string."""
+    grammar_text = """S -> ( S ) S | eps"""
+
+    response = client.post("/grammars", json={"grammar_text": grammar_text})
+    assert response.status_code == 200
+    grammar_id = response.json()["grammar_id"]
+
+    # Registering the same grammar again gives the same ID
+    again = client.post("/grammars", json={"grammar_text": "S  ->  ( S ) S|eps"})
+    assert again.json()["grammar_id"] == grammar_id
+
+    response = client.post(f"/grammars/{grammar_id}/parse", json={"input_string": "( ( ) ) ( )"})
+    assert response.status_code == 200
+    assert response.json()["result"] == "Accepted"
+
+    assert client.post("/grammars/unknown/parse", json={"input_string": "( )"}).status_code == 404
+    assert client.delete(f"/grammars/{grammar_id}").status_code == 200
+    assert client.post(f"/grammars/{grammar_id}/parse", json={"input_string": "( )"}).status_code == 404
+
+def test_parse_batch_endpoint():
+    response = client.post("/parse/batch", json={
+        "grammar_text": "S -> a S b | eps",
+        "inputs": ["a b", "a a b", ""],
+        "include_trace": True
+    })
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["count"] == 3
+    assert data["accepted"] == 2
+    assert [r["result"] for r in data["results"]] == ["Accepted", "Rejected", "Accepted"]
+    assert data["results"][0]["parse_tree"]["name"] == "S"
+
+def test_parse_recognize_mode():
+    response = client.post("/parse", json={
+        "grammar_text": "S -> a S b | eps",
+        "input_string": "a a b b",
+        "mode": "recognize"
+    })
+    assert response.status_code == 200
+    assert response.json() == {"result": "Accepted"}
+
+def test_parse_stream_chunked_body():
+    grammar_id = client.post("/grammars", json={"grammar_text": "S -> a S b | eps"}).json()["grammar_id"]
+
+    def chunks():
+        yield b"a a"
+        yield b" a b"  # the tokens are split across chunk boundaries
+        yield b" b b"
+
+    response = client.post(f"/grammars/{grammar_id}/parse/stream", content=chunks())
+    assert response.status_code == 200
+    assert response.json() == {"result": "Accepted", "tokens": 6, "error": None}
+
+    response = client.post(f"/grammars/{grammar_id}/parse/stream?events=true", content=b"a b b")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0] == {"event": "expand", "symbol": "S", "production": ["a", "S", "b"]}
+    assert events[-2] == {"event": "error", "symbol": "$", "token": "b", "position": 2}
+    assert events[-1] == {"event": "end", "result": "Rejected", "tokens": 2}
+
+def test_parse_stream_rejects_invalid_utf8():
+    grammar_id = client.post("/grammars", json={"grammar_text": "S -> a S b | eps"}).json()["grammar_id"]
+    response = client.post(f"/grammars/{grammar_id}/parse/stream", content=b"a \xff b")
+    assert response.status_code == 400
+
+def test_parse_batch_rejects_oversized_batch():
+    response = client.post("/parse/batch", json={
+        "grammar_text": "S -> a",
+        "inputs": ["a"] * (MAX_BATCH_SIZE + 1)
+    })
+    assert response.status_code == 422
+
+def test_parse_stream_ndjson_and_sse():
+    body = {"grammar_text": "S -> a S b | eps", "input_string": "a b"}
+    full = client.post("/parse", json=body).json()
+
+    response = client.post("/parse/stream", json=body)
+    records = [json.loads(line) for line in response.text.splitlines()]
+    steps = [{k: v for k, v in r.items() if k != "type"} for r in records if r["type"] == "step"]
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert steps == full["trace_steps"]
+    assert records[-1] == {"type": "result", "result": "Accepted", "parse_tree": full["parse_tree"]}
+
+    response = client.post("/parse/stream?format=sse", json=body)
+    events = response.text.strip().split("\n\n")
+    assert events[0].startswith("event: step\ndata: ")
+    assert events[-1].startswith("event: result\ndata: ")
+    assert len(events) == len(full["trace_steps"]) + 1
+
+
+def test_parse_stream_routes_methods_like_parse():
+    body = {"grammar_text": "E -> E + E | a", "input_string": "a + a + a"}
+    full = client.post("/parse", json=body).json()
+    records = [json.loads(line) for line in client.post("/parse/stream", json=body).text.splitlines()]
+    assert [r["action"] for r in records[:-1]] == [s["action"] for s in full["trace_steps"]]
+    assert records[-1]["method"] == "earley"
+    assert records[-1]["parse_tree"] == full["parse_tree"]
+
+    body["method"] = "ll1"
+    assert client.post("/parse/stream", json=body).status_code == 400
+    body = {"grammar_text": "E -> E + a | a", "input_string": "a + a", "method": "lalr"}
+    records = [json.loads(line) for line in client.post("/parse/stream", json=body).text.splitlines()]
+    assert records[-1]["result"] == "Accepted"
+
+def test_download_generated_parser():
+    grammar_id = client.post("/grammars", json={"grammar_text": "S -> a S b | eps"}).json()["grammar_id"]
+    response = client.get(f"/grammars/{grammar_id}/parser.py")
+    assert response.status_code == 200
+    namespace = {}
+    exec(response.text, namespace)
+    assert namespace["recognize"]("a a b b") == "Accepted"
+
+def test_analyze_repairs_indirect_left_recursion():
+    response = client.post("/analyze", json={"grammar_text": "S -> A a | b\nA -> S c | d"})
+    data = response.json()
+    assert data["error_type"] == "LEFT_RECURSION"
+    assert data["recursive_non_terminals"] == ["S", "A"]
+    assert "A'" in data["repaired_grammar_text"]
+
+def test_incremental_analysis_session():
+    grammar = "S -> a A\nA -> b | eps"
+    created = client.post("/analyze/sessions", json={"grammar_text": grammar}).json()
+    session_id = created["session_id"]
+    assert created["valid"]
+    assert created["incremental"]["mode"] == "full"
+
+    edited = grammar.replace("A -> b | eps", "A -> b | c | eps")
+    updated = client.put(f"/analyze/sessions/{session_id}", json={"grammar_text": edited}).json()
+    full = client.post("/analyze", json={"grammar_text": edited}).json()
+    assert updated["incremental"]["mode"] == "incremental"
+    assert updated["incremental"]["changed_rules"] == ["A"]
+    assert updated["parsing_table"] == full["parsing_table"]
+    assert updated["first"] == full["first"]
+
+    assert client.delete(f"/analyze/sessions/{session_id}").status_code == 200
+    assert client.put(f"/analyze/sessions/{session_id}", json={"grammar_text": edited}).status_code == 404
+
+
+def test_large_session_edits_run_on_the_executor():
+    grammar = "\n".join(f"N{i} -> t{i} N{i + 1} | eps" for i in range(300)) + "\nN300 -> t"
+    before = client.get("/executor/stats").json()["thread"]
+    session_id = client.post("/analyze/sessions", json={"grammar_text": grammar}).json()["session_id"]
+    edited = grammar.replace("N300 -> t", "N300 -> t | u")
+    updated = client.put(f"/analyze/sessions/{session_id}", json={"grammar_text": edited}).json()
+    assert updated["incremental"]["changed_rules"] == ["N300"]
+    assert client.get("/executor/stats").json()["thread"] == before + 2
+
+def test_download_snapshot():
+    from snapshot import loads_snapshot
+    grammar_id = client.post("/grammars", json={"grammar_text": "S -> a S b | eps"}).json()["grammar_id"]
+    response = client.get(f"/grammars/{grammar_id}/snapshot")
+    assert response.status_code == 200
+    loaded = loads_snapshot(response.content)
+    assert loaded.key == grammar_id
+    assert loaded.parsing_table["S"]["a"] == ["a", "S", "b"]
+
+def test_overloaded_executor_returns_503(monkeypatch):
+    from executor import cpu_executor, OverloadedError
+
+    async def busy(*args, **kwargs):
+        raise OverloadedError("Server is busy")
+
+    grammar_text = "S -> a S b | eps"
+    response = client.post("/parse?timeout=5", json={"grammar_text": grammar_text, "input_string": "a b"})
+    assert response.status_code == 200
+
+    monkeypatch.setattr(cpu_executor, "run", busy)
+    response = client.post("/parse", json={"grammar_text": grammar_text, "input_string": "a b"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert "queue_depth" in client.get("/executor/stats").json()
+
+def test_profile_header_and_metrics():
+    """X-Profile is opt-in and lists the stages; /metrics exports them."""
+    grammar_text = """S -> a B | c
+B -> b S | eps"""
+
+    plain = client.post("/analyze", json={"grammar_text": grammar_text})
+    assert plain.status_code == 200
+    assert "x-profile" not in plain.headers
+
+    # A grammar not seen before, so the compile stages are in the profile
+    profiled = client.post("/parse", json={"grammar_text": grammar_text.replace("c", "d"),
+                                           "input_string": "a b d"},
+                           headers={"X-Profile": "1"})
+    assert profiled.status_code == 200
+    assert profiled.json()["result"] == "Accepted"
+    profile = json.loads(profiled.headers["x-profile"])
+    stages = [s["stage"] for s in profile["stages"]]
+    assert profile["cache"] == "miss"
+    for stage in ("read_grammar", "nullable", "first", "follow", "table", "serialize"):
+        assert stage in stages
+    first = next(s for s in profile["stages"] if s["stage"] == "first")
+    assert first["set_elements"] == 3  # FIRST(S) = {a, d}, FIRST(B) = {b}
+
+    text = client.get("/metrics").text
+    assert 'll1_stage_seconds_count{stage="follow"}' in text
+    assert 'll1_http_request_seconds_count{method="POST",route="/parse",status="200"}' in text
+    assert "ll1_grammar_cache_misses_total" in text
+    assert "ll1_executor_queue_depth" in text
+
+
+def test_lalr_method_accepts_left_recursion():
+    grammar = "E -> E + T | T\nT -> T * F | F\nF -> ( E ) | id"
+    response = client.post("/analyze", json={"grammar_text": grammar, "method": "lalr"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["valid"] is True
+    assert data["action_table"]["0"] == {"(": "s4", "id": "s5"}
+    assert data["productions"][0] == ["E'", ["E"]]
+
+    response = client.post("/parse", json={"grammar_text": grammar, "input_string": "id + id * id",
+                                           "method": "lalr"})
+    assert response.status_code == 200
+    assert response.json()["result"] == "Accepted"
+    assert response.json()["parse_tree"]["name"] == "E"
+
+    # The LL(1) method still refuses the grammar
+    response = client.post("/parse", json={"grammar_text": grammar, "input_string": "id",
+                                           "method": "ll1"})
+    assert response.status_code == 400
+
+
+def test_lalr_method_rejects_conflicts():
+    grammar = "S -> a A d | b B d | a B e | b A e\nA -> c\nB -> c"
+    response = client.post("/parse", json={"grammar_text": grammar, "input_string": "a c d",
+                                           "method": "lalr"})
+    assert response.status_code == 400
+    assert "LALR(1)" in response.json()["detail"]
+
+
+def test_parse_falls_back_to_earley_for_non_ll1_grammar():
+    grammar = "E -> E + E | E * E | id"
+    response = client.post("/parse", json={"grammar_text": grammar, "input_string": "id + id * id"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["method"] == "earley"
+    assert data["result"] == "Accepted"
+    assert data["ambiguous"] is True
+    assert data["parse_tree"]["name"] == "E"
+
+    response = client.post("/parse", json={"grammar_text": grammar, "input_string": "id + +",
+                                           "mode": "recognize"})
+    assert response.json() == {"result": "Rejected", "method": "earley"}
+
+    # LL(1) grammars keep the LL(1) response
+    response = client.post("/parse", json={"grammar_text": "S -> a S | b", "input_string": "a b"})
+    assert "method" not in response.json()
+
+
+def test_parse_tree_columns_format():
+    body = {"grammar_text": "S -> a S | b", "input_string": "a a b", "tree_format": "columns"}
+    tree = client.post("/parse", json=body).json()["parse_tree"]
+    assert [tree["names"][s] for s in tree["symbol"]] == ["S", "a", "S", "a", "S", "b"]
+    assert tree["parent"] == [-1, 0, 0, 2, 2, 4]
+    assert (tree["start"][0], tree["end"][0]) == (0, 3)
+
+    body["method"] = "lalr"
+    lr_tree = client.post("/parse", json=body).json()["parse_tree"]
+    assert lr_tree["parent"] == tree["parent"]
+
+
+def test_analyze_field_selection_and_pages():
+    grammar = "S -> A B\nA -> a | eps\nB -> b"
+    full = client.post("/analyze", json={"grammar_text": grammar}).json()
+    page = client.post("/analyze", json={"grammar_text": grammar, "fields": ["first", "parsing_table"],
+                                         "offset": 1, "limit": 1}).json()
+    assert set(page) == {"first", "parsing_table", "page"}
+    assert page["first"] == {"A": full["first"]["A"]}
+    assert page["parsing_table"] == {"A": full["parsing_table"]["A"]}
+
+    response = client.post("/analyze", json={"grammar_text": grammar, "fields": ["tables"]})
+    assert response.status_code == 400
+
+
+def test_parse_with_error_recovery():
+    body = {"grammar_text": "S -> a S | b", "input_string": "a c a b", "recover": True}
+    data = client.post("/parse", json=body).json()
+    assert data["result"] == "Rejected"
+    assert data["errors"] == [{"position": 1, "token": "c", "expected": ["a", "b"],
+                               "recovery": "skip", "skipped": 1}]
+    assert data["parse_tree"]["name"] == "S"
+
+    body["mode"] = "recognize"
+    assert client.post("/parse", json=body).json()["errors"] == data["errors"]
+
+    body = {"grammar_text": "S -> S a | b", "input_string": "b a", "recover": True}
+    assert client.post("/parse", json=body).status_code == 400
+
+
+def test_parse_raw_text_with_token_definitions():
+    grammar = "S -> id = num ;\n%token id [a-z]+\n%token num [0-9]+"
+    data = client.post("/parse", json={"grammar_text": grammar, "input_string": "x=42;"}).json()
+    assert data["result"] == "Accepted"
+    assert data["trace_steps"][0]["input"] == ["id", "=", "num", ";", "$"]
+
+    response = client.post("/parse", json={"grammar_text": grammar, "input_string": "x = 4!",
+                                           "mode": "recognize"})
+    assert response.status_code == 400
+    assert "Lexical error" in response.json()["detail"]
+
+    grammar_id = client.post("/grammars", json={"grammar_text": grammar}).json()["grammar_id"]
+    response = client.post(f"/grammars/{grammar_id}/parse/stream", content=b"abc=1;")
+    assert response.json()["result"] == "Accepted"
+
+
+@pytest.mark.parametrize("method", ["ll1", "lalr", "earley"])
+def test_parse_deep_right_recursive_tree(method):
+    grammar = "E -> T E'\nE' -> + T E' | eps\nT -> F T'\nT' -> * F T' | eps\nF -> ( E ) | id"
+    body = {"grammar_text": grammar, "input_string": " + ".join(["id"] * 300), "method": method}
+    response = client.post("/parse", json=body)
+    assert response.status_code == 200
+    assert response.json()["result"] == "Accepted"
+
+
+def test_earley_jobs_leave_the_event_loop_and_stop_at_the_deadline(monkeypatch):
+    import main
+
+    grammar = "E -> E + E | E * E | a"
+    body = {"grammar_text": grammar, "input_string": " + ".join(["a"] * 151)}
+    before = client.get("/executor/stats").json()
+    start = time.perf_counter()
+    response = client.post("/parse?timeout=0.5", json=body)
+    assert response.status_code == 504
+    assert time.perf_counter() - start < 5
+    after = client.get("/executor/stats").json()
+    assert after["timeouts"] == before["timeouts"] + 1
+
+    monkeypatch.setattr(main, "MAX_EARLEY_TOKENS", 100)
+    assert client.post("/parse", json=body).status_code == 413
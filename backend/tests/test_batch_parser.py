@@ -0,0 +1,30 @@
+from grammar_cache import compile_grammar
+import pytest
+
+import batch_parser
+from batch_parser import parse_batch, shutdown_pool
+
+
+def test_parse_batch_keeps_input_order_across_workers(monkeypatch):
+    monkeypatch.setattr(batch_parser, "PARSE_WORKERS", 2)
+    compiled = compile_grammar("S -> a S b | eps")
+    inputs = [" ".join(["a"] * n + ["b"] * n) for n in range(100)] + ["a b b", "c"]
+
+    results = parse_batch(
+        compiled.grammar, compiled.table, compiled.start_symbol,
+        inputs, chunk_size=7
+    )
+    shutdown_pool()
+
+    assert [r["index"] for r in results] == list(range(len(inputs)))
+    assert all(r["result"] == "Accepted" for r in results[:100])
+    assert results[100]["result"] == "Rejected"
+    assert results[101]["result"] == "Rejected"
+    assert "trace_steps" not in results[0]
+
+
+def test_parse_batch_size_limit(monkeypatch):
+    monkeypatch.setattr(batch_parser, "MAX_BATCH_SIZE", 3)
+    compiled = compile_grammar("S -> a")
+    with pytest.raises(ValueError):
+        parse_batch(compiled.grammar, compiled.table, compiled.start_symbol, ["a"] * 4)
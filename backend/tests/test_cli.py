@@ -0,0 +1,76 @@
+import json
+import os
+import subprocess
+import sys
+
+import cli
+
+with open("tests/sample_grammar.txt") as f:
+    SAMPLE = f.read()
+
+
+def _records(text):
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def _corpus(tmp_path):
+    grammar = tmp_path / "expr.txt"
+    grammar.write_text(SAMPLE)
+    inputs = tmp_path / "inputs"
+    (inputs / "sub").mkdir(parents=True)
+    (inputs / "a.in").write_text("id + id * id\n")
+    (inputs / "sub" / "b.in").write_text("( id + id ) * id")
+    (inputs / "c.in").write_text("id + * id")
+    (inputs / "skip.txt").write_text("not parsed")
+    return grammar, inputs
+
+
+def test_compile_and_check(tmp_path, capsys):
+    grammar, _ = _corpus(tmp_path)
+    bad = tmp_path / "bad.txt"
+    bad.write_text("E -> E + id | id")
+
+    assert cli.main(["compile", str(grammar), "--output-dir", str(tmp_path / "out")]) == 0
+    record, = _records(capsys.readouterr().out)
+    assert record["valid"] is True
+    assert os.path.exists(record["snapshot"])
+
+    assert cli.main(["check", str(grammar), record["snapshot"], str(bad), "--jobs", "1"]) == 1
+    checks = _records(capsys.readouterr().out)
+    assert [c["valid"] for c in checks] == [True, True, False]
+    assert checks[2]["left_recursion"] == ["E"]
+
+
+def test_parse_directory_in_parallel(tmp_path, capsys):
+    grammar, inputs = _corpus(tmp_path)
+    assert cli.main(["parse", str(grammar), str(inputs), "--glob", "*.in", "--jobs", "2"]) == 1
+    *records, summary = _records(capsys.readouterr().out)
+    results = {os.path.basename(r["file"]): r for r in records}
+    assert set(results) == {"a.in", "b.in", "c.in"}
+    assert results["a.in"]["result"] == "Accepted"
+    assert results["a.in"]["tokens"] == 5
+    assert results["c.in"]["error"]["token"] == "*"
+    summary = summary["summary"]
+    assert (summary["files"], summary["accepted"], summary["rejected"]) == (3, 2, 1)
+    assert summary["tokens"] > 0
+
+
+def test_parse_with_lexer_grammar(tmp_path, capsys):
+    grammar = tmp_path / "assign.txt"
+    grammar.write_text("S -> id = num ;\n%token id [a-z]+\n%token num [0-9]+")
+    (tmp_path / "ok.src").write_text("x=1;")
+    (tmp_path / "bad.src").write_text("x=1?")
+    output = tmp_path / "out.jsonl"
+    cli.main(["parse", str(grammar), str(tmp_path / "ok.src"), str(tmp_path / "bad.src"),
+              "--jobs", "1", "--output", str(output)])
+    records = _records(output.read_text())
+    assert [r.get("result") for r in records[:2]] == ["Accepted", "Error"]
+
+
+def test_cli_does_not_import_web_stack(tmp_path):
+    grammar, inputs = _corpus(tmp_path)
+    code = ("import sys, cli; cli.main(['check', %r]); cli.main(['parse', %r, %r, '--jobs', '1']); "
+            "assert not {'fastapi', 'pydantic', 'starlette'} & set(sys.modules)") % (
+        str(grammar), str(grammar), str(inputs / "a.in"))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
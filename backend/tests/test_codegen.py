@@ -0,0 +1,30 @@
+import random
+
+from grammar_cache import compile_grammar
+from parser_simulator import recognize
+from codegen import GeneratedParser
+
+GRAMMARS = [
+    "S -> a S b | eps",
+    "E -> T E'\nE' -> + T E' | eps\nT -> F T'\nT' -> * F T' | eps\nF -> ( E ) | id",
+    "S -> A B c\nA -> a | eps\nB -> b | eps",
+    "S -> a b c | f S | g | h | i | j",
+]
+
+
+def test_generated_parser_matches_table_recognizer():
+    rng = random.Random(7)
+    for text in GRAMMARS:
+        compiled = compile_grammar(text)
+        parser = GeneratedParser(compiled.table, compiled.start_symbol, compiled.key)
+        tokens = compiled.symbols.symbols[2:] + ["unknown", "$"]
+        for _ in range(500):
+            s = " ".join(rng.choice(tokens) for _ in range(rng.randint(0, 10)))
+            assert parser.recognize(s) == recognize(compiled.table, compiled.start_symbol, s)
+
+
+def test_generated_parser_deep_nesting_falls_back():
+    compiled = compile_grammar("S -> a S b | eps")
+    deep = " ".join(["a"] * 5000 + ["b"] * 5000)
+    assert compiled.generated_parser.recognize(deep) == "Accepted"
+    assert compiled.generated_parser.recognize(deep + " b") == "Rejected"
@@ -0,0 +1,97 @@
+import pytest
+
+from benchmarks.generators import random_ll1_grammar, valid_input, invalid_input
+from earley import EarleyGrammar, earley_run, earley_recognize, earley_parse_to_dict, forest_to_tree
+from grammar_cache import compile_grammar
+from grammar_rewriter import grammar_to_string
+from grammar_utils import read_grammar
+from parser_simulator import parse_to_dict
+
+
+def _leaves(tree):
+    if not tree["children"]:
+        return [tree["name"]]
+    return [leaf for child in tree["children"] for leaf in _leaves(child)]
+
+
+def test_left_recursive_grammar():
+    g = EarleyGrammar(read_grammar("E -> E + T | T\nT -> T * F | F\nF -> ( E ) | id"))
+    result = earley_parse_to_dict(g, "( id + id ) * id")
+    assert result["result"] == "Accepted"
+    assert result["ambiguous"] is False
+    assert _leaves(result["parse_tree"]) == ["(", "id", "+", "id", ")", "*", "id"]
+    assert result["trace_steps"][-1]["action"] == "Accepted"
+
+
+def test_ambiguous_grammar_builds_shared_forest():
+    g = EarleyGrammar(read_grammar("E -> E + E | id"))
+    chart = earley_run(g, "id + id + id".split())
+    assert chart.accepted
+    # Both bracketings share one root symbol node with two packed families
+    assert len(chart.families[chart.root]) == 2
+    tree, ambiguous = forest_to_tree(chart)
+    assert ambiguous
+    assert _leaves(tree) == ["id", "+", "id", "+", "id"]
+
+
+def test_nullable_completion():
+    # B is nullable and completes in the same set it is predicted in
+    g = EarleyGrammar(read_grammar("S -> A A x\nA -> B\nB -> eps"))
+    result = earley_parse_to_dict(g, "x")
+    assert result["result"] == "Accepted"
+    eps_a = {"name": "A", "children": [{"name": "B", "children": [{"name": "eps", "children": []}]}]}
+    assert result["parse_tree"] == {"name": "S", "children": [eps_a, eps_a, {"name": "x", "children": []}]}
+
+
+def test_cyclic_grammar_still_yields_a_tree():
+    g = EarleyGrammar(read_grammar("S -> S | A | a\nA -> S | eps"))
+    assert earley_parse_to_dict(g, "a")["parse_tree"] == {"name": "S", "children": [{"name": "a", "children": []}]}
+    assert earley_parse_to_dict(g, "")["result"] == "Accepted"
+
+
+@pytest.mark.parametrize("text,position,expected", [
+    ("id + * id", 2, "(, id"),
+    ("id id", 1, "$, ), *, +"),
+    ("", 0, "(, id"),
+])
+def test_rejected_input_reports_position_and_expected_tokens(text, position, expected):
+    g = EarleyGrammar(read_grammar("E -> E + T | T\nT -> T * F | F\nF -> ( E ) | id"))
+    result = earley_parse_to_dict(g, text)
+    assert result["result"] == "Rejected"
+    assert result["trace_steps"][-1]["action"].endswith(f"at position {position} (expected: {expected})")
+    assert earley_recognize(g, text) == "Rejected"
+
+
+@pytest.mark.parametrize("n_nonterminals,seed", [(5, 0), (30, 1), (100, 2)])
+def test_agrees_with_ll1_on_generated_grammars(n_nonterminals, seed):
+    grammar = random_ll1_grammar(n_nonterminals, 10, seed=seed)
+    compiled = compile_grammar(grammar_to_string(grammar))
+    g = compiled.earley
+
+    for i in range(5):
+        for text in (valid_input(grammar, 60, seed=i), invalid_input(grammar, 60, seed=i)):
+            ll = parse_to_dict(compiled.table, "S", text)
+            result = earley_parse_to_dict(g, text)
+            assert result["result"] == ll["result"]
+            if ll["result"] == "Accepted":
+                assert result["parse_tree"] == ll["parse_tree"]
+                assert result["ambiguous"] is False
+
+
+def test_sets_stay_small_on_ll1_grammars():
+    grammar = random_ll1_grammar(100, 16, seed=4)
+    compiled = compile_grammar(grammar_to_string(grammar))
+    tokens = valid_input(grammar, 2000, seed=4).split()
+    chart = earley_run(compiled.earley, tokens)
+    assert chart.accepted
+    # Lookahead pruning: the items per set do not grow with the input
+    assert sum(n_items for n_items, _ in chart.sets[:-1]) < 20 * len(tokens)
+
+
+def test_run_stops_at_deadline():
+    import time
+
+    g = EarleyGrammar(read_grammar("E -> E + E | a"))
+    with pytest.raises(TimeoutError):
+        earley_run(g, "a + a".split(), deadline=time.monotonic() - 1)
+    assert earley_recognize(g, "a + a", deadline=time.monotonic() + 10) == "Accepted"
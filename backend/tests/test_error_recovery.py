@@ -0,0 +1,64 @@
+from grammar_cache import compile_grammar
+from parser_simulator import parse_to_dict
+from error_recovery import RecoveryTable, parse_to_dict_with_recovery, recover_errors
+
+with open("tests/sample_grammar.txt") as f:
+    COMPILED = compile_grammar(f.read())
+RECOVERY = RecoveryTable(COMPILED.table, COMPILED.follow_masks)
+
+
+def test_valid_input_matches_plain_parse():
+    result = parse_to_dict_with_recovery(RECOVERY, "E", "( id + id ) * id")
+    plain = parse_to_dict(COMPILED.table, "E", "( id + id ) * id")
+    assert result["result"] == "Accepted"
+    assert result["errors"] == []
+    assert result["trace_steps"] == plain["trace_steps"]
+    assert result["parse_tree"] == plain["parse_tree"]
+
+
+def test_all_errors_in_one_pass():
+    result = recover_errors(RECOVERY, "E", "id + * id id ) * + id")
+    assert result["result"] == "Rejected"
+    first, second = result["errors"]
+    # T has no entry for '*': skipped, then T goes on with 'id'
+    assert first == {"position": 2, "token": "*", "expected": ["(", "id"],
+                     "recovery": "skip", "skipped": 1}
+    # After a complete expression everything up to '$' is skipped
+    assert second["position"] == 4
+    assert second["expected"] == ["$", "+", "*", ")"]
+    assert second["skipped"] == 5
+
+
+def test_missing_terminal_is_inserted():
+    result = parse_to_dict_with_recovery(RECOVERY, "E", "( id + id")
+    assert result["errors"] == [{"position": 4, "token": "$", "expected": [")"],
+                                 "recovery": "insert", "skipped": 0}]
+    assert "ERROR: Missing ')' before '$'" in [s["action"] for s in result["trace_steps"]]
+    # The parse still runs to the end marker
+    assert result["trace_steps"][-1]["action"] == "Match '$'"
+
+
+def test_panic_mode_pops_at_sync_token():
+    # ')' is in FOLLOW(T): T is given up without skipping anything
+    assert recover_errors(RECOVERY, "E", ") id")["errors"][0]["recovery"] == "pop"
+    # Unknown tokens are skipped up to '$', a sync token of E
+    errors = recover_errors(RECOVERY, "E", "x +")["errors"]
+    assert [(e["position"], e["recovery"], e["skipped"]) for e in errors] == [(0, "skip+pop", 2)]
+    # Two separate errors: F gives up at '+', then ')' is extra input
+    errors = recover_errors(RECOVERY, "E", "id * + id ) id")["errors"]
+    assert [(e["position"], e["recovery"]) for e in errors] == [(2, "pop"), (4, "skip")]
+
+
+def test_trace_and_tree_with_skipped_tokens():
+    result = parse_to_dict_with_recovery(RECOVERY, "E", "id + * id", tree_format="columns")
+    actions = [s["action"] for s in result["trace_steps"]]
+    assert "ERROR: Skip '*'" in actions
+    tree = result["parse_tree"]
+    assert (tree["start"][0], tree["end"][0]) == (0, 4)
+
+
+def test_recovery_table_sets():
+    t = COMPILED.table
+    assert sorted(RECOVERY.expected[t.nt_index["E'"]]) == sorted(["$", "+", ")"])
+    sync = RECOVERY.sync[t.nt_index["F"]]
+    assert {t.terminals[i] for i in range(t.n_terminals) if sync >> i & 1} == {"+", "*", ")", "$"}
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import batch_parser
+from executor import BoundedExecutor, ClientDisconnected, JobTimeoutError, OverloadedError
+
+
+def test_tiers_by_cost(monkeypatch):
+    monkeypatch.setattr(batch_parser, "PARSE_WORKERS", 2)
+    executor = BoundedExecutor(slots=2, inline_cost=10, process_cost=100)
+
+    async def main():
+        assert await executor.run(len, "ab", cost=1) == 2
+        assert await executor.run(threading.get_ident, cost=50) != threading.get_ident()
+        assert await executor.run(sorted, [3, 1, 2], cost=500) == [1, 2, 3]
+        assert await executor.run(sorted, [2, 1], cost=500, processes=False) == [1, 2]
+
+    try:
+        asyncio.run(main())
+    finally:
+        batch_parser.shutdown_pool()
+    stats = executor.stats()
+    assert (stats["inline"], stats["thread"], stats["process"]) == (1, 2, 1)
+    assert stats["running"] == 0 and stats["completed"] == 3
+
+
+def test_queue_is_bounded():
+    executor = BoundedExecutor(slots=1, max_queue=1, inline_cost=0)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run(release.wait, cost=1))
+        second = asyncio.ensure_future(executor.run(len, "x", cost=1))
+        await asyncio.sleep(0.05)
+        assert executor.stats()["queue_depth"] == 1
+        with pytest.raises(OverloadedError):
+            await executor.run(len, "y", cost=1)
+        release.set()
+        assert await first is True
+        assert await second == 1
+
+    asyncio.run(main())
+    assert executor.stats()["rejected"] == 1
+    assert executor.stats()["running"] == 0
+
+
+def test_timeout_keeps_slot_until_job_ends():
+    executor = BoundedExecutor(slots=1, inline_cost=0, max_timeout=5)
+
+    async def main():
+        with pytest.raises(JobTimeoutError):
+            await executor.run(time.sleep, 0.3, cost=1, timeout=0.05)
+        # The sleeping thread still owns the only slot
+        assert executor.stats()["running"] == 1
+        await asyncio.sleep(0.4)
+        assert executor.stats()["running"] == 0
+        assert await executor.run(len, "ok", cost=1) == 2
+
+    asyncio.run(main())
+    assert executor.stats()["timeouts"] == 1
+    assert executor.timeout_for(None) == 5 and executor.timeout_for(60) == 5
+
+
+def test_disconnect_cancels_queued_job():
+    executor = BoundedExecutor(slots=1, inline_cost=0)
+    release = threading.Event()
+    ran = []
+
+    async def gone():
+        return True
+
+    async def main():
+        blocker = asyncio.ensure_future(executor.run(release.wait, cost=1))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ClientDisconnected):
+            await executor.run(ran.append, 1, cost=1, is_disconnected=gone)
+        release.set()
+        await blocker
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert ran == []
+    assert executor.stats()["cancelled"] == 1
+    assert executor.stats()["running"] == 0 and executor.stats()["queue_depth"] == 0
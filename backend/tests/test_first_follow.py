@@ -0,0 +1,165 @@
+import random
+
+from grammar_utils import read_grammar
+from first_follow import compute_first, compute_follow
+from parsing_table import compute_parsing_table
+from symbol_table import EPS, SymbolTable
+
+
+# --- Reference: the original fixed-point implementation ---
+
+def reference_first(grammar):
+    """
+    Compute FIRST sets for all non-terminals in the grammar.
+    """
+    first = {nt: set() for nt in grammar}
+    terminals = {
+        sym
+        for prods in grammar.values()
+        for prod in prods
+        for sym in prod
+        if sym not in grammar and sym != 'eps'
+    }
+
+    # Initialize with terminals
+    for t in terminals:
+        first[t] = {t}
+
+    changed = True
+    while changed:
+        changed = False
+        for nt, productions in grammar.items():
+            for production in productions:
+                # Rule: For X -> Y1 Y2 ... Yk
+                for symbol in production:
+                    # All of FIRST(Y1) - {eps} is in FIRST(X)
+                    first_y = first.get(symbol, {symbol}) # Handles terminals directly
+                    
+                    before_len = len(first[nt])
+                    first[nt].update(first_y - {'eps'})
+                    if len(first[nt]) > before_len:
+                        changed = True
+
+                    # If eps not in FIRST(Y1), then we stop.
+                    if 'eps' not in first_y:
+                        break
+                else:
+                    # If we finished the loop (all symbols' FIRST sets contained eps)
+                    # then add eps to FIRST(X)
+                    before_len = len(first[nt])
+                    first[nt].add('eps')
+                    if len(first[nt]) > before_len:
+                        changed = True
+    
+    # Remove terminals from the final dictionary if they were added
+    final_first = {k: v for k, v in first.items() if k in grammar}
+    return final_first
+
+def _reference_first_of_sequence(sequence, first_sets):
+    """Helper to compute FIRST set for a sequence of symbols (e.g., beta)."""
+    result = set()
+    for symbol in sequence:
+        symbol_first = first_sets.get(symbol, {symbol})
+        result.update(symbol_first - {'eps'})
+        if 'eps' not in symbol_first:
+            return result
+    # If we get through the whole loop, it means all symbols can be eps
+    result.add('eps')
+    return result
+
+
+def reference_follow(grammar, first, start_symbol):
+    """
+    Compute FOLLOW sets for all non-terminals.
+    """
+    follow = {nt: set() for nt in grammar}
+    follow[start_symbol].add('$')
+
+    changed = True
+    while changed:
+        changed = False
+        for A, productions in grammar.items():
+            for production in productions:
+                for i, B in enumerate(production):
+                    if B in grammar:  # B must be a non-terminal
+                        beta = production[i + 1:]
+                        
+                        before_len = len(follow[B])
+
+                        if beta:
+                            # Rule 2: FOLLOW(B) contains FIRST(beta) - {eps}
+                            first_beta = _reference_first_of_sequence(beta, first)
+                            follow[B].update(first_beta - {'eps'})
+
+                            # Rule 3: If FIRST(beta) contains eps, FOLLOW(B) contains FOLLOW(A)
+                            if 'eps' in first_beta:
+                                follow[B].update(follow[A])
+                        else:
+                            # Rule 3: For A -> alpha B, FOLLOW(B) contains FOLLOW(A)
+                            follow[B].update(follow[A])
+
+                        if len(follow[B]) > before_len:
+                            changed = True
+    return follow
+
+
+
+
+def _random_grammar(rng, n_nonterminals, n_terminals):
+    non_terminals = [f"N{i}" for i in range(n_nonterminals)]
+    # 'x' symbols are never defined, so they behave like terminals
+    symbols = non_terminals + [f"t{i}" for i in range(n_terminals)] + ["eps", "x0"]
+    grammar = {}
+    for nt in non_terminals:
+        grammar[nt] = [
+            [rng.choice(symbols) for _ in range(rng.randint(0, 4))]
+            for _ in range(rng.randint(1, 4))
+        ]
+    return grammar
+
+
+def test_first_follow_match_fixed_point_reference():
+    rng = random.Random(1234)
+    for _ in range(300):
+        grammar = _random_grammar(rng, rng.randint(1, 12), rng.randint(1, 5))
+        start_symbol = next(iter(grammar))
+
+        first = compute_first(grammar)
+        assert first == reference_first(grammar)
+        assert compute_follow(grammar, first, start_symbol) == reference_follow(grammar, first, start_symbol)
+
+
+def test_first_follow_expression_grammar():
+    with open("tests/sample_grammar.txt") as f:
+        grammar = read_grammar(f.read())
+
+    first = compute_first(grammar)
+    follow = compute_follow(grammar, first, "E")
+
+    assert first["E"] == {"(", "id"}
+    assert first["E'"] == {"+", "eps"}
+    assert follow["E"] == {")", "$"}
+    assert follow["T"] == {"+", ")", "$"}
+    assert follow["F"] == {"*", "+", ")", "$"}
+
+
+def test_symbol_table_masks_round_trip():
+    symbols = SymbolTable(["a", "b"])
+    mask = symbols.mask(["b", "eps", "c"])
+
+    assert mask & EPS
+    assert symbols.to_set(mask) == {"b", "eps", "c"}
+    assert symbols.to_list(mask) == ["eps", "b", "c"]
+
+
+def test_parsing_table_from_masks():
+    grammar = read_grammar("S -> A b | c\nA -> a | eps")
+    first = compute_first(grammar)
+    follow = compute_follow(grammar, first, "S")
+    table, conflicts = compute_parsing_table(grammar, first, follow)
+
+    assert conflicts == []
+    assert table == {
+        "S": {"a": ["A", "b"], "b": ["A", "b"], "c": ["c"]},
+        "A": {"a": ["a"], "b": ["eps"]},
+    }
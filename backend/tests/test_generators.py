@@ -0,0 +1,39 @@
+import pytest
+
+from benchmarks.generators import chain_grammar, random_ll1_grammar, valid_input, invalid_input
+from grammar_cache import compile_grammar
+from grammar_rewriter import grammar_to_string
+from parser_simulator import recognize
+
+
+@pytest.mark.parametrize("n_nonterminals,n_terminals,seed", [(5, 4, 0), (40, 12, 1), (200, 30, 2)])
+def test_generated_grammar_is_ll1(n_nonterminals, n_terminals, seed):
+    grammar = random_ll1_grammar(n_nonterminals, n_terminals, seed=seed)
+    compiled = compile_grammar(grammar_to_string(grammar))
+
+    assert compiled.valid
+    assert compiled.conflicts == []
+    assert len(compiled.grammar) == n_nonterminals + 1
+
+
+def test_generated_grammar_is_deterministic():
+    assert random_ll1_grammar(30, 10, seed=7) == random_ll1_grammar(30, 10, seed=7)
+
+
+@pytest.mark.parametrize("n_tokens", [1, 50, 2000])
+def test_generated_inputs(n_tokens):
+    grammar = random_ll1_grammar(30, 10, seed=3)
+    compiled = compile_grammar(grammar_to_string(grammar))
+
+    valid = valid_input(grammar, n_tokens, seed=n_tokens)
+    assert len(valid.split()) >= n_tokens
+    assert recognize(compiled.table, "S", valid) == "Accepted"
+    assert recognize(compiled.table, "S", invalid_input(grammar, n_tokens, seed=n_tokens)) == "Rejected"
+
+
+def test_chain_grammar_shape():
+    grammar = chain_grammar(8, n_terminals=4)
+    assert list(grammar)[:2] == ["N0", "N1"]
+    assert grammar["N0"] == [["N1", "t0"], ["eps"]]
+    assert ["N0", "t3"] in grammar["N3"]
+    assert grammar["N7"][0] == ["t3", "t3"]
@@ -0,0 +1,72 @@
+import pytest
+
+from grammar_cache import GrammarCache, RegistryFullError, grammar_key
+
+GRAMMAR = """E -> T E'
+E' -> + T E' | eps
+T -> F T'
+T' -> * F T' | eps
+F -> ( E ) | id"""
+
+
+def test_grammar_key_ignores_formatting():
+    """Whitespace, comments and blank lines should not change the key."""
+    messy = "# expression grammar\n\n" + GRAMMAR.replace(" -> ", "  ->   ").replace(" | ", "|")
+    assert grammar_key(messy) == grammar_key(GRAMMAR)
+    assert grammar_key(GRAMMAR) != grammar_key(GRAMMAR + "\nG -> id")
+
+
+def test_cache_hits_and_lru_eviction():
+    cache = GrammarCache(max_entries=2)
+    first = cache.get(GRAMMAR)
+    assert cache.get(GRAMMAR) is first
+    assert first.valid
+    assert first.parsing_table["E"]["id"] == ["T", "E'"]
+
+    cache.get("S -> a")
+    cache.get("S -> b")  # evicts GRAMMAR, the least recently used entry
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+
+
+def test_registry_is_capped():
+    cache = GrammarCache(max_registered=2)
+    cache.register(cache.get("S -> a"))
+    cache.register(cache.get("S -> b"))
+    cache.register(cache.get("S -> b"))  # already registered, not counted twice
+
+    with pytest.raises(RegistryFullError):
+        cache.register(cache.get("S -> c"))
+
+    assert cache.unregister(grammar_key("S -> a"))
+    cache.register(cache.get("S -> c"))
+    assert cache.stats()["registered"] == 2
+
+
+def test_lazy_products_count_against_the_memory_limit():
+    cache = GrammarCache()
+    first = cache.get(GRAMMAR)
+    before = first.size
+    first.lalr
+    first.encoding.entries("parsing_table")
+    assert first.size > before
+    assert cache.stats()["bytes"] == first.size
+
+    # Room for both grammars as compiled, not once the lazy products are built
+    second = cache.get("S -> a S | b")
+    cache.max_bytes = first.size + second.size
+    second.earley
+    second.parsing_table
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 1
+    assert stats["bytes"] == second.size
+    assert cache.peek(GRAMMAR) is None
+
+    # Registered grammars are accounted for too
+    cache.register(second)
+    second.generated_parser
+    assert cache.stats()["registered_bytes"] == second.size
@@ -0,0 +1,49 @@
+import io
+
+import pytest
+
+from grammar_loader import GrammarStore, GrammarSyntaxError, load_grammar, load_grammar_file
+from grammar_utils import read_grammar
+
+GRAMMAR = """# expression grammar
+E -> T E'
+E' -> + T E' | eps
+T -> F T'
+T' -> * F T' | eps
+F -> ( E ) | id
+F -> num"""
+
+
+def test_matches_read_grammar_for_every_source(tmp_path):
+    expected = read_grammar(GRAMMAR)
+    path = tmp_path / "grammar.txt"
+    path.write_text(GRAMMAR.replace("\n", "\r\n"))
+
+    assert load_grammar(GRAMMAR).to_dict() == expected
+    assert load_grammar(GRAMMAR.encode()).to_dict() == expected
+    assert load_grammar(io.StringIO(GRAMMAR), chunk_size=7).to_dict() == expected
+    assert load_grammar(io.BytesIO(GRAMMAR.encode()), chunk_size=5).to_dict() == expected
+    assert load_grammar_file(path).to_dict() == expected
+
+
+def test_store_is_indexed():
+    store = load_grammar(GRAMMAR)
+    assert store.non_terminals == ["E", "E'", "T", "T'", "F"]
+    assert len(store) == 9
+    f = store.index["F"]
+    assert [store.production(p) for p in store.rules[f]] == [["(", "E", ")"], ["id"], ["num"]]
+    assert GrammarStore.from_dict(store.to_dict()).to_dict() == store.to_dict()
+
+
+@pytest.mark.parametrize("text, line, column", [
+    ("S -> a\n  oops", 2, 3),
+    ("S -> a |", 1, 9),
+    ("S T -> a", 1, 3),
+    (" -> a", 1, 2),
+    ("S -> a -> b", 1, 8),
+    ("# only a comment", 1, 1),
+])
+def test_errors_have_line_and_column(text, line, column):
+    with pytest.raises(GrammarSyntaxError) as info:
+        load_grammar(text)
+    assert (info.value.line, info.value.column) == (line, column)
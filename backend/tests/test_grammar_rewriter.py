@@ -0,0 +1,53 @@
+import pytest
+
+from grammar_utils import read_grammar, detect_left_recursion
+from grammar_rewriter import (
+    eliminate_left_recursion, left_factor, remove_useless_symbols, repair_grammar
+)
+from grammar_cache import compile_grammar
+from grammar_rewriter import grammar_to_string
+
+
+def test_detect_indirect_and_hidden_left_recursion():
+    assert detect_left_recursion(read_grammar("S -> A a | b\nA -> S c | d")) == ["S", "A"]
+    assert detect_left_recursion(read_grammar("S -> B S a | b\nB -> eps")) == ["S"]
+    assert detect_left_recursion(read_grammar("S -> a S | b")) == []
+
+
+def test_eliminate_indirect_left_recursion():
+    grammar = eliminate_left_recursion(read_grammar("S -> A a | b\nA -> S c | d"))
+    assert detect_left_recursion(grammar) == []
+    assert grammar["A"] == [["b", "c", "A'"], ["d", "A'"]]
+    assert grammar["A'"] == [["a", "c", "A'"], ["eps"]]
+
+
+def test_hidden_left_recursion_is_reported():
+    with pytest.raises(ValueError):
+        eliminate_left_recursion(read_grammar("S -> B S a | b\nB -> eps"))
+
+
+def test_left_factor_and_useless_symbols():
+    grammar = left_factor(read_grammar("S -> a b c | a b d | a e | f"))
+    assert grammar == {
+        "S": [["a", "S'"], ["f"]],
+        "S'": [["b", "S''"], ["e"]],
+        "S''": [["c"], ["d"]],
+    }
+
+    grammar, removed = remove_useless_symbols(read_grammar("S -> a | B\nB -> B b\nC -> c"), "S")
+    assert grammar == {"S": [["a"]]}
+    assert removed == ["B", "C"]
+
+
+def test_repair_gives_ll1_expression_grammar():
+    grammar, changes = repair_grammar(read_grammar("E -> E + T | T\nT -> T * F | F\nF -> ( E ) | id"))
+    assert compile_grammar(grammar_to_string(grammar)).valid
+    assert changes == ["Eliminated left recursion in: E, T"]
+
+
+def test_repair_scales_to_large_grammars():
+    # 3000 non-terminals, each with a direct left recursion and a shared prefix
+    rules = [f"N{i} -> N{i} x{i} | a N{i + 1} | a b" for i in range(2999)] + ["N2999 -> z"]
+    grammar, _ = repair_grammar(read_grammar("\n".join(rules)))
+    assert detect_left_recursion(grammar) == []
+    assert len(grammar) == 3 * 2999 + 1
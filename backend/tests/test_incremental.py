@@ -0,0 +1,96 @@
+import random
+
+from grammar_cache import compile_grammar
+from grammar_rewriter import grammar_to_string
+from incremental import AnalysisSession
+
+GRAMMAR = """E -> T E'
+E' -> + T E' | eps
+T -> F T'
+T' -> * F T' | eps
+F -> ( E ) | id"""
+
+
+def assert_same_analysis(session, text):
+    expected = compile_grammar(text)
+    assert session.recursive_rules == expected.recursive_rules
+    if expected.recursive_rules:
+        return
+    assert session.nullable == expected.nullable
+    assert session.first == expected.first
+    assert session.follow == expected.follow
+    assert session.parsing_table == expected.parsing_table
+    # Terminals added by an edit are interned last, so only the order may differ
+    assert sorted(map(repr, session.conflicts)) == sorted(map(repr, expected.conflicts))
+    assert session.valid == expected.valid
+
+
+def test_edit_recomputes_only_affected_rules():
+    session = AnalysisSession(GRAMMAR)
+    assert session.last_update["mode"] == "full"
+
+    edited = GRAMMAR.replace("F -> ( E ) | id", "F -> ( E ) | id | num")
+    session.update(edited)
+    assert_same_analysis(session, edited)
+
+    stats = session.last_update
+    assert stats["mode"] == "incremental"
+    assert stats["changed_rules"] == ["F"]
+    # FIRST(F) flows into T and E only; E' and T' keep their FIRST sets
+    assert stats["recomputed"]["first"] == 3
+    assert stats["recomputed"]["table_rows"] < len(session.grammar)
+    assert session.parsing_table["E"]["num"] == ["T", "E'"]
+
+
+def test_unchanged_text_recomputes_nothing():
+    session = AnalysisSession(GRAMMAR)
+    session.update(GRAMMAR + "\n")
+    assert session.last_update["changed_rules"] == []
+    assert session.last_update["recomputed"]["first"] == 0
+
+
+def test_left_recursion_then_recovery():
+    session = AnalysisSession(GRAMMAR)
+    recursive = GRAMMAR.replace("T -> F T'", "T -> E F T'")
+    session.update(recursive)
+    assert session.recursive_rules == ["E", "T"]
+    assert not session.valid
+
+    session.update(GRAMMAR)
+    assert session.last_update["mode"] == "full"
+    assert_same_analysis(session, GRAMMAR)
+
+
+def _random_grammar(rng, non_terminals, terminals):
+    grammar = {}
+    for nt in non_terminals:
+        productions = []
+        for _ in range(rng.randint(1, 3)):
+            length = rng.randint(0, 3)
+            production = [rng.choice(non_terminals + terminals) for _ in range(length)]
+            productions.append(production or ['eps'])
+        grammar[nt] = productions
+    return grammar
+
+
+def test_random_edits_match_full_analysis():
+    rng = random.Random(12)
+    non_terminals = ["S", "A", "B", "C", "D", "E"]
+    terminals = ["a", "b", "c", "d"]
+
+    for _ in range(40):
+        grammar = _random_grammar(rng, non_terminals, terminals)
+        text = grammar_to_string(grammar)
+        session = AnalysisSession(text)
+        assert_same_analysis(session, text)
+
+        for _ in range(15):
+            nt = rng.choice(non_terminals[1:])
+            edit = rng.random()
+            if edit < 0.15 and nt in grammar:
+                del grammar[nt]  # nt becomes a terminal
+            else:
+                grammar[nt] = _random_grammar(rng, [nt], terminals + non_terminals)[nt]
+            text = grammar_to_string(grammar)
+            session.update(text)
+            assert_same_analysis(session, text)
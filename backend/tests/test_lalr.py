@@ -0,0 +1,79 @@
+import pytest
+
+from benchmarks.generators import random_ll1_grammar, valid_input, invalid_input
+from grammar_cache import compile_grammar
+from grammar_rewriter import grammar_to_string
+from grammar_utils import read_grammar
+from lalr import build_lalr_table
+from lr_simulator import lr_parse_with_trace, lr_recognize, lr_parse_to_dict
+from parser_simulator import parse_to_dict
+
+EXPR = """
+E -> E + T | T
+T -> T * F | F
+F -> ( E ) | id
+"""
+
+
+def test_left_recursive_expression_grammar():
+    table = build_lalr_table(read_grammar(EXPR), "E")
+    assert table.conflicts == []
+
+    trace, tree, status = lr_parse_with_trace(table, "id + id * id")
+    assert status == "Accepted"
+    assert tree["name"] == "E"
+    assert [child["name"] for child in tree["children"]] == ["E", "+", "T"]
+    steps = trace.to_list()
+    assert steps[0] == {"stack": ["$"], "input": ["id", "+", "id", "*", "id", "$"], "action": "Shift 'id'"}
+    assert steps[-1]["action"] == "Accepted"
+
+
+def test_rejected_input_reports_expected_tokens():
+    table = build_lalr_table(read_grammar(EXPR), "E")
+    assert lr_recognize(table, "id + * id") == "Rejected"
+    result = lr_parse_to_dict(table, "id + * id")
+    assert result["result"] == "Rejected"
+    assert result["trace_steps"][-1]["action"].startswith("ERROR: No action for ACTION[")
+    assert "expected: (, id" in result["trace_steps"][-1]["action"]
+
+
+def test_lalr_but_not_slr_grammar():
+    grammar = read_grammar("S -> L = R | R\nL -> * R | id\nR -> L")
+    table = build_lalr_table(grammar, "S")
+    assert table.conflicts == []
+    assert lr_recognize(table, "* id = id") == "Accepted"
+    assert lr_recognize(table, "id = = id") == "Rejected"
+
+
+def test_lr1_but_not_lalr_grammar_has_reduce_reduce_conflict():
+    grammar = read_grammar("S -> a A d | b B d | a B e | b A e\nA -> c\nB -> c")
+    table = build_lalr_table(grammar, "S")
+    assert {conflict[-1] for conflict in table.conflicts} == {"REDUCE/REDUCE"}
+
+
+def test_epsilon_productions():
+    table = build_lalr_table(read_grammar("S -> A b\nA -> a A | eps"), "S")
+    assert table.conflicts == []
+    _, tree, status = lr_parse_with_trace(table, "b")
+    assert status == "Accepted"
+    assert tree == {"name": "S", "children": [
+        {"name": "A", "children": [{"name": "eps", "children": []}]},
+        {"name": "b", "children": []},
+    ]}
+    assert lr_recognize(table, "a a b") == "Accepted"
+
+
+@pytest.mark.parametrize("n_nonterminals,seed", [(5, 0), (30, 1), (100, 2)])
+def test_agrees_with_ll1_on_generated_grammars(n_nonterminals, seed):
+    grammar = random_ll1_grammar(n_nonterminals, 10, seed=seed)
+    compiled = compile_grammar(grammar_to_string(grammar))
+    table = compiled.lalr
+    assert table.conflicts == []
+
+    for i in range(5):
+        for text in (valid_input(grammar, 40, seed=i), invalid_input(grammar, 40, seed=i)):
+            ll = parse_to_dict(compiled.table, "S", text)
+            lr = lr_parse_to_dict(table, text)
+            assert lr["result"] == ll["result"]
+            if ll["result"] == "Accepted":
+                assert lr["parse_tree"] == ll["parse_tree"]
@@ -0,0 +1,124 @@
+import mmap
+
+import pytest
+
+from grammar_cache import compile_grammar, grammar_key
+from grammar_utils import read_grammar
+from lexer import Lexer, LexerError, read_token_definitions
+from parser_simulator import parse_input_string, recognize
+from snapshot import dumps_snapshot, loads_snapshot
+from stream_parser import stream_parse
+
+GRAMMAR = """E -> T E'
+E' -> + T E' | eps
+T -> F T'
+T' -> * F T' | eps
+F -> ( E ) | id | num
+%token num [0-9]+(\\.[0-9]+)?
+%token id [A-Za-z_][A-Za-z0-9_]*
+%ignore \\s+
+%ignore //[^\\n]*"""
+
+SOURCE = "(x1+2.5)*y // comment\n+ 3"
+NAMES = ["(", "id", "+", "num", ")", "*", "id", "+", "num"]
+
+
+def test_token_definitions_are_not_rules():
+    assert set(read_grammar(GRAMMAR)) == {"E", "E'", "T", "T'", "F"}
+    assert read_token_definitions(GRAMMAR)[0] == ("num", "[0-9]+(\\.[0-9]+)?")
+    assert read_token_definitions(GRAMMAR)[2] == (None, "\\s+")
+    with pytest.raises(LexerError):
+        read_token_definitions("%tokn id x")
+
+
+def test_lexer_names_and_zero_copy_spans():
+    lexer = compile_grammar(GRAMMAR).lexer
+    assert list(lexer.names(SOURCE)) == NAMES
+    data = SOURCE.encode()
+    tokens = list(lexer.tokens(memoryview(data)))
+    assert [t.type for t in tokens] == NAMES
+    assert tokens[3].text == "2.5"
+    assert isinstance(tokens[3].value, memoryview)
+    assert (tokens[1].start, tokens[1].end) == (1, 3)
+
+
+def test_literals_keywords_and_longest_first():
+    lexer = Lexer([("id", "[a-z]+")], ["if", "=", "==", "id"])
+    assert list(lexer.names("if iff == = x")) == ["if", "id", "==", "=", "id"]
+
+
+def test_lexer_errors():
+    lexer = compile_grammar(GRAMMAR).lexer
+    with pytest.raises(LexerError) as e:
+        list(lexer.names("x +\n  @"))
+    assert (e.value.position, e.value.line, e.value.column) == (6, 2, 3)
+    with pytest.raises(LexerError):
+        Lexer([("id", "a*")])
+    with pytest.raises(LexerError):
+        compile_grammar("S -> a\n%token a (")
+
+
+def test_lexer_feeds_parsers():
+    compiled = compile_grammar(GRAMMAR)
+    lexer = compiled.lexer
+    _, tree, status = parse_input_string(compiled.grammar, compiled.table, "E", lexer.names(SOURCE))
+    assert status == "Accepted"
+    assert tree["name"] == "E"
+    assert recognize(compiled.table, "E", lexer.names("x + + y")) == "Rejected"
+    events = list(stream_parse(compiled.table, "E", lexer.names(SOURCE), events=False))
+    assert events[-1]["result"] == "Accepted"
+    assert lexer.codes(SOURCE, compiled.table.t_index).tolist() == [compiled.table.t_index[n] for n in NAMES]
+
+
+def test_splitter_matches_whole_input_lexing():
+    lexer = compile_grammar(GRAMMAR).lexer
+    data = SOURCE.encode()
+    for size in (1, 2, 3, 7):
+        splitter = lexer.splitter()
+        names = []
+        for i in range(0, len(data), size):
+            names += splitter.feed(data[i:i + size])
+        names += splitter.close()
+        assert names == NAMES
+
+
+def test_lexer_over_mmap(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_bytes(SOURCE.encode())
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        assert list(compile_grammar(GRAMMAR).lexer.names(buffer)) == NAMES
+
+
+def test_token_definitions_key_and_snapshot():
+    rules = GRAMMAR.split("\n%")[0]
+    assert grammar_key(rules) != grammar_key(GRAMMAR)
+    assert compile_grammar(rules).lexer is None
+    compiled = loads_snapshot(dumps_snapshot(compile_grammar(GRAMMAR)))
+    assert list(compiled.lexer.names(SOURCE)) == NAMES
+
+
+def test_splitter_errors_are_raised_early_with_their_place():
+    lexer = Lexer([("id", "[a-z]+"), (None, r"\s+"), (None, r"/\*.*?\*/")], ["+"])
+    # Unmatched text is held while it may be the start of a token...
+    splitter = lexer.splitter(max_held=16)
+    assert splitter.feed(b"ab +\ncd /* x") == ["id", "+", "id"]
+    assert splitter.feed(b" */ e") == []
+    assert splitter.close() == ["id"]
+    # ...but not once more than max_held bytes follow it
+    splitter = lexer.splitter(max_held=16)
+    splitter.feed(b"a\nb @ ")
+    with pytest.raises(LexerError) as e:
+        splitter.feed(b"c " * 10)
+    assert (e.value.position, e.value.line, e.value.column) == (4, 2, 3)
+    # A token (here an unterminated comment) longer than max_held
+    splitter = lexer.splitter(max_held=16)
+    splitter.feed(b"a /* ")
+    with pytest.raises(LexerError):
+        splitter.feed(b"x" * 20)
+    # close() keeps line and column
+    splitter = lexer.splitter()
+    splitter.feed(b"a\nbb + ")
+    splitter.feed(b"c @")
+    with pytest.raises(LexerError) as e:
+        splitter.close()
+    assert (e.value.position, e.value.line, e.value.column) == (9, 2, 8)
@@ -0,0 +1,52 @@
+from metrics import MetricsRegistry, StageTimer, RequestProfile
+from first_follow import nullable_non_terminals, compute_first_masks, compute_follow_masks
+from grammar_utils import read_grammar
+from symbol_table import SymbolTable
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry(enabled=True)
+    registry.observe("demo_seconds", {"stage": "first"}, 0.002, "Demo.")
+    registry.observe("demo_seconds", {"stage": "first"}, 7.0)
+    registry.inc("demo_total", {"path": 'a"b\\c'}, 3, "Demo counter.")
+    text = registry.render([("demo_gauge", "gauge", "Demo gauge.", {}, 5), ("skipped", "gauge", "", {}, None)])
+
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="first",le="0.0025"} 1' in text
+    assert 'demo_seconds_bucket{stage="first",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{stage="first"} 2' in text
+    assert 'demo_total{path="a\\"b\\\\c"} 3' in text
+    assert "demo_gauge 5" in text
+    assert "skipped" not in text
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    registry.observe("demo_seconds", {}, 1.0)
+    registry.record_stages({"first": {"seconds": 0.1, "edges": 4}})
+    assert registry.render() == "\n"
+
+
+def test_stage_stats():
+    grammar = read_grammar("S -> A B\nA -> a A | eps\nB -> b | A")
+    symbols = SymbolTable.from_grammar(grammar)
+    nullable_stats, first_stats, follow_stats = {}, {}, {}
+    nullable = nullable_non_terminals(grammar, nullable_stats)
+    first = compute_first_masks(grammar, symbols, nullable, first_stats)
+    compute_follow_masks(grammar, first, "S", symbols, follow_stats)
+
+    assert nullable_stats == {"iterations": 3, "nullable": 3}
+    assert first_stats["components"] == 3
+    assert first_stats["largest_set"] == 2   # FIRST(S) = {a, b}
+    assert follow_stats["set_elements"] == 5  # FOLLOW: S {$}, A {a, b, $}, B {$}
+
+
+def test_profile_collects_stages():
+    timer = StageTimer()
+    timer.lap("read_grammar", rules=2)
+    profile = RequestProfile()
+    profile.cache = "miss"
+    profile.add_stages(timer.stages)
+    header = profile.to_header()
+    assert '"cache":"miss"' in header
+    assert '"stage":"read_grammar"' in header and '"rules":2' in header
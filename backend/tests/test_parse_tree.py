@@ -0,0 +1,68 @@
+from grammar_cache import compile_grammar
+from lr_simulator import lr_parse_with_trace
+from parse_tree import ParseTree, EPS_CHILD
+from parser_simulator import parse_with_trace, parse_to_dict
+
+with open("tests/sample_grammar.txt") as f:
+    COMPILED = compile_grammar(f.read())
+
+
+def _parse(text):
+    return parse_with_trace(COMPILED.table, "E", text)[1]
+
+
+def test_node_views_and_spans():
+    tree = _parse("id + id")
+    root = tree.root
+    assert root.name == "E"
+    assert root.span == (0, 3)
+    assert [child.name for child in root.children] == ["T", "E'"]
+    t, rest = root.children
+    assert t.span == (0, 1) and rest.span == (1, 3)
+    plus = rest.children[0]
+    assert plus.name == "+" and plus.span == (1, 2) and plus.children == []
+    assert plus.parent.index == rest.index
+
+    # T' -> eps: no stored child, an empty span
+    t_rest = t.children[1]
+    assert tree.first_child[t_rest.index] == EPS_CHILD
+    assert t_rest.span == (1, 1)
+
+
+def test_to_dict_matches_nested_tree():
+    tree = _parse("id * id")
+    assert tree.to_dict() == {"name": "E", "children": [
+        {"name": "T", "children": [
+            {"name": "F", "children": [{"name": "id", "children": []}]},
+            {"name": "T'", "children": [
+                {"name": "*", "children": []},
+                {"name": "F", "children": [{"name": "id", "children": []}]},
+                {"name": "T'", "children": [{"name": "eps", "children": []}]},
+            ]},
+        ]},
+        {"name": "E'", "children": [{"name": "eps", "children": []}]},
+    ]}
+
+
+def test_rejected_input_leaves_unexpanded_nodes():
+    tree = _parse("id +")
+    data = tree.to_dict()
+    assert data["children"][1]["children"][1] == {"name": "T", "children": []}
+    assert tree.node(len(tree) - 2).span == (-1, -1)
+
+
+def test_columns_round_trip():
+    tree = _parse("( id + id ) * id")
+    columns = parse_to_dict(COMPILED.table, "E", "( id + id ) * id", "columns")["parse_tree"]
+    assert columns == tree.to_columns()
+    assert ParseTree.from_columns(columns).to_dict() == tree.to_dict()
+
+
+def test_from_dict_of_lr_tree():
+    grammar = compile_grammar("E -> E + T | T\nT -> id | eps")
+    _, nested, status = lr_parse_with_trace(grammar.lalr, "id + id +")
+    assert status == "Accepted"
+    tree = ParseTree.from_dict(nested, grammar.lalr.non_terminals)
+    assert tree.to_dict() == nested
+    assert tree.root.span == (0, 4)
+    assert tree.root.children[2].span == (4, 4)
@@ -0,0 +1,56 @@
+from grammar_utils import read_grammar
+from first_follow import compute_first, compute_follow
+from parsing_table import compute_parsing_table, CompiledTable, NO_RULE
+from parser_simulator import parse_input_string, parse_with_trace, recognize
+
+with open("tests/sample_grammar.txt") as f:
+    GRAMMAR = read_grammar(f.read())
+FIRST = compute_first(GRAMMAR)
+FOLLOW = compute_follow(GRAMMAR, FIRST, "E")
+TABLE, _ = compute_parsing_table(GRAMMAR, FIRST, FOLLOW)
+
+
+def test_compiled_table_round_trip():
+    compiled = CompiledTable.from_dict(GRAMMAR, TABLE)
+
+    assert compiled.to_dict() == TABLE
+    e, plus = compiled.nt_index["E'"], compiled.t_index["+"]
+    assert compiled.productions[compiled.lookup(e, plus)] == ["+", "T", "E'"]
+    assert compiled.lookup(e, compiled.t_index["id"]) == NO_RULE
+
+
+def test_parse_with_compiled_or_dict_table():
+    compiled = CompiledTable.from_dict(GRAMMAR, TABLE)
+    for text in ["id + id * id", "( id ) * id", "id + * id", "id foo"]:
+        assert parse_input_string(GRAMMAR, compiled, "E", text) == \
+            parse_input_string(GRAMMAR, TABLE, "E", text)
+
+    trace, tree, status = parse_input_string(GRAMMAR, compiled, "E", "id + id")
+    assert status == "Accepted"
+    assert trace[0] == {"stack": ["E", "$"], "input": ["id", "+", "id", "$"], "action": "Expand E → T E'"}
+    assert [child["name"] for child in tree["children"]] == ["T", "E'"]
+
+    trace, _, status = parse_input_string(GRAMMAR, compiled, "E", "id foo")
+    assert status == "Rejected"
+    assert trace[-1]["action"] == "ERROR: No rule for M[T', foo]"
+
+
+def test_recognize_and_lazy_trace_agree_with_full_parse():
+    compiled = CompiledTable.from_dict(GRAMMAR, TABLE)
+    for text in ["id + id * id", "( id + id ) * id", "id + * id", "( id", ""]:
+        trace_steps, tree, status = parse_input_string(GRAMMAR, compiled, "E", text)
+        assert recognize(compiled, "E", text) == status
+
+        trace, lazy_tree, lazy_status = parse_with_trace(compiled, "E", text)
+        assert len(trace) == len(trace_steps)
+        assert trace.to_list() == trace_steps
+        assert (lazy_tree.to_dict(), lazy_status) == (tree, status)
+
+
+def test_recognize_end_marker_in_production():
+    grammar = read_grammar("S -> $ $")
+    compiled = CompiledTable.from_dict(grammar, compute_parsing_table(
+        grammar, compute_first(grammar), compute_follow(grammar, compute_first(grammar), "S"))[0])
+    _, _, status = parse_input_string(grammar, compiled, "S", "")
+    assert status == "Rejected"
+    assert recognize(compiled, "S", "") == "Rejected"
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import serialize
+from grammar_cache import compile_grammar
+from serialize import dumps
+
+with open("tests/sample_grammar.txt") as f:
+    COMPILED = compile_grammar(f.read())
+
+
+def test_dumps_without_orjson_gives_same_json(monkeypatch):
+    value = {"a": [1, "é", None, True], "b": {"c": ["x", "y"]}, "n": 2.5}
+    fast = dumps(value)
+    monkeypatch.setattr(serialize, "orjson", None)
+    assert dumps(value) == fast == json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def test_render_matches_analysis_sets():
+    data = json.loads(COMPILED.encoding.render())
+    assert list(data) == ["grammar", "first", "follow", "parsing_table", "conflicts", "valid"]
+    assert data["first"] == {nt: sorted(s) for nt, s in COMPILED.first.items()}
+    assert data["follow"]["T'"] == ["$", ")", "+"]
+    assert data["parsing_table"] == COMPILED.parsing_table
+    assert data["valid"] is True
+    # Cached: the second render joins the same fragments
+    assert COMPILED.encoding.render() == COMPILED.encoding.render()
+
+
+def test_fields_and_pages():
+    encoding = COMPILED.encoding
+    data = json.loads(encoding.render(["first", "valid"], offset=1, limit=2))
+    assert list(data) == ["first", "valid", "page"]
+    assert list(data["first"]) == ["E'", "T"]
+    assert data["page"] == {"offset": 1, "limit": 2, "total": 5}
+    assert json.loads(encoding.render(["grammar"], offset=4))["grammar"] == {"F": [["(", "E", ")"], ["id"]]}
+    with pytest.raises(ValueError):
+        encoding.render(["first", "nope"])
+
+
+def test_compact_table_encoding():
+    compiled = compile_grammar("S -> a S | b | a")
+    data = json.loads(compiled.encoding.render(table_encoding="compact"))
+    productions = [rhs for alternatives in data["grammar"].values() for rhs in alternatives]
+    terminals = data["parsing_table"]["terminals"]
+    rows = data["parsing_table"]["rows"]
+    assert {terminals[t]: productions[p] for t, p in rows["S"]} == compiled.parsing_table["S"]
+    assert data["conflicts"] == [["S", "a", 0, 2, "FIRST/FIRST"]]
+
+
+def test_extras_are_merged():
+    body = COMPILED.encoding.render(["valid"], extras=[dumps({"x": 1}), dumps({})])
+    assert json.loads(body) == {"valid": True, "x": 1}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_deeply_nested_value(monkeypatch, use_orjson):
+    # Past orjson's 255 levels and past the recursion limit of json
+    if not use_orjson:
+        monkeypatch.setattr(serialize, "orjson", None)
+    tree = node = {"name": "E", "children": []}
+    for _ in range(2000):
+        child = {"name": "E'", "children": []}
+        node["children"].append(child)
+        node = child
+    expected = '{"name":"E","children":[' + '{"name":"E\'","children":[' * 2000 + "]}" * 2001
+    assert dumps(tree) == expected.encode()
+    assert serialize._dumps_iterative({1: (2, "é")}) == dumps({1: (2, "é")})
+
+
+def test_compact_conflicts_use_production_identity():
+    # B's two productions have the same right-hand side as A's one
+    compiled = compile_grammar("S -> A c | B d\nA -> x\nB -> x | x")
+    conflicts = json.loads(compiled.encoding.section("conflicts", "compact"))
+    assert ["B", "x", 3, 4, "FIRST/FIRST"] in conflicts
@@ -0,0 +1,53 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from grammar_cache import GrammarCache, compile_grammar, grammar_key
+from parser_simulator import recognize
+from shared_store import SharedGrammarStore
+
+GRAMMAR = """E -> T E'
+E' -> + T E' | eps
+T -> F T'
+T' -> * F T' | eps
+F -> ( E ) | id"""
+
+
+def _worker_compiles(directory):
+    """One 'worker process': returns how many grammars it had to compile."""
+    cache = GrammarCache(shared_store=SharedGrammarStore(directory))
+    compiled = cache.get(GRAMMAR)
+    assert recognize(compiled.table, "E", "id + id") == "Accepted"
+    return cache.shared_store.compiles
+
+
+def test_only_one_worker_compiles(tmp_path):
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        compiles = list(pool.map(_worker_compiles, [str(tmp_path)] * 4))
+    assert sum(compiles) == 1
+
+
+def test_attached_table_is_a_view_of_the_file(tmp_path):
+    first = GrammarCache(shared_store=SharedGrammarStore(str(tmp_path)))
+    second = GrammarCache(shared_store=SharedGrammarStore(str(tmp_path)))
+    a = first.get(GRAMMAR)
+    b = second.get(GRAMMAR)
+    assert second.shared_store.compiles == 0 and second.shared_store.loads == 1
+    assert all(isinstance(a, memoryview) for a in b.table.rows.arrays)
+    assert b.parsing_table == compile_grammar(GRAMMAR).parsing_table
+    assert b.generated_parser.recognize("( id ) * id") == "Accepted"
+
+    # Mapped tables can still be sent to a batch worker
+    copy = pickle.loads(pickle.dumps(a.table))
+    assert [list(x) for x in copy.rows.arrays] == [list(y) for y in b.table.rows.arrays]
+
+
+def test_registrations_are_shared(tmp_path):
+    first = GrammarCache(shared_store=SharedGrammarStore(str(tmp_path)))
+    second = GrammarCache(shared_store=SharedGrammarStore(str(tmp_path)))
+    key = first.register(first.get(GRAMMAR))
+    assert second.lookup(key).start_symbol == "E"
+
+    assert second.unregister(key)
+    assert first.lookup(key) is None
+    assert second.lookup("../" + key) is None
+    assert grammar_key(GRAMMAR) == key
@@ -0,0 +1,62 @@
+import pytest
+
+from grammar_cache import compile_grammar
+from parser_simulator import parse_with_trace, recognize
+from snapshot import SnapshotError, dumps_snapshot, load_snapshot, loads_snapshot, save_snapshot
+
+GRAMMAR = """E -> T E'
+E' -> + T E' | eps
+T -> F T'
+T' -> * F T' | eps
+F -> ( E ) | id"""
+
+
+@pytest.mark.parametrize("text", [GRAMMAR, "S -> a | a b", "S -> A a | b\nA -> S c | d"])
+def test_round_trip(text):
+    compiled = compile_grammar(text)
+    loaded = loads_snapshot(dumps_snapshot(compiled))
+    assert loaded.key == compiled.key
+    assert loaded.grammar == compiled.grammar
+    assert loaded.recursive_rules == compiled.recursive_rules
+    assert loaded.nullable == compiled.nullable
+    assert loaded.first == compiled.first
+    assert loaded.follow == compiled.follow
+    assert loaded.parsing_table == compiled.parsing_table
+    assert loaded.conflicts == compiled.conflicts
+    assert loaded.size == compiled.size
+
+
+def test_loaded_table_parses(tmp_path):
+    compiled = compile_grammar(GRAMMAR)
+    path = tmp_path / "expr.ll1snap"
+    save_snapshot(compiled, path)
+    loaded = load_snapshot(path)
+    trace, tree, status = parse_with_trace(loaded.table, loaded.start_symbol, "id + id * id")
+    assert status == "Accepted"
+    assert trace.to_list() == parse_with_trace(compiled.table, "E", "id + id * id")[0].to_list()
+
+
+def test_sparse_table_stays_small():
+    # Two filled cells per row out of ~3000: a dense table would take 36MB
+    n = 3000
+    text = "\n".join(f"N{i} -> t{i} N{i + 1} | eps" for i in range(n)) + f"\nN{n} -> end"
+    compiled = compile_grammar(text)
+    assert compiled.table.rows.nbytes < 200_000
+    tokens = " ".join(f"t{i}" for i in range(n)) + " end"
+    for dense in (False, True):
+        data = dumps_snapshot(compiled, dense)
+        assert len(data) < 2_000_000
+        loaded = loads_snapshot(data)
+        assert recognize(loaded.table, "N0", tokens) == "Accepted"
+        assert recognize(loaded.table, "N0", "t0 t2") == "Rejected"
+        assert loaded.parsing_table == compiled.parsing_table
+
+
+def test_rejects_foreign_and_future_data():
+    data = dumps_snapshot(compile_grammar(GRAMMAR))
+    with pytest.raises(SnapshotError):
+        loads_snapshot(b"PK\x03\x04" + data[4:])
+    with pytest.raises(SnapshotError):
+        loads_snapshot(data[:4] + b"\x63\x00" + data[6:])
+    with pytest.raises(SnapshotError):
+        loads_snapshot(data[:20])
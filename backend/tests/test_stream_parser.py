@@ -0,0 +1,53 @@
+import io
+
+from grammar_cache import compile_grammar
+from stream_parser import TokenSplitter, iter_tokens, iter_file_tokens, stream_parse
+
+COMPILED = compile_grammar("S -> a S b | eps")
+
+
+def test_token_split_across_chunk_boundary():
+    splitter = TokenSplitter()
+    assert splitter.feed(b"ab c") == ["ab"]
+    assert splitter.feed(b"d e ") == ["cd", "e"]
+    assert splitter.feed(b"f") == []
+    assert splitter.close() == ["f"]
+
+
+def test_iter_tokens_sources():
+    expected = ["a", "bb", "c"]
+    assert list(iter_tokens(iter(["a b", "b c"]))) == ["a", "bb", "c"]
+    assert list(iter_tokens(io.BytesIO(b"a  bb\nc"), chunk_size=2)) == expected
+    assert list(iter_tokens(io.StringIO("a bb c"), chunk_size=3)) == expected
+    assert list(iter_tokens(memoryview(b" a bb c "))) == expected
+
+
+def test_iter_file_tokens_mmap_and_empty_file(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_bytes(b"a a\nb b\n")
+    assert list(iter_file_tokens(path)) == ["a", "a", "b", "b"]
+
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+    assert list(iter_file_tokens(empty)) == []
+
+
+def test_stream_parse_accepts_file_input(tmp_path):
+    path = tmp_path / "input.txt"
+    path.write_bytes(b"a a b b")
+    events = list(stream_parse(COMPILED.table, "S", iter_file_tokens(path), events=False))
+    assert events == [{"event": "end", "result": "Accepted", "tokens": 4}]
+
+
+def test_stream_parse_stops_at_first_error():
+    pulled = []
+
+    def tokens():
+        for token in ["a", "b", "b", "a", "a"]:
+            pulled.append(token)
+            yield token
+
+    events = list(stream_parse(COMPILED.table, "S", tokens()))
+    assert pulled == ["a", "b", "b"]
+    assert events[-2] == {"event": "error", "symbol": "$", "token": "b", "position": 2}
+    assert events[-1] == {"event": "end", "result": "Rejected", "tokens": 2}
@@ -1,7 +1,7 @@
 // frontend/src/App.jsx
 
 import { useState } from 'react';
-import { analyzeGrammar, parseString } from './api/backend';
+import { analyzeGrammarIncremental, streamParse } from './api/backend';
 import './App.css'; // We'll create this file next for styles
 import AnalysisResults from './components/AnalysisResults';
 import ParseOutput from './components/ParseOutput';
@@ -25,6 +25,7 @@ function App() {
     const [isLoading, setIsLoading] = useState(false);
     const [error, setError] = useState(null); // To display API errors
     const [recursionError, setRecursionError] = useState(null);
+    const [analysisSessionId, setAnalysisSessionId] = useState(null); // incremental /analyze session
 
     // === 2. Handlers (Functions to call the API) ===
 
@@ -37,7 +38,8 @@ const handleAnalyze = async () => {
     setParseResult(null);
     setRecursionError(null); // <-- Clear previous error
     try {
-        const response = await analyzeGrammar(grammarText);
+        const response = await analyzeGrammarIncremental(grammarText, analysisSessionId);
+        setAnalysisSessionId(response.data.session_id);
 
         // --- THIS IS THE NEW LOGIC ---
         if (response.data.error_type === 'LEFT_RECURSION') {
@@ -90,10 +92,16 @@ const handleApplyFix = () => {
         setError(null);
         setParseResult(null); // Clear old parse results
         try {
-            const response = await parseString(grammarText, inputString);
-            setParseResult(response.data);
+            // Steps are shown as they stream in; tree + status arrive at the end
+            let steps = [];
+            setParseResult({ trace_steps: steps, parse_tree: null, result: null });
+            const final = await streamParse(grammarText, inputString, (newSteps) => {
+                steps = steps.concat(newSteps);
+                setParseResult({ trace_steps: steps, parse_tree: null, result: null });
+            });
+            setParseResult({ trace_steps: steps, ...final });
         } catch (err) {
-            setError(err.response?.data?.detail || 'Failed to parse string.');
+            setError(err.message || 'Failed to parse string.');
         }
         setIsLoading(false);
     };
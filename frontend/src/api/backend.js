@@ -19,6 +19,25 @@ export const analyzeGrammar = (grammarText) => {
     return apiClient.post('/analyze', { grammar_text: grammarText });
 };
 
+/**
+ * Analyzes the grammar inside an incremental analysis session: after the
+ * first call only the rules affected by the edit are re-analyzed.
+ * @param {string} grammarText The raw grammar string.
+ * @param {string|null} sessionId The session_id of the previous analysis, if any.
+ * @returns {Promise<object>} Same result as analyzeGrammar, plus session_id.
+ */
+export const analyzeGrammarIncremental = async (grammarText, sessionId) => {
+    if (sessionId) {
+        try {
+            return await apiClient.put(`/analyze/sessions/${sessionId}`, { grammar_text: grammarText });
+        } catch (err) {
+            // Sessions are evicted on the server; start a new one
+            if (err.response?.status !== 404) throw err;
+        }
+    }
+    return apiClient.post('/analyze/sessions', { grammar_text: grammarText });
+};
+
 /**
  * Parses an input string with the given grammar.
  * @param {string} grammarText The raw grammar string.
@@ -30,4 +49,67 @@ export const parseString = (grammarText, inputString) => {
         grammar_text: grammarText,
         input_string: inputString,
     });
-};
\ No newline at end of file
+};
+/**
+ * Registers (compiles) a grammar once on the backend.
+ * @param {string} grammarText The raw grammar string.
+ * @returns {Promise<object>} { grammar_id, start_symbol }
+ */
+export const registerGrammar = (grammarText) => {
+    return apiClient.post('/grammars', { grammar_text: grammarText });
+};
+
+/**
+ * Parses an input string with a grammar registered through registerGrammar.
+ * @param {string} grammarId The ID returned by registerGrammar.
+ * @param {string} inputString The input string to parse.
+ * @returns {Promise<object>} The parse result (trace, tree, status).
+ */
+export const parseWithGrammarId = (grammarId, inputString) => {
+    return apiClient.post(`/grammars/${grammarId}/parse`, {
+        input_string: inputString,
+    });
+};
+
+/**
+ * Parses an input string and streams the trace as it is produced (NDJSON).
+ * @param {string} grammarText The raw grammar string.
+ * @param {string} inputString The input string to parse.
+ * @param {function} onSteps Called with each new batch of trace steps.
+ * @returns {Promise<object>} The closing record { result, parse_tree }.
+ */
+export const streamParse = async (grammarText, inputString, onSteps) => {
+    const response = await fetch(`${apiClient.defaults.baseURL}/parse/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ grammar_text: grammarText, input_string: inputString }),
+    });
+    if (!response.ok) {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.detail || 'Failed to parse string.');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    let finalRecord = null;
+
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+
+        // Every complete line is one record; keep the trailing partial line
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        const steps = [];
+        for (const line of lines) {
+            if (!line) continue;
+            const { type, ...record } = JSON.parse(line);
+            if (type === 'step') steps.push(record);
+            else finalRecord = record;
+        }
+        if (steps.length > 0) onSteps(steps);
+    }
+    return finalRecord;
+};
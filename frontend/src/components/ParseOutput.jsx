@@ -8,6 +8,11 @@ function SimulationPlayer({ steps }) {
     const [stepIndex, setStepIndex] = useState(0);
     const currentStep = steps[stepIndex];
 
+    // Steps may still be streaming in
+    if (!currentStep) {
+        return <div className="simulation-player">Waiting for the first step...</div>;
+    }
+
     return (
         <div className="simulation-player">
             <div className="sim-state">
@@ -61,7 +66,9 @@ function ParseOutput({ result }) {
     // === CHANGE 2: Default to the 'simulation' tab ===
     const [activeTab, setActiveTab] = useState('simulation');
 
-    const statusClass = status.toLowerCase() === 'accepted' ? 'status-accepted' : 'status-rejected';
+    // `status` is null while the trace is still streaming
+    const statusText = status || 'Parsing...';
+    const statusClass = !status ? '' : status.toLowerCase() === 'accepted' ? 'status-accepted' : 'status-rejected';
 
     // === CHANGE 3: Create the old trace from the new data ===
     const fullTrace = trace_steps
@@ -72,7 +79,7 @@ function ParseOutput({ result }) {
         <div className="parse-output-container">
             <h3>Parse Result</h3>
             <div className={`parse-status ${statusClass}`}>
-                <strong>Status:</strong> {status}
+                <strong>Status:</strong> {statusText}
             </div>
 
             {/* === CHANGE 4: Add the "Simulation" tab === */}
@@ -103,7 +110,11 @@ function ParseOutput({ result }) {
                     <SimulationPlayer steps={trace_steps} />
                 )}
 
-                {activeTab === 'tree' && (
+                {activeTab === 'tree' && !parse_tree && (
+                    <div className="tree-container">The parse tree is shown once parsing finishes.</div>
+                )}
+
+                {activeTab === 'tree' && parse_tree && (
                     <div className="tree-container">
                         <div style={{ width: '100%', height: '600px', border: '1px solid #ddd' }}>
                             <Tree 